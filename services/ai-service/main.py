@@ -30,6 +30,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from shared.config import settings
 from shared.database import get_postgres_session, mongodb_manager
 from shared.messaging import messaging_manager
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
 
 # Configure logging
 logger = structlog.get_logger()
@@ -470,6 +472,9 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting AI Service")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("ai-service")
+    
     try:
         # Initialize MongoDB manager
         await mongodb_manager.initialize()
@@ -487,6 +492,7 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down AI Service")
+        await loop_monitor.stop()
 
 
 # Create FastAPI application
@@ -494,6 +500,7 @@ app = FastAPI(
     title="AI Service",
     description="Hybrid LLM with RAG and NL2SQL capabilities",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -0,0 +1,172 @@
+"""
+Edge authentication: local JWT verification with cached claims and user status
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import jwt
+import structlog
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+from shared.config import settings
+from shared.dataloader import BatchLoader, make_row_loader
+
+logger = structlog.get_logger()
+
+EDGE_AUTH_LOOKUPS = Counter(
+    'gateway_auth_cache_lookups_total', 'Edge auth cache lookups', ['cache', 'result']
+)
+
+
+class UserStatus(NamedTuple):
+    is_active: bool
+    role: str
+
+
+StatusLoader = Callable[[str], Awaitable[Optional[UserStatus]]]
+
+
+def _postgres_status_loader() -> BatchLoader:
+    """Concurrent status lookups collapse into one ``WHERE id = ANY($1)`` query"""
+    from shared.database import postgresql_manager
+
+    rows = make_row_loader(postgresql_manager.get_connection, "users", columns="id, is_active, role", cache=False)
+
+    async def batch_fn(user_ids):
+        found = await rows.batch_fn(user_ids)
+        return [UserStatus(row["is_active"], row["role"]) if row else None for row in found]
+
+    return BatchLoader(batch_fn, key_fn=str, cache=False)
+
+
+class EdgeAuthenticator:
+    """Verifies bearer tokens at the gateway without calling the user service.
+
+    Signatures are checked locally (HS256 with the shared secret, RS256 with
+    ``jwt_public_key`` when configured) and decoded claims are cached per
+    token until the token's ``exp``. The user's active flag and role come
+    from a status cache with a short TTL, refreshed through a batched
+    Postgres lookup; the user service publishes user ids on
+    ``auth_invalidation_channel`` when a user is deactivated, deleted or
+    changes role, and every replica drops that user's entry immediately.
+    A warm request costs one dict lookup per cache.
+    """
+
+    def __init__(self, secret: Optional[str] = None, public_key: Optional[str] = None,
+                 status_loader: Optional[StatusLoader] = None, status_ttl: Optional[float] = None,
+                 max_tokens: Optional[int] = None):
+        keys = {"HS256": secret or settings.secret_key, "RS256": public_key or settings.jwt_public_key}
+        # A token may only use an algorithm we hold a key for, so an RS256
+        # public key can never be used as an HS256 secret
+        self.keys = {alg: key for alg, key in keys.items() if key}
+        self.status_loader = status_loader
+        self.status_ttl = status_ttl if status_ttl is not None else settings.auth_status_ttl
+        self.max_tokens = max_tokens or settings.auth_claims_cache_size
+        self._claims: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._status: Dict[str, Tuple[Optional[UserStatus], float]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._invalidations = 0
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Return verified claims for ``token``, from cache when possible"""
+        cached = self._claims.get(token)
+        if cached is not None:
+            claims, expires_at = cached
+            if expires_at > time.time():
+                EDGE_AUTH_LOOKUPS.labels(cache="claims", result="hit").inc()
+                return claims
+            del self._claims[token]
+
+        EDGE_AUTH_LOOKUPS.labels(cache="claims", result="miss").inc()
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+            key = self.keys.get(algorithm)
+            if key is None:
+                raise HTTPException(status_code=401, detail="Invalid token")
+            claims = jwt.decode(token, key, algorithms=[algorithm], options={"require": ["exp", "sub"]})
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.PyJWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        if len(self._claims) >= self.max_tokens:
+            self._prune_claims()
+        self._claims[token] = (claims, float(claims["exp"]))
+        return claims
+
+    def _prune_claims(self):
+        now = time.time()
+        self._claims = {token: entry for token, entry in self._claims.items() if entry[1] > now}
+        # Still full of live tokens: forget the oldest quarter
+        overflow = len(self._claims) - self.max_tokens * 3 // 4
+        for token in list(self._claims)[:max(0, overflow)]:
+            del self._claims[token]
+
+    async def user_status(self, user_id: str) -> Optional[UserStatus]:
+        cached = self._status.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            EDGE_AUTH_LOOKUPS.labels(cache="status", result="hit").inc()
+            return cached[0]
+
+        EDGE_AUTH_LOOKUPS.labels(cache="status", result="miss").inc()
+        if self.status_loader is None:
+            self.status_loader = _postgres_status_loader().load
+        invalidations = self._invalidations
+        status = await self.status_loader(user_id)
+        # A row read before an invalidation arrived may already be stale
+        if invalidations == self._invalidations:
+            self._status[user_id] = (status, time.monotonic() + self.status_ttl)
+        return status
+
+    async def authenticate(self, token: str) -> Dict[str, Any]:
+        """Verify a bearer token and return the current user"""
+        claims = self.decode(token)
+        user_id = str(claims["sub"])
+        status = await self.user_status(user_id)
+        if status is None or not status.is_active:
+            raise HTTPException(status_code=401, detail="Invalid authentication")
+        return {"user_id": user_id, "email": claims.get("email"), "role": status.role}
+
+    def invalidate_user(self, user_id: str):
+        """Drop a user's cached status so the next request reloads it"""
+        self._invalidations += 1
+        self._status.pop(user_id, None)
+
+    async def start(self, redis_client):
+        """Listen for status invalidations published by the user service"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen(redis_client))
+
+    async def _listen(self, redis_client):
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(settings.auth_invalidation_channel)
+                # Anything published while we were not subscribed is lost
+                self._invalidations += 1
+                self._status.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        data = message["data"]
+                        self.invalidate_user(data.decode() if isinstance(data, bytes) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Auth invalidation listener failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+edge_auth = EdgeAuthenticator()
@@ -0,0 +1,183 @@
+"""
+Batch endpoint support: run many API sub-requests through the gateway in one call
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import structlog
+from pydantic import BaseModel, Field
+from prometheus_client import Counter, Histogram
+
+from shared.config import settings
+
+logger = structlog.get_logger()
+
+BATCH_SUBREQUESTS = Counter(
+    'gateway_batch_subrequests_total', 'Batch sub-requests by outcome', ['outcome']
+)
+BATCH_SIZE = Histogram(
+    'gateway_batch_size', 'Sub-requests per batch call', buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+
+BATCH_PATH = "/api/v1/batch"
+
+# Request headers not copied from the batch call onto its sub-requests
+_PARENT_ONLY_HEADERS = frozenset({b"content-length", b"content-type", b"accept-encoding", b"transfer-encoding"})
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    body: Optional[Any] = None
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = Field(default_factory=dict)
+    body: Any = None
+
+
+def _dedupe_key(item: BatchItem) -> Optional[Tuple]:
+    """Identical safe requests run once; anything that may have side effects always runs"""
+    if item.method.upper() not in ("GET", "HEAD"):
+        return None
+    return (item.method.upper(), item.path, tuple(sorted(item.headers.items())))
+
+
+def _error(item: BatchItem, status: int, message: str) -> BatchItemResult:
+    return BatchItemResult(id=item.id, status=status, body={"error": {"code": status, "message": message}})
+
+
+class BatchExecutor:
+    """Dispatches sub-requests into the gateway ASGI app concurrently.
+
+    Each sub-request passes through the same middleware, routes, response
+    cache and upstream proxy as a direct call. The caller authenticated once
+    for the batch; that user is placed on each sub-request's scope state,
+    where ``get_current_user`` and the rate limiter pick it up instead of
+    verifying the token again. Identical GET/HEAD sub-requests share one
+    execution.
+    """
+
+    def __init__(self, max_requests: Optional[int] = None, concurrency: Optional[int] = None):
+        self.max_requests = max_requests or settings.gateway_batch_max_requests
+        self.concurrency = concurrency or settings.gateway_batch_concurrency
+
+    async def execute(self, app, parent_scope, user: Dict[str, Any], items: List[BatchItem]) -> List[BatchItemResult]:
+        BATCH_SIZE.observe(len(items))
+        slots = asyncio.Semaphore(self.concurrency)
+        shared: Dict[Tuple, asyncio.Task] = {}
+
+        async def run(item: BatchItem) -> BatchItemResult:
+            async with slots:
+                return await self._dispatch(app, parent_scope, user, item)
+
+        tasks = []
+        for item in items:
+            key = _dedupe_key(item)
+            if key is None:
+                tasks.append(asyncio.ensure_future(run(item)))
+                continue
+            if key in shared:
+                BATCH_SUBREQUESTS.labels(outcome="deduplicated").inc()
+            else:
+                shared[key] = asyncio.ensure_future(run(item))
+            tasks.append(shared[key])
+
+        results = await asyncio.gather(*tasks)
+        # Duplicates share a result; give each its own id
+        return [result.model_copy(update={"id": item.id}) for item, result in zip(items, results)]
+
+    async def _dispatch(self, app, parent_scope, user: Dict[str, Any], item: BatchItem) -> BatchItemResult:
+        url = urlsplit(item.path)
+        if url.scheme or url.netloc or not url.path.startswith("/api/v1/"):
+            BATCH_SUBREQUESTS.labels(outcome="rejected").inc()
+            return _error(item, 400, "Sub-request paths must start with /api/v1/")
+        if url.path.rstrip("/") == BATCH_PATH:
+            BATCH_SUBREQUESTS.labels(outcome="rejected").inc()
+            return _error(item, 400, "Batches cannot be nested")
+
+        body = b"" if item.body is None else json.dumps(item.body).encode("utf-8")
+        headers = [(name, value) for name, value in parent_scope["headers"] if name not in _PARENT_ONLY_HEADERS]
+        overridden = {name.lower().encode("latin-1") for name in item.headers}
+        headers = [(name, value) for name, value in headers if name not in overridden]
+        headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in item.headers.items()]
+        if body:
+            headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+        scope = {
+            "type": "http",
+            "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+            "http_version": parent_scope.get("http_version", "1.1"),
+            "method": item.method.upper(),
+            "scheme": parent_scope.get("scheme", "http"),
+            "server": parent_scope.get("server"),
+            "client": parent_scope.get("client"),
+            "root_path": parent_scope.get("root_path", ""),
+            "path": url.path,
+            "raw_path": url.path.encode("latin-1"),
+            "query_string": url.query.encode("latin-1"),
+            "headers": headers,
+            "state": {"user": user, "user_id": user["user_id"]},
+        }
+
+        finished = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Streaming responses watch for a disconnect; only report one when done
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        status = 500  # until the app starts a response
+        response_headers: Dict[str, str] = {}
+        chunks = []
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = {
+                    name.decode("latin-1"): value.decode("latin-1") for name, value in message.get("headers", [])
+                }
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await app(scope, receive, send)
+        except Exception as e:
+            # ServerErrorMiddleware re-raises after sending its 500; one failing
+            # sub-request must not fail the whole batch
+            logger.error(f"Batch sub-request {item.method} {item.path} failed: {e}")
+            if not chunks:
+                BATCH_SUBREQUESTS.labels(outcome=str(status)).inc()
+                return _error(item, status, "Internal server error")
+        finally:
+            finished.set()
+
+        BATCH_SUBREQUESTS.labels(outcome=str(status)).inc()
+        raw = b"".join(chunks)
+        response_headers.pop("content-length", None)
+        content = raw.decode("utf-8", errors="replace") if raw else None
+        if content and response_headers.get("content-type", "").startswith("application/json"):
+            try:
+                content = json.loads(raw)
+            except ValueError:
+                pass  # truncated or invalid JSON: return the text as-is
+        return BatchItemResult(id=item.id, status=status, headers=response_headers, body=content)
+
+
+batch_executor = BatchExecutor()
@@ -0,0 +1,181 @@
+"""
+Response cache for read-heavy gateway routes
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from prometheus_client import Counter
+
+from shared.config import settings
+from middleware import credential_identity
+
+CACHE_REQUESTS = Counter(
+    'gateway_cache_requests_total', 'Cacheable gateway requests by outcome', ['route', 'result']
+)
+
+
+class CachePolicy(NamedTuple):
+    """How long a route's GET responses stay fresh and whether they are per caller"""
+    ttl: float
+    vary_by_user: bool
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def cache_policies() -> Dict[str, CachePolicy]:
+    """Cached routes, matched by longest public path prefix"""
+    return {
+        "/api/v1/trading/market-data": CachePolicy(settings.gateway_cache_market_data_ttl, vary_by_user=False),
+        "/api/v1/trading/accounts": CachePolicy(settings.gateway_cache_portfolio_ttl, vary_by_user=True),
+        "/api/v1/documents/documents/": CachePolicy(settings.gateway_cache_document_ttl, vary_by_user=True),
+        "/api/v1/documents/user/": CachePolicy(settings.gateway_cache_document_ttl, vary_by_user=True),
+        "/api/v1/ai/models": CachePolicy(settings.gateway_cache_model_list_ttl, vary_by_user=False),
+    }
+
+
+def make_etag(body: bytes) -> str:
+    """Strong validator derived from the response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 section 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _cacheable(status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> bool:
+    if status_code != 200 or len(body) > settings.gateway_cache_max_body_bytes:
+        return False
+    for name, value in headers:
+        if name == b"set-cookie":
+            return False
+        if name == b"cache-control" and b"no-store" in value.lower():
+            return False
+        if name == b"vary" and b"*" in value:
+            return False
+    return True
+
+
+Fetch = Callable[[], Awaitable[Tuple[int, List[Tuple[bytes, bytes]], bytes]]]
+
+
+class ResponseCache:
+    """In-process TTL cache for upstream GET responses with ETags and request coalescing.
+
+    Entries are keyed by path and query, plus the caller's identity for
+    routes that vary by user. Concurrent misses for the same key share one
+    upstream fetch, so a burst of pollers costs a single backend call. Every
+    cached response carries an ETag and a matching ``If-None-Match`` is
+    answered with 304 and no body. Only 200 responses without
+    ``Set-Cookie`` or ``no-store`` are stored; other results are still shared
+    with the requests coalesced onto them.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, CachePolicy]] = None, max_entries: Optional[int] = None):
+        policies = policies if policies is not None else cache_policies()
+        self.policies = sorted(policies.items(), key=lambda item: len(item[0]), reverse=True)
+        self.max_entries = max_entries or settings.gateway_cache_max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def policy_for(self, request: Request) -> Optional[Tuple[str, CachePolicy]]:
+        """Return (route, policy) when the request may be served from cache"""
+        if not settings.gateway_cache_enabled or request.method not in ("GET", "HEAD"):
+            return None
+        path = request.url.path
+        for prefix, policy in self.policies:
+            if path.startswith(prefix):
+                return prefix, policy
+        return None
+
+    def _key(self, request: Request, policy: CachePolicy) -> str:
+        key = request.url.path
+        if request.url.query:
+            key += "?" + request.url.query
+        if policy.vary_by_user:
+            key += "#" + credential_identity(request.scope)
+        return key
+
+    async def serve(self, request: Request, route: str, policy: CachePolicy, fetch: Fetch) -> Response:
+        """Answer a cacheable request from cache, or through one shared upstream fetch"""
+        key = self._key(request, policy)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            result = "hit"
+        else:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                result = "coalesced"
+            else:
+                result = "miss"
+                inflight = self._inflight[key] = asyncio.ensure_future(self._fill(key, policy, fetch))
+                inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # Shielded so a client disconnecting does not cancel the fetch
+            # other requests are waiting on
+            entry = await asyncio.shield(inflight)
+
+        if entry.status_code == 200 and etag_matches(request.headers.get("if-none-match"), entry.etag):
+            CACHE_REQUESTS.labels(route=route, result="not_modified").inc()
+            return Response(status_code=304, headers={"ETag": entry.etag, "X-Cache": result.upper()})
+
+        CACHE_REQUESTS.labels(route=route, result=result).inc()
+        response = Response(content=entry.body, status_code=entry.status_code)
+        response.raw_headers += entry.headers + [(b"x-cache", result.upper().encode("latin-1"))]
+        return response
+
+    async def _fill(self, key: str, policy: CachePolicy, fetch: Fetch) -> CachedResponse:
+        status_code, headers, body = await fetch()
+
+        etag = ""
+        stored_headers = []
+        for name, value in headers:
+            if name == b"etag":
+                etag = value.decode("latin-1")
+            elif name != b"content-length":
+                stored_headers.append((name, value))
+        if status_code == 200:
+            etag = etag or make_etag(body)
+            stored_headers.append((b"etag", etag.encode("latin-1")))
+
+        entry = CachedResponse(status_code, stored_headers, body, etag, time.monotonic() + policy.ttl)
+        if _cacheable(status_code, headers, body):
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, prefix: str = "") -> int:
+        """Drop cached entries whose key starts with ``prefix``"""
+        stale = [key for key in self._entries if key.startswith(prefix)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,41 @@
+"""
+FastAPI dependencies for gateway routes
+"""
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request, Security
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
+
+from auth import edge_auth
+
+security = HTTPBearer(auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(security)
+) -> Dict[str, Any]:
+    """Authenticate the bearer token at the edge, without a user-service call"""
+    # Batch sub-requests carry the user already authenticated for the batch
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+    user = await edge_auth.authenticate(credentials.credentials)
+    request.state.user_id = user["user_id"]
+    return user
+
+
+async def check_api_key(api_key: Optional[str] = Security(api_key_header)) -> str:
+    """Authenticate an X-API-Key header.
+
+    The gateway has no API key store yet, so every key is rejected rather
+    than trusted unverified.
+    """
+    if api_key is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "ApiKey"})
+    raise HTTPException(status_code=401, detail="Invalid API key", headers={"WWW-Authenticate": "ApiKey"})
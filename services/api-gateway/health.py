@@ -0,0 +1,132 @@
+"""
+Background dependency health checks for the API gateway
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import structlog
+from prometheus_client import Gauge, Histogram
+
+from shared.config import settings
+
+logger = structlog.get_logger()
+
+HEALTH_CHECK_UP = Gauge('gateway_health_check_up', 'Whether a dependency check passed', ['check'])
+HEALTH_CHECK_LATENCY = Histogram(
+    'gateway_health_check_seconds', 'Dependency health check latency', ['check'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+CheckFunction = Callable[[], Awaitable[None]]
+
+
+class HealthCheck(NamedTuple):
+    name: str
+    check: CheckFunction  # returns normally when healthy, raises otherwise
+    timeout: float
+    critical: bool  # a failing critical check makes the gateway unhealthy, others only degrade it
+
+
+class HealthMonitor:
+    """Runs dependency checks concurrently and serves the last aggregate.
+
+    Every check runs in parallel under its own timeout; the combined result
+    is rendered once per refresh, so a probe only returns prebuilt bytes.
+    A background task refreshes every ``interval`` seconds. If the snapshot
+    is older than ``stale_after`` (the task is not running or stuck) the
+    probe refreshes inline, with concurrent probes sharing one refresh.
+    """
+
+    def __init__(self, interval: Optional[float] = None, stale_after: Optional[float] = None):
+        self.interval = interval or settings.health_check_interval
+        self.stale_after = stale_after or settings.health_check_stale_after
+        self.checks: Dict[str, HealthCheck] = {}
+        self._snapshot: Optional[Tuple[float, int, bytes]] = None  # (monotonic time, status code, body)
+        self._refresh_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: CheckFunction, timeout: Optional[float] = None, critical: bool = True):
+        self.checks[name] = HealthCheck(name, check, timeout or settings.health_check_timeout, critical)
+
+    async def _run(self, health_check: HealthCheck) -> Optional[str]:
+        """Return None when healthy, otherwise the failure reason"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(health_check.check(), health_check.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            error = f"timed out after {health_check.timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        HEALTH_CHECK_LATENCY.labels(check=health_check.name).observe(time.perf_counter() - start)
+        HEALTH_CHECK_UP.labels(check=health_check.name).set(0 if error else 1)
+        return error
+
+    async def refresh(self) -> Tuple[int, bytes]:
+        """Run every check now and store the rendered result"""
+        checks = list(self.checks.values())
+        errors = await asyncio.gather(*(self._run(health_check) for health_check in checks))
+
+        status = "healthy"
+        for health_check, error in zip(checks, errors):
+            if error:
+                logger.warning(f"Health check {health_check.name} failed: {error}")
+                if health_check.critical:
+                    status = "unhealthy"
+                elif status == "healthy":
+                    status = "degraded"
+
+        body = {
+            "status": status,
+            "timestamp": time.time(),
+            "services": {
+                health_check.name: "unhealthy" if error else "healthy"
+                for health_check, error in zip(checks, errors)
+            }
+        }
+        failures = {health_check.name: error for health_check, error in zip(checks, errors) if error}
+        if failures:
+            body["errors"] = failures
+
+        status_code = 503 if status == "unhealthy" else 200
+        self._snapshot = (time.monotonic(), status_code, json.dumps(body).encode("utf-8"))
+        return status_code, self._snapshot[2]
+
+    async def current(self) -> Tuple[int, bytes]:
+        """The latest (status code, JSON body), refreshed first only if stale"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot[0] < self.stale_after:
+            return snapshot[1], snapshot[2]
+
+        async with self._refresh_lock:
+            # Another probe may have refreshed while we waited
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - snapshot[0] < self.stale_after:
+                return snapshot[1], snapshot[2]
+            return await self.refresh()
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+health_monitor = HealthMonitor()
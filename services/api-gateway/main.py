@@ -3,15 +3,16 @@ API Gateway - Central entry point for the AI Trading Platform
 """
 import asyncio
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
-from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi import FastAPI, Request, HTTPException, Depends, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
-from prometheus_client import make_asgi_app, Counter, Histogram, Gauge
+from prometheus_client import make_asgi_app
+from sqlalchemy import text
 import structlog
 
 # Import shared modules
@@ -20,11 +21,21 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from shared.config import settings
-from shared.database import init_databases, close_databases
+from shared.database import (
+    init_databases, close_databases, get_redis_client, get_postgres_session, postgresql_manager
+)
 from shared.messaging import messaging_manager
+from shared.dead_letters import DeadLetterManager
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
+
+from proxy import reverse_proxy, ROUTE_PREFIXES
+from cache import response_cache
+from auth import edge_auth
+from health import health_monitor
+from batch import BATCH_PATH, BatchRequest, batch_executor
 
-from routers import auth, trading, ai, payments, documents, users
-from middleware import RateLimitMiddleware, LoggingMiddleware, MetricsMiddleware
+from middleware import RateLimitMiddleware, CompressionMiddleware, LoggingMiddleware, MetricsMiddleware
 from dependencies import get_current_user, check_api_key
 
 
@@ -49,10 +60,7 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Prometheus metrics
-REQUEST_COUNT = Counter('api_requests_total', 'Total API requests', ['method', 'endpoint', 'status'])
-REQUEST_DURATION = Histogram('api_request_duration_seconds', 'API request duration')
-ACTIVE_CONNECTIONS = Gauge('api_active_connections', 'Active connections')
+dead_letter_manager = DeadLetterManager(messaging_manager.rabbitmq)
 
 
 @asynccontextmanager
@@ -61,6 +69,9 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting AI Trading Platform API Gateway")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("api-gateway")
+    
     try:
         # Initialize databases
         await init_databases()
@@ -70,6 +81,16 @@ async def lifespan(app: FastAPI):
         await messaging_manager.initialize()
         logger.info("Messaging system initialized")
         
+        # Pooled upstream clients for the reverse proxy
+        await reverse_proxy.start()
+        
+        # Drop cached user status when the user service reports a change
+        await edge_auth.start(get_redis_client())
+        
+        # Dependency checks run in the background; probes read the result
+        register_health_checks()
+        await health_monitor.start()
+        
         # Additional startup tasks
         await startup_tasks()
         
@@ -82,13 +103,53 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down API Gateway")
         
         try:
+            await loop_monitor.stop()
+            await health_monitor.stop()
+            await edge_auth.stop()
+            await reverse_proxy.close()
             await messaging_manager.close()
+            await postgresql_manager.close()
             await close_databases()
             logger.info("Cleanup completed")
         except Exception as e:
             logger.error(f"Error during shutdown: {e}")
 
 
+SELECT_ONE = text("SELECT 1")
+
+
+async def check_database():
+    async with get_postgres_session() as session:
+        await session.execute(SELECT_ONE)
+
+
+async def check_cache():
+    await get_redis_client().ping()
+
+
+async def check_messaging():
+    if not messaging_manager.initialized:
+        raise RuntimeError("messaging not initialized")
+
+
+def upstream_check(name: str):
+    """Check a backend service's own /health over its pooled proxy client"""
+    async def check():
+        response = await reverse_proxy.clients[name].get("/health")
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} returned {response.status_code}")
+    return check
+
+
+def register_health_checks():
+    """Gateway dependencies are critical; a failing backend only degrades the gateway"""
+    health_monitor.register("database", check_database)
+    health_monitor.register("cache", check_cache)
+    health_monitor.register("messaging", check_messaging)
+    for name in reverse_proxy.upstreams:
+        health_monitor.register(name, upstream_check(name), critical=False)
+
+
 async def startup_tasks():
     """Additional startup tasks"""
     # Warm up connections
@@ -102,6 +163,7 @@ app = FastAPI(
     title="AI Trading Platform API",
     description="An AI-driven platform for trading and crypto workflows",
     version=settings.app_version,
+    default_response_class=FastJSONResponse,
     lifespan=lifespan,
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
@@ -115,7 +177,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Request-ID", "X-Rate-Limit-Remaining"]
+    expose_headers=["X-Request-ID", "X-Rate-Limit-Remaining", "X-Next-Cursor", "ETag", "X-Cache"]
 )
 
 app.add_middleware(
@@ -124,23 +186,16 @@ app.add_middleware(
 )
 
 # Custom middleware
-app.add_middleware(MetricsMiddleware)
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Added last so it is outermost: sees rate-limited requests and sizes on the wire
+app.add_middleware(MetricsMiddleware)
 
 # Add Prometheus metrics endpoint
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
-# Include routers
-app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
-app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
-app.include_router(trading.router, prefix="/api/v1/trading", tags=["trading"])
-app.include_router(ai.router, prefix="/api/v1/ai", tags=["ai"])
-app.include_router(payments.router, prefix="/api/v1/payments", tags=["payments"])
-app.include_router(documents.router, prefix="/api/v1/documents", tags=["documents"])
-
-
 @app.get("/", response_model=Dict[str, Any])
 async def root():
     """Root endpoint with API information"""
@@ -148,54 +203,15 @@ async def root():
         "name": settings.app_name,
         "version": settings.app_version,
         "status": "healthy",
-        "services": {
-            "user_service": "http://user-service:8001",
-            "trading_service": "http://trading-service:8002", 
-            "ai_service": "http://ai-service:8003",
-            "payment_service": "http://payment-service:8004",
-            "notification_service": "http://notification-service:8005",
-            "document_service": "http://document-service:8006"
-        }
+        "services": reverse_proxy.upstreams
     }
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    health_status = {
-        "status": "healthy",
-        "timestamp": asyncio.get_event_loop().time(),
-        "services": {
-            "database": "unknown",
-            "messaging": "unknown",
-            "cache": "unknown"
-        }
-    }
-    
-    try:
-        # Check database connectivity
-        from shared.database import get_postgres_session, get_redis_client
-        
-        async with get_postgres_session() as session:
-            await session.execute("SELECT 1")
-            health_status["services"]["database"] = "healthy"
-        
-        # Check Redis
-        redis_client = get_redis_client()
-        await redis_client.ping()
-        health_status["services"]["cache"] = "healthy"
-        
-        # Check messaging
-        if messaging_manager.initialized:
-            health_status["services"]["messaging"] = "healthy"
-        
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        health_status["status"] = "unhealthy"
-        health_status["error"] = str(e)
-        return JSONResponse(status_code=503, content=health_status)
-    
-    return health_status
+    """Health check endpoint, served from the last background check"""
+    status_code, body = await health_monitor.current()
+    return FastJSONResponse(body, status_code=status_code)
 
 
 @app.get("/api/v1/status")
@@ -213,6 +229,100 @@ async def api_status(current_user: dict = Depends(get_current_user)):
     }
 
 
+def require_admin(current_user: dict):
+    """Reject non-admin users"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+@app.get("/api/v1/admin/dead-letters/{queue}")
+async def inspect_dead_letters(
+    queue: str,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Inspect a queue's dead letters without removing them (admin only)"""
+    require_admin(current_user)
+    
+    try:
+        return {
+            "queue": queue,
+            "depth": await dead_letter_manager.depth(queue),
+            "messages": await dead_letter_manager.inspect(queue, limit)
+        }
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown queue: {queue}")
+
+
+@app.post("/api/v1/admin/dead-letters/{queue}/replay", status_code=202)
+async def replay_dead_letters(
+    queue: str,
+    background_tasks: BackgroundTasks,
+    limit: int = Query(1000, ge=1, le=100000),
+    rate: Optional[float] = Query(None, gt=0, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    """Replay dead letters onto the work queue at a controlled rate (admin only)"""
+    require_admin(current_user)
+    
+    try:
+        depth = await dead_letter_manager.depth(queue)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown queue: {queue}")
+    
+    background_tasks.add_task(dead_letter_manager.replay, queue, limit, rate)
+    logger.info(f"Dead letter replay of {queue} requested by {current_user['user_id']}")
+    
+    return {
+        "queue": queue,
+        "depth": depth,
+        "scheduled": min(depth, limit),
+        "rate": rate or settings.dead_letter_replay_rate
+    }
+
+
+@app.post(BATCH_PATH)
+async def batch(
+    batch_request: BatchRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Run several API requests concurrently and return every result in one response"""
+    if not batch_request.requests:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(batch_request.requests) > batch_executor.max_requests:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds {batch_executor.max_requests} requests"
+        )
+    
+    results = await batch_executor.execute(request.app, request.scope, current_user, batch_request.requests)
+    return {"responses": results}
+
+
+# Registered last so explicit gateway routes take precedence
+@app.api_route(
+    "/api/v1/{service}/{path:path}",
+    methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
+    include_in_schema=False
+)
+async def proxy_to_service(service: str, path: str, request: Request):
+    """Forward /api/v1/<service>/<path> to the owning backend service"""
+    if service not in ROUTE_PREFIXES:
+        raise HTTPException(status_code=404, detail="Not found")
+    upstream, prefix = ROUTE_PREFIXES[service]
+    target = f"{prefix}/{path}"
+    
+    cached = response_cache.policy_for(request)
+    if cached is not None:
+        route, policy = cached
+        return await response_cache.serve(
+            request, route, policy, lambda: reverse_proxy.fetch(request, upstream, target)
+        )
+    
+    return await reverse_proxy.forward(request, upstream, target)
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Custom HTTP exception handler"""
@@ -224,7 +334,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
                 "message": exc.detail,
                 "request_id": request.headers.get("X-Request-ID")
             }
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 
@@ -0,0 +1,570 @@
+"""
+ASGI middleware for the API gateway
+"""
+import gzip
+import hashlib
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import structlog
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.datastructures import Headers, MutableHeaders
+
+from shared.config import settings
+from shared.rate_limit import RateLimiter, RateLimitPolicy
+
+from auth import edge_auth
+
+# Optional codecs; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = structlog.get_logger()
+
+# Paths never rate limited (probes and scraping)
+RATE_LIMIT_EXEMPT_PATHS = ("/health", "/metrics")
+
+COMPRESSED_BYTES = Counter(
+    'gateway_compression_bytes_total', 'Response bytes before and after compression', ['encoding', 'stage']
+)
+COMPRESSION_CACHE = Counter('gateway_compression_cache_total', 'Compressed body cache lookups', ['result'])
+
+REQUEST_COUNT = Counter('api_requests_total', 'Total API requests', ['method', 'endpoint', 'status'])
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds', 'API request duration by route template', ['method', 'endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10, 30, 60)
+)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+REQUEST_SIZE = Histogram(
+    'api_request_size_bytes', 'API request body size by route template', ['method', 'endpoint'], buckets=SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'API response body size by route template', ['method', 'endpoint'], buckets=SIZE_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge('api_requests_in_flight', 'Requests being handled', ['method'])
+# Deprecated: kept for existing dashboards. It counts requests being handled,
+# not client connections, i.e. the sum of api_requests_in_flight over methods
+ACTIVE_CONNECTIONS = Gauge(
+    'api_active_connections', 'Requests being handled across all methods (deprecated, use api_requests_in_flight)'
+)
+
+# Label for requests that matched no route, so scans cannot create new series
+UNMATCHED_ROUTE = "unmatched"
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "application/x-ndjson",
+    "image/svg+xml"
+)
+
+
+def identity_policies():
+    """Default bucket per kind of caller"""
+    return {
+        "anonymous": RateLimitPolicy.per_minute("anonymous", settings.rate_limit_anonymous_per_minute),
+        "user": RateLimitPolicy.per_minute("user", settings.rate_limit_user_per_minute),
+        "api_key": RateLimitPolicy.per_minute("api_key", settings.rate_limit_api_key_per_minute),
+    }
+
+
+def route_policies():
+    """Stricter buckets for sensitive routes, matched by longest path prefix"""
+    auth = RateLimitPolicy.per_minute("auth", settings.rate_limit_auth_per_minute)
+    return {
+        "/api/v1/auth/login": auth,
+        "/api/v1/auth/register": auth,
+    }
+
+
+def _digest(secret: str) -> str:
+    """Stable bucket id for a credential without storing the credential"""
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()[:32]
+
+
+def _credentials(scope) -> Tuple[Optional[str], Optional[str]]:
+    """The (API key, bearer token) presented with a request, unverified"""
+    api_key = token = None
+    for name, value in scope["headers"]:
+        if name == b"x-api-key":
+            api_key = value.decode("latin-1")
+        elif name == b"authorization":
+            authorization = value.decode("latin-1")
+            if authorization[:7].lower() == "bearer ":
+                token = authorization[7:]
+    return api_key, token
+
+
+def _client_ip(scope) -> str:
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def credential_identity(scope) -> str:
+    """Opaque key for the credential a request presents, without verifying it.
+
+    Distinct credentials never share a key, which is what per-caller response
+    caches need. Anyone can mint new keys by sending new credentials, so it
+    must not be used for limits.
+    """
+    user_id = scope.get("state", {}).get("user_id")
+    if user_id:
+        return f"user:{user_id}"
+    api_key, token = _credentials(scope)
+    if api_key:
+        return f"key:{_digest(api_key)}"
+    if token:
+        return f"token:{_digest(token)}"
+    return _client_ip(scope)
+
+
+def identify(scope, authenticator=None, api_key_verifier: Optional[Callable[[str], bool]] = None) -> Tuple[str, str]:
+    """Return (kind, identity) for the caller of an ASGI request.
+
+    Only verified credentials earn a per-user or per-key bucket: a user id
+    set on the request state by gateway authentication, a bearer token whose
+    signature ``authenticator`` accepts (claims are cached, so this is a
+    dict lookup for known tokens), or an API key ``api_key_verifier``
+    accepts. Everything else is keyed by client address, so rotating made-up
+    credentials does not buy a fresh bucket.
+    """
+    user_id = scope.get("state", {}).get("user_id")
+    if user_id:
+        return "user", f"user:{user_id}"
+
+    api_key, token = _credentials(scope)
+    if api_key and api_key_verifier is not None and api_key_verifier(api_key):
+        return "api_key", f"key:{_digest(api_key)}"
+    if token and authenticator is not None:
+        try:
+            return "user", f"user:{authenticator.decode(token)['sub']}"
+        except HTTPException:
+            pass
+
+    return "anonymous", _client_ip(scope)
+
+
+class RateLimitMiddleware:
+    """Per-user, per-API-key and per-route token bucket limits shared across replicas.
+
+    Allowed responses carry ``X-Rate-Limit-Remaining``; denied requests get a
+    429 with ``Retry-After`` before reaching any route.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, authenticator=None,
+                 api_key_verifier: Optional[Callable[[str], bool]] = None):
+        self.app = app
+        self.limiter = limiter
+        self.authenticator = authenticator or edge_auth
+        # No API key store exists yet, so API keys are not trusted for their own bucket
+        self.api_key_verifier = api_key_verifier
+        self.identity_policies = identity_policies()
+        self.route_policies = sorted(route_policies().items(), key=lambda item: len(item[0]), reverse=True)
+
+    def policy_for(self, kind: str, path: str) -> RateLimitPolicy:
+        for prefix, policy in self.route_policies:
+            if path.startswith(prefix):
+                return policy
+        return self.identity_policies[kind]
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not settings.rate_limit_enabled or path.startswith(RATE_LIMIT_EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter is None:
+            # Redis is connected during lifespan startup, after middleware is built
+            from shared.database import get_redis_client
+            self.limiter = RateLimiter(get_redis_client())
+
+        kind, identity = identify(scope, self.authenticator, self.api_key_verifier)
+        result = await self.limiter.check(identity, self.policy_for(kind, path))
+        remaining = str(result.remaining).encode("latin-1")
+
+        if not result.allowed:
+            retry_after = max(1, int(result.retry_after + 0.999))
+            request_id = dict(scope["headers"]).get(b"x-request-id")
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "error": {
+                        "code": 429,
+                        "message": "Rate limit exceeded",
+                        "request_id": request_id.decode("latin-1") if request_id else None
+                    }
+                },
+                headers={"Retry-After": str(retry_after), "X-Rate-Limit-Remaining": "0"}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_remaining(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-rate-limit-remaining", remaining)]
+            await send(message)
+
+        await self.app(scope, receive, send_with_remaining)
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported content codings in order of preference"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], encodings: Tuple[str, ...]) -> Optional[str]:
+    """Pick the best of ``encodings`` for an Accept-Encoding header (RFC 9110 section 12.5.3)"""
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    return (
+        "content-encoding" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and "no-transform" not in headers.get("cache-control", "").lower()
+    )
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a complete body"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.gateway_compression_zstd_level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.gateway_compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.gateway_compression_gzip_level, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes every chunk so streamed data is not held back"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=settings.gateway_compression_zstd_level).compressobj()
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.gateway_compression_brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(settings.gateway_compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Negotiates zstd, brotli or gzip for compressible responses.
+
+    Bodies smaller than ``minimum_size`` (known from Content-Length or a
+    single body message) are sent as-is. Streaming responses are compressed
+    chunk by chunk. Complete responses carrying an ETag - such as the
+    response cache's - keep their compressed form in a small LRU, so hot
+    cached payloads are compressed once. ETags are only unique per
+    resource, so entries are keyed by path, query, caller, the request
+    headers the response varies on, ETag and encoding. Strong
+    ETags are weakened on compressed responses, as the bytes differ from
+    the identity representation while ``If-None-Match`` still matches.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None, cache_entries: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.gateway_compression_min_size
+        self.cache_entries = cache_entries if cache_entries is not None else settings.gateway_compression_cache_entries
+        self.encodings = available_encodings()
+        self._cache: "OrderedDict[Tuple, bytes]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.gateway_compression_enabled or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        headers = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, headers, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                content_length = headers.get("content-length")
+                if (not _compressible(headers) or message["status"] in (204, 304)
+                        or (content_length is not None and int(content_length) < self.minimum_size)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body:
+                    # Whole body in one message
+                    passthrough = True
+                    if len(body) < self.minimum_size:
+                        await send(start)
+                        await send(message)
+                        return
+                    key = self._cache_key(scope, headers, encoding) if start["status"] == 200 else None
+                    compressed = self._compress_complete(body, encoding, key)
+                    self._set_encoding_headers(headers, encoding)
+                    headers["content-length"] = str(len(compressed))
+                    await send({**start, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                compressor = StreamCompressor(encoding)
+                self._set_encoding_headers(headers, encoding)
+                del headers["content-length"]
+                await send({**start, "headers": headers.raw})
+
+            chunk = compressor.compress(body) if body else b""
+            if not more_body:
+                chunk += compressor.finish()
+            COMPRESSED_BYTES.labels(encoding=encoding, stage="in").inc(len(body))
+            COMPRESSED_BYTES.labels(encoding=encoding, stage="out").inc(len(chunk))
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _set_encoding_headers(self, headers: MutableHeaders, encoding: str):
+        headers["content-encoding"] = encoding
+        vary = headers.get("vary")
+        if not vary:
+            headers["vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["vary"] = f"{vary}, Accept-Encoding"
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+
+    def _cache_key(self, scope, headers: MutableHeaders, encoding: str) -> Optional[Tuple]:
+        etag = headers.get("etag")
+        if not etag or not self.cache_entries:
+            return None
+        vary = [name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()]
+        if "*" in vary:
+            return None
+        request_headers = Headers(scope=scope)
+        varied = tuple(request_headers.get(name) for name in vary if name != "accept-encoding")
+        return (scope["path"], scope.get("query_string", b""), credential_identity(scope), varied, etag, encoding)
+
+    def _compress_complete(self, body: bytes, encoding: str, key: Optional[Tuple]) -> bytes:
+        if key is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                COMPRESSION_CACHE.labels(result="hit").inc()
+                return cached
+            COMPRESSION_CACHE.labels(result="miss").inc()
+
+        compressed = compress(body, encoding)
+        COMPRESSED_BYTES.labels(encoding=encoding, stage="in").inc(len(body))
+        COMPRESSED_BYTES.labels(encoding=encoding, stage="out").inc(len(compressed))
+
+        if key is not None:
+            self._cache[key] = compressed
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return compressed
+
+
+class MetricsMiddleware:
+    """Per-route request metrics, cheap enough to record on every request.
+
+    Requests are labelled by route template (``/api/v1/trading/orders/{order_id}``)
+    rather than raw path; the template is looked up from the endpoint the
+    router matched, and path parameters listed in ``expand_params`` (such as
+    the proxy's ``{service}``) are filled in for non-404 responses. The
+    labelled metric children are cached per (method, template, status) so a
+    request costs a few dict lookups and observations. Event-loop lag is
+    reported by ``shared.diagnostics.loop_monitor``.
+    """
+
+    def __init__(self, app, expand_params: Tuple[str, ...] = ("service",)):
+        self.app = app
+        self.expand_params = expand_params
+        self._templates: Dict[Any, str] = {}
+        self._children: Dict[Tuple[str, str], Tuple[Any, Any, Any]] = {}
+        self._counters: Dict[Tuple[str, str, int], Any] = {}
+
+    def _template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        template = self._templates.get(endpoint)
+        if template is None:
+            app = scope.get("app")
+            for route in getattr(app, "routes", ()):
+                self._templates[getattr(route, "endpoint", None) or route.app] = route.path
+            template = self._templates.setdefault(endpoint, UNMATCHED_ROUTE)
+        return template
+
+    def _label(self, scope, status: int) -> str:
+        template = self._template(scope)
+        if status != 404 and self.expand_params and "{" in template:
+            for name, value in scope.get("path_params", {}).items():
+                if name in self.expand_params:
+                    template = template.replace(f"{{{name}}}", str(value))
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        request_size = 0
+        response_size = 0
+        content_length = Headers(scope=scope).get("content-length")
+        counted = content_length is None or not content_length.isdigit()
+
+        async def receive_counted():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method=method)
+        in_flight.inc()
+        ACTIVE_CONNECTIONS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_counted if counted else receive, send_counted)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            ACTIVE_CONNECTIONS.dec()
+            if not counted:
+                request_size = int(content_length)
+
+            endpoint = self._label(scope, status)
+            children = self._children.get((method, endpoint))
+            if children is None:
+                children = self._children[(method, endpoint)] = (
+                    REQUEST_DURATION.labels(method=method, endpoint=endpoint),
+                    REQUEST_SIZE.labels(method=method, endpoint=endpoint),
+                    RESPONSE_SIZE.labels(method=method, endpoint=endpoint),
+                )
+            counter = self._counters.get((method, endpoint, status))
+            if counter is None:
+                counter = self._counters[(method, endpoint, status)] = REQUEST_COUNT.labels(
+                    method=method, endpoint=endpoint, status=str(status)
+                )
+
+            children[0].observe(elapsed)
+            children[1].observe(request_size)
+            children[2].observe(response_size)
+            counter.inc()
+
+
+class LoggingMiddleware:
+    """Tags each request with an ``X-Request-ID`` and logs it once it completes.
+
+    A request ID sent by the client is kept; otherwise one is generated and
+    added to the request headers, so handlers, error responses and upstream
+    services all see the same ID. The ID is echoed on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id")
+        if not request_id:
+            request_id = uuid.uuid4().hex
+            scope = {**scope, "headers": [*scope["headers"], (b"x-request-id", request_id.encode("latin-1"))]}
+
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                headers["x-request-id"] = request_id
+                message = {**message, "headers": headers.raw}
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            logger.info(
+                "request",
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=round((time.perf_counter() - start) * 1000, 2),
+                request_id=request_id
+            )
@@ -0,0 +1,236 @@
+"""
+Streaming reverse proxy from the API gateway to the backend services
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import structlog
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter, Histogram
+from starlette.background import BackgroundTask
+
+from shared.config import settings
+from resilience import UpstreamGuard
+
+logger = structlog.get_logger()
+
+# Upstream metrics
+UPSTREAM_REQUESTS = Counter(
+    'gateway_upstream_requests_total', 'Requests forwarded to backend services', ['upstream', 'status']
+)
+UPSTREAM_LATENCY = Histogram(
+    'gateway_upstream_latency_seconds', 'Time until an upstream returns response headers', ['upstream'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+# Connection-level headers that must not be forwarded (RFC 9110 section 7.6.1)
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'proxy-connection', 'te', 'trailer', 'transfer-encoding', 'upgrade'
+})
+
+
+def default_upstreams() -> Dict[str, str]:
+    """Backend base URLs by upstream name"""
+    return {
+        "user_service": settings.user_service_url,
+        "trading_service": settings.trading_service_url,
+        "ai_service": settings.ai_service_url,
+        "payment_service": settings.payment_service_url,
+        "notification_service": settings.notification_service_url,
+        "document_service": settings.document_service_url
+    }
+
+
+# Public API path segment -> (upstream that owns it, path prefix on the upstream)
+ROUTE_PREFIXES = {
+    "auth": ("user_service", ""),
+    "users": ("user_service", "/users"),
+    "trading": ("trading_service", ""),
+    "ai": ("ai_service", ""),
+    "payments": ("payment_service", ""),
+    "notifications": ("notification_service", ""),
+    "documents": ("document_service", "")
+}
+
+
+def _forwardable(raw_headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Drop hop-by-hop headers, including any named by the Connection header"""
+    connection_tokens = {
+        token.strip().lower()
+        for name, value in raw_headers if name.lower() == b'connection'
+        for token in value.decode('latin-1').split(',')
+    }
+    dropped = HOP_BY_HOP_HEADERS | connection_tokens
+    return [
+        (name.lower(), value) for name, value in raw_headers
+        if name.decode('latin-1').lower() not in dropped
+    ]
+
+
+class ReverseProxy:
+    """Forwards gateway requests to backend services over pooled keep-alive clients.
+
+    Each upstream gets its own ``httpx.AsyncClient`` so connection limits and
+    keep-alive pools are isolated per service. Request bodies are streamed to
+    the upstream as they arrive and response bodies are streamed back
+    undecoded, so the gateway never holds a full body in memory.
+    """
+
+    def __init__(self, upstreams: Optional[Dict[str, str]] = None):
+        self.upstreams = upstreams if upstreams is not None else default_upstreams()
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.guards: Dict[str, UpstreamGuard] = {}
+
+    def _create_guard(self, name: str) -> UpstreamGuard:
+        max_timeout = settings.gateway_upstream_read_timeouts.get(name, settings.gateway_upstream_read_timeout)
+        return UpstreamGuard(name, max_timeout)
+
+    def _create_client(self, base_url: str, transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            http2=settings.gateway_upstream_http2,
+            limits=httpx.Limits(
+                max_connections=settings.gateway_upstream_max_connections,
+                max_keepalive_connections=settings.gateway_upstream_max_keepalive,
+                keepalive_expiry=settings.gateway_upstream_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                settings.gateway_upstream_read_timeout,
+                connect=settings.gateway_upstream_connect_timeout,
+                pool=settings.gateway_upstream_pool_timeout
+            ),
+            transport=transport,
+            follow_redirects=False
+        )
+
+    def add_upstream(self, name: str, base_url: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Register (or replace) an upstream and its client"""
+        self.upstreams[name] = base_url
+        self.clients[name] = self._create_client(base_url, transport)
+        self.guards[name] = self._create_guard(name)
+
+    async def start(self):
+        """Create one pooled client per upstream"""
+        for name, base_url in self.upstreams.items():
+            if name not in self.clients:
+                self.clients[name] = self._create_client(base_url)
+                self.guards[name] = self._create_guard(name)
+        logger.info(f"Reverse proxy ready for {len(self.clients)} upstreams")
+
+    def _upstream_headers(self, request: Request) -> List[Tuple[bytes, bytes]]:
+        headers = [(name, value) for name, value in _forwardable(request.headers.raw) if name != b'host']
+
+        client_host = request.client.host if request.client else None
+        if client_host:
+            prior = request.headers.get('x-forwarded-for')
+            forwarded_for = f"{prior}, {client_host}" if prior else client_host
+            headers = [(name, value) for name, value in headers if name != b'x-forwarded-for']
+            headers.append((b'x-forwarded-for', forwarded_for.encode('latin-1')))
+
+        headers.append((b'x-forwarded-proto', request.url.scheme.encode('latin-1')))
+        if 'host' in request.headers:
+            headers.append((b'x-forwarded-host', request.headers['host'].encode('latin-1')))
+        return headers
+
+    async def _send(self, request: Request, upstream: str, path: str, method: Optional[str] = None) -> httpx.Response:
+        """Send a request to ``path`` on an upstream and return once headers arrive.
+
+        The call goes through the upstream's guard (circuit breaker, bulkhead
+        and adaptive timeout); bodiless GET and HEAD requests may be hedged.
+        The adaptive timeout bounds the wait for response headers only; the
+        body is read under the upstream's static read timeout, so long
+        streaming responses are not cut off.
+        """
+        client = self.clients.get(upstream)
+        if client is None:
+            raise HTTPException(status_code=502, detail=f"Unknown upstream: {upstream}")
+
+        # Only stream a request body when the client actually sent one, so
+        # bodiless requests are not turned into chunked uploads
+        has_body = method is None and ('content-length' in request.headers or 'transfer-encoding' in request.headers)
+        method = method or request.method
+        url = httpx.URL(path='/' + path.lstrip('/'), query=request.url.query.encode('latin-1'))
+        headers = self._upstream_headers(request)
+        read_timeout = self.guards[upstream].max_timeout
+
+        async def send(timeout: float) -> httpx.Response:
+            upstream_request = client.build_request(
+                method,
+                url,
+                headers=headers,
+                content=request.stream() if has_body else None,
+                timeout=httpx.Timeout(
+                    read_timeout,
+                    connect=settings.gateway_upstream_connect_timeout,
+                    pool=settings.gateway_upstream_pool_timeout
+                )
+            )
+            try:
+                return await asyncio.wait_for(client.send(upstream_request, stream=True), timeout)
+            except asyncio.TimeoutError:
+                raise httpx.ReadTimeout(
+                    f"No response headers within {timeout:.3f}s", request=upstream_request
+                ) from None
+
+        start = time.perf_counter()
+        try:
+            response = await self.guards[upstream].call(send, idempotent=method in ("GET", "HEAD") and not has_body)
+        except httpx.TimeoutException as e:
+            UPSTREAM_LATENCY.labels(upstream=upstream).observe(time.perf_counter() - start)
+            UPSTREAM_REQUESTS.labels(upstream=upstream, status="timeout").inc()
+            logger.warning(f"Upstream {upstream} timed out: {e!r}")
+            raise HTTPException(status_code=504, detail=f"Upstream {upstream} timed out")
+        except httpx.TransportError as e:
+            UPSTREAM_LATENCY.labels(upstream=upstream).observe(time.perf_counter() - start)
+            UPSTREAM_REQUESTS.labels(upstream=upstream, status="error").inc()
+            logger.warning(f"Upstream {upstream} unavailable: {e!r}")
+            raise HTTPException(status_code=502, detail=f"Upstream {upstream} unavailable")
+
+        UPSTREAM_LATENCY.labels(upstream=upstream).observe(time.perf_counter() - start)
+        UPSTREAM_REQUESTS.labels(upstream=upstream, status=str(response.status_code)).inc()
+        return response
+
+    async def forward(self, request: Request, upstream: str, path: str) -> StreamingResponse:
+        """Forward a request to ``path`` on an upstream and stream the response back"""
+        response = await self._send(request, upstream, path)
+
+        # Raw bytes pass through still encoded, so Content-Encoding and
+        # Content-Length from the upstream stay valid. Headers are copied as a
+        # list to keep repeated ones such as Set-Cookie
+        proxied = StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            background=BackgroundTask(response.aclose)
+        )
+        proxied.raw_headers = _forwardable(response.headers.raw)
+        return proxied
+
+    async def fetch(self, request: Request, upstream: str, path: str) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        """GET ``path`` from an upstream and return its status, headers and whole raw body.
+
+        Used for cacheable responses, which must be buffered; the request's
+        own method and body are ignored so a HEAD can be answered from a GET.
+        """
+        response = await self._send(request, upstream, path, method="GET")
+        try:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        except httpx.TransportError as e:
+            logger.warning(f"Upstream {upstream} failed mid-response: {e!r}")
+            raise HTTPException(status_code=502, detail=f"Upstream {upstream} unavailable")
+        finally:
+            await response.aclose()
+        return response.status_code, _forwardable(response.headers.raw), body
+
+    async def close(self):
+        """Close every upstream client and its pooled connections"""
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+        self.guards.clear()
+
+
+reverse_proxy = ReverseProxy()
@@ -0,0 +1,287 @@
+"""
+Circuit breakers, adaptive timeouts, hedging and bulkheads for gateway upstreams
+"""
+import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Awaitable, Callable, Optional
+
+import httpx
+import structlog
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge
+
+from shared.config import settings
+
+logger = structlog.get_logger()
+
+# Resilience metrics
+BREAKER_STATE = Gauge(
+    'gateway_circuit_breaker_state', 'Circuit breaker state (0 closed, 1 open, 2 half-open)', ['upstream']
+)
+BREAKER_TRANSITIONS = Counter(
+    'gateway_circuit_breaker_transitions_total', 'Circuit breaker state changes', ['upstream', 'state']
+)
+UPSTREAM_REJECTIONS = Counter(
+    'gateway_upstream_rejections_total', 'Requests refused without calling the upstream', ['upstream', 'reason']
+)
+UPSTREAM_TIMEOUT = Gauge(
+    'gateway_upstream_timeout_seconds', 'Current adaptive upstream timeout', ['upstream']
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'gateway_upstream_in_flight', 'Upstream calls holding a bulkhead slot', ['upstream']
+)
+HEDGED_REQUESTS = Counter(
+    'gateway_hedged_requests_total', 'Hedged upstream requests by which attempt answered', ['upstream', 'winner']
+)
+
+Send = Callable[[float], Awaitable[httpx.Response]]
+
+
+class BreakerState(IntEnum):
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    """Failure-ratio circuit breaker over the last ``window`` calls.
+
+    Opens when at least ``min_calls`` outcomes are recorded and the share of
+    failures reaches ``failure_ratio``. After ``open_seconds`` one probe is
+    let through (half-open); its success closes the breaker and its failure
+    reopens it.
+    """
+
+    def __init__(self, name: str, failure_ratio: Optional[float] = None, min_calls: Optional[int] = None,
+                 window: Optional[int] = None, open_seconds: Optional[float] = None):
+        self.name = name
+        self.failure_ratio = failure_ratio or settings.gateway_breaker_failure_ratio
+        self.min_calls = min_calls or settings.gateway_breaker_min_calls
+        self.open_seconds = open_seconds if open_seconds is not None else settings.gateway_breaker_open_seconds
+        self.outcomes = deque(maxlen=window or settings.gateway_breaker_window)
+        self.state = BreakerState.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        BREAKER_STATE.labels(upstream=name).set(self.state)
+
+    def _transition(self, state: BreakerState):
+        if state == self.state:
+            return
+        self.state = state
+        BREAKER_STATE.labels(upstream=self.name).set(state)
+        BREAKER_TRANSITIONS.labels(upstream=self.name, state=state.name.lower()).inc()
+        logger.warning(f"Circuit breaker for {self.name} is now {state.name.lower()}")
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream now"""
+        if self.state == BreakerState.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self._transition(BreakerState.HALF_OPEN)
+        if self.state == BreakerState.HALF_OPEN:
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def record(self, success: bool):
+        if self.state == BreakerState.HALF_OPEN:
+            self.probe_in_flight = False
+            if success:
+                self.outcomes.clear()
+                self._transition(BreakerState.CLOSED)
+            else:
+                self._open()
+            return
+        if self.state == BreakerState.OPEN:
+            return  # late result of a call started before the breaker opened
+
+        self.outcomes.append(success)
+        if len(self.outcomes) >= self.min_calls:
+            failures = self.outcomes.count(False)
+            if failures / len(self.outcomes) >= self.failure_ratio:
+                self._open()
+
+    def release(self):
+        """Forget an allowed call that ended without an outcome (e.g. cancelled)"""
+        if self.state == BreakerState.HALF_OPEN:
+            self.probe_in_flight = False
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self._transition(BreakerState.OPEN)
+
+
+class LatencyTracker:
+    """Recent upstream latencies for percentile estimates"""
+
+    def __init__(self, size: int = 512, min_samples: int = 20, refresh_every: int = 16):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._sorted = []
+        self._stale = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The ``q`` quantile (0..1) of recent samples, or None while warming up"""
+        if len(self.samples) < self.min_samples:
+            return None
+        # Re-sorting on every call would cost more than the request; a
+        # snapshot a few samples old is accurate enough
+        if self._stale >= self.refresh_every or len(self._sorted) < self.min_samples:
+            self._sorted = sorted(self.samples)
+            self._stale = 0
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+def _discard(task: asyncio.Future):
+    """Cancel a losing attempt and close its response if it still arrives"""
+    def close(finished):
+        if not finished.cancelled() and finished.exception() is None:
+            asyncio.ensure_future(finished.result().aclose())
+
+    if task.done():
+        close(task)
+    else:
+        task.cancel()
+        task.add_done_callback(close)
+
+
+class UpstreamGuard:
+    """Protects the gateway from one slow or failing upstream.
+
+    * Circuit breaker: failing upstreams are refused with 503 immediately
+      instead of tying up gateway workers.
+    * Adaptive timeout: ``multiplier`` x the observed p99 time to response
+      headers, clamped between ``min_timeout`` and the upstream's
+      ``max_timeout``. The ceiling applies until enough samples exist. It
+      bounds the wait for headers only, not reading the body.
+    * Bulkhead: at most ``max_concurrent`` calls in flight; callers wait up
+      to ``queue_timeout`` for a slot, then get 503.
+    * Hedging: an idempotent request still waiting after the observed hedge
+      percentile gets a second attempt, if a bulkhead slot is free and the
+      hedge budget (a fraction of calls) is not spent. The first good
+      response wins and the other attempt is cancelled.
+
+    A call fails for the breaker on a transport error, timeout or 5xx
+    response. Slots are held until response headers arrive.
+    """
+
+    def __init__(self, name: str, max_timeout: float, breaker: Optional[CircuitBreaker] = None,
+                 max_concurrent: Optional[int] = None, queue_timeout: Optional[float] = None):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = settings.gateway_adaptive_timeout_min
+        self.multiplier = settings.gateway_adaptive_timeout_multiplier
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.max_concurrent = max_concurrent or settings.gateway_bulkhead_max_concurrent
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.gateway_bulkhead_queue_timeout
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self.calls = 0
+        self.hedges = 0
+        UPSTREAM_TIMEOUT.labels(upstream=name).set(max_timeout)
+
+    def timeout(self) -> float:
+        p99 = self.latency.percentile(0.99)
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.multiplier))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not settings.gateway_hedge_enabled or self.hedges >= settings.gateway_hedge_budget * self.calls:
+            return None
+        return self.latency.percentile(settings.gateway_hedge_percentile)
+
+    def _reject(self, reason: str, detail: str, retry_after: float):
+        UPSTREAM_REJECTIONS.labels(upstream=self.name, reason=reason).inc()
+        raise HTTPException(
+            status_code=503, detail=detail, headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
+
+    async def call(self, send: Send, idempotent: bool = False) -> httpx.Response:
+        """Run ``send(timeout)`` under the breaker, bulkhead and, if idempotent, hedging"""
+        if not self.breaker.allow():
+            self._reject("circuit_open", f"Upstream {self.name} unavailable", self.breaker.retry_after())
+
+        recorded = False
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("bulkhead_full", f"Upstream {self.name} overloaded", self.queue_timeout)
+
+            UPSTREAM_IN_FLIGHT.labels(upstream=self.name).inc()
+            self.calls += 1
+            timeout = self.timeout()
+            UPSTREAM_TIMEOUT.labels(upstream=self.name).set(timeout)
+            start = time.perf_counter()
+            try:
+                response = await (self._hedged(send, timeout) if idempotent else send(timeout))
+            except httpx.TransportError:
+                self.breaker.record(False)
+                recorded = True
+                raise
+            finally:
+                self._slots.release()
+                UPSTREAM_IN_FLIGHT.labels(upstream=self.name).dec()
+
+            success = response.status_code < 500
+            if success:
+                self.latency.observe(time.perf_counter() - start)
+            self.breaker.record(success)
+            recorded = True
+            return response
+        finally:
+            if not recorded:
+                self.breaker.release()
+
+    async def _hedged(self, send: Send, timeout: float) -> httpx.Response:
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(send(timeout))
+        if delay is None:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            _discard(primary)
+            raise
+        if done or self._slots.locked():
+            return await primary
+
+        # Not locked, so this takes a slot without waiting
+        await self._slots.acquire()
+        self.hedges += 1
+        backup = asyncio.ensure_future(send(timeout))
+        winner = None
+        try:
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        winner = task
+                        HEDGED_REQUESTS.labels(
+                            upstream=self.name, winner="primary" if task is primary else "hedge"
+                        ).inc()
+                        return task.result()
+            # Both attempts failed; report the original one
+            winner = primary
+            HEDGED_REQUESTS.labels(upstream=self.name, winner="none").inc()
+            return primary.result()
+        finally:
+            self._slots.release()
+            for task in (primary, backup):
+                if task is not winner:
+                    _discard(task)
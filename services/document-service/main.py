@@ -1,8 +1,8 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Tuple
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -32,12 +32,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from shared.config import settings
 from shared.database import postgresql_manager, mongodb_manager
-from shared.messaging import hybrid_messaging_manager
+from shared.messaging import hybrid_messaging_manager, Priority
+from shared.pagination import KeysetPaginator, InvalidCursorError, NEXT_CURSOR_HEADER
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Documents up to this size jump ahead of large files in the processing queue
+SMALL_DOCUMENT_BYTES = 1024 * 1024
+
 # Enums
 class DocumentType(str, Enum):
     PDF = "pdf"
@@ -374,17 +380,25 @@ class ImageProcessor:
             logger.error(f"Error processing image: {e}")
             raise
 
+DOCUMENT_PROCESSORS = {
+    DocumentType.PDF: PDFProcessor(),
+    DocumentType.DOCX: DOCXProcessor(),
+    DocumentType.DOC: DOCXProcessor(),  # Use same processor
+    DocumentType.HTML: HTMLProcessor(),
+    DocumentType.TXT: TXTProcessor(),
+    DocumentType.IMAGE: ImageProcessor()
+}
+
+def extract_document_content(document_type: DocumentType, file_path: str) -> Dict[str, Any]:
+    """Extract content in a worker process so CPU-heavy parsing never blocks the event loop"""
+    processor = DOCUMENT_PROCESSORS[document_type]
+    return asyncio.run(processor.extract_content(file_path)).dict()
+
 # Document Manager
 class DocumentManager:
     def __init__(self):
-        self.processors = {
-            DocumentType.PDF: PDFProcessor(),
-            DocumentType.DOCX: DOCXProcessor(),
-            DocumentType.DOC: DOCXProcessor(),  # Use same processor
-            DocumentType.HTML: HTMLProcessor(),
-            DocumentType.TXT: TXTProcessor(),
-            DocumentType.IMAGE: ImageProcessor()
-        }
+        self.processors = DOCUMENT_PROCESSORS
+        self.paginator = KeysetPaginator("documents")
         self.upload_dir = "/tmp/document_uploads"
         os.makedirs(self.upload_dir, exist_ok=True)
 
@@ -431,7 +445,7 @@ class DocumentManager:
             await self._store_file_content(document_id, file_content, file.filename)
             
             # Queue for processing
-            await self._queue_processing(document_id, temp_file_path)
+            await self._queue_processing(document_id, temp_file_path, document_info.file_size)
             
             return document_info
             
@@ -490,16 +504,16 @@ class DocumentManager:
         
         await collection.insert_one(document)
 
-    async def _queue_processing(self, document_id: str, file_path: str):
+    async def _queue_processing(self, document_id: str, file_path: str, file_size: int):
         """Queue document for processing"""
-        await hybrid_messaging_manager.publish_message(
-            exchange="documents",
-            routing_key="process.document",
-            message={
+        await hybrid_messaging_manager.dispatch(
+            "document_uploaded",
+            {
                 "document_id": document_id,
                 "file_path": file_path,
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            },
+            priority=Priority.HIGH if file_size <= SMALL_DOCUMENT_BYTES else Priority.LOW
         )
 
     async def process_document(self, document_id: str, file_path: str) -> ProcessingResult:
@@ -520,7 +534,9 @@ class DocumentManager:
             if not processor:
                 raise ValueError(f"No processor for document type: {document_info.document_type}")
             
-            extracted_content = await processor.extract_content(file_path)
+            extracted_content = ExtractedContent(**await hybrid_messaging_manager.run_in_process(
+                extract_document_content, document_info.document_type, file_path
+            ))
             
             # Update document with extracted content
             await self._update_extracted_content(document_id, extracted_content)
@@ -625,16 +641,13 @@ class DocumentManager:
         
         return None
 
-    async def get_user_documents(self, user_id: str) -> List[DocumentInfo]:
-        """Get documents for user"""
-        query = """
-            SELECT * FROM documents 
-            WHERE user_id = $1 
-            ORDER BY created_at DESC
-        """
-        
+    async def get_user_documents(self, user_id: str, cursor: Optional[str] = None,
+                                 limit: Optional[int] = None) -> Tuple[List[DocumentInfo], Optional[str]]:
+        """Get one page of documents for user, newest first"""
         async with postgresql_manager.get_connection() as conn:
-            results = await conn.fetch(query, user_id)
+            results, next_cursor = await self.paginator.fetch_page(
+                conn, filters={"user_id": user_id}, cursor=cursor, limit=limit
+            )
             
             documents = []
             for row in results:
@@ -643,7 +656,7 @@ class DocumentManager:
                     data['metadata'] = json.loads(data['metadata'])
                 documents.append(DocumentInfo(**data))
             
-            return documents
+            return documents, next_cursor
 
     async def search_documents(self, search_params: DocumentSearch) -> List[Dict[str, Any]]:
         """Search documents"""
@@ -678,9 +691,11 @@ class DocumentProcessor:
     
     async def start_consuming(self):
         """Start consuming processing messages"""
+        # Extraction runs in the process pool, so one handler per core keeps it saturated
         await hybrid_messaging_manager.consume_messages(
-            queue="document_processing_queue",
-            callback=self.process_document_message
+            queue="document.processing",
+            callback=self.process_document_message,
+            concurrency=os.cpu_count() or 1
         )
     
     async def process_document_message(self, message: Dict[str, Any]):
@@ -706,6 +721,9 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Document Service...")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("document-service")
+    
     # Initialize database connections
     await postgresql_manager.initialize()
     await mongodb_manager.initialize()
@@ -725,15 +743,18 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Document Service...")
+    await loop_monitor.stop()
+    # Drain in-flight documents before their database connections go away
+    await hybrid_messaging_manager.close()
     await postgresql_manager.close()
     await mongodb_manager.close()
-    await hybrid_messaging_manager.close()
 
 # Create FastAPI app
 app = FastAPI(
     title="Document Service",
     description="Document processing, content extraction, and search",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -768,6 +789,7 @@ async def create_tables():
         )
         """,
         "CREATE INDEX IF NOT EXISTS idx_documents_user_id ON documents(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_documents_user_created ON documents(user_id, created_at DESC, id DESC);",
         "CREATE INDEX IF NOT EXISTS idx_documents_type ON documents(document_type);",
         "CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(processing_status);",
         "CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(content_hash);"
@@ -781,7 +803,11 @@ async def create_tables():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "document-service"}
+    return {
+        "status": "healthy",
+        "service": "document-service",
+        "consumers": hybrid_messaging_manager.get_consumer_stats()
+    }
 
 @app.post("/upload", response_model=DocumentInfo)
 async def upload_document(
@@ -804,9 +830,17 @@ async def get_document(document_id: str):
     return document
 
 @app.get("/user/{user_id}/documents", response_model=List[DocumentInfo])
-async def get_user_documents(user_id: str):
-    """Get user documents"""
-    return await document_manager.get_user_documents(user_id)
+async def get_user_documents(user_id: str, response: Response, cursor: Optional[str] = None, limit: int = 50):
+    """Get user documents, newest first; the next page cursor is returned in X-Next-Cursor"""
+    try:
+        documents, next_cursor = await document_manager.get_user_documents(user_id, cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    return documents
 
 @app.post("/search")
 async def search_documents(search_params: DocumentSearch):
@@ -1,7 +1,7 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Tuple
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -21,7 +21,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from shared.config import settings
 from shared.database import postgresql_manager, mongodb_manager
-from shared.messaging import hybrid_messaging_manager
+from shared.messaging import hybrid_messaging_manager, Priority as MessagePriority
+from shared.pagination import KeysetPaginator, InvalidCursorError, NEXT_CURSOR_HEADER
+from shared.dataloader import BatchLoader, make_row_loader
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -281,6 +285,12 @@ class NotificationManager:
         self.push_service = PushNotificationService()
         self.webhook_service = WebhookService()
         self.template_manager = TemplateManager()
+        self.paginator = KeysetPaginator("notifications")
+        # Long-lived, so only concurrent lookups are coalesced (no caching)
+        self.preferences_loader = make_row_loader(
+            postgresql_manager.get_connection, "notification_preferences",
+            key_column="user_id", cache=False
+        )
         
     async def create_notification(self, notification_data: CreateNotification) -> Notification:
         """Create and queue notification"""
@@ -314,10 +324,9 @@ class NotificationManager:
 
     async def queue_notification(self, notification: Notification):
         """Queue notification for sending"""
-        await hybrid_messaging_manager.publish_message(
-            exchange="notifications",
-            routing_key=f"send.{notification.type}",
-            message={
+        await hybrid_messaging_manager.dispatch(
+            "notification_requested",
+            {
                 "notification_id": notification.id,
                 "type": notification.type,
                 "recipient": notification.recipient,
@@ -325,7 +334,8 @@ class NotificationManager:
                 "body": notification.body,
                 "priority": notification.priority,
                 "metadata": notification.metadata
-            }
+            },
+            priority=MessagePriority[Priority(notification.priority).name]
         )
 
     async def send_notification(self, notification_id: str) -> bool:
@@ -412,27 +422,24 @@ class NotificationManager:
 
     async def check_user_preferences(self, notification: Notification) -> bool:
         """Check if user has enabled this notification type"""
-        query = "SELECT * FROM notification_preferences WHERE user_id = $1"
+        result = await self.preferences_loader.load(notification.user_id)
         
-        async with postgresql_manager.get_connection() as conn:
-            result = await conn.fetchrow(query, notification.user_id)
-            
-            if not result:
-                # Default preferences allow all
-                return True
-            
-            prefs = NotificationPreferences(**dict(result))
-            
-            if notification.type == NotificationType.EMAIL:
-                return prefs.email_enabled
-            elif notification.type == NotificationType.SMS:
-                return prefs.sms_enabled
-            elif notification.type == NotificationType.PUSH:
-                return prefs.push_enabled
-            elif notification.type == NotificationType.IN_APP:
-                return prefs.in_app_enabled
-            
+        if not result:
+            # Default preferences allow all
             return True
+        
+        prefs = NotificationPreferences(**dict(result))
+        
+        if notification.type == NotificationType.EMAIL:
+            return prefs.email_enabled
+        elif notification.type == NotificationType.SMS:
+            return prefs.sms_enabled
+        elif notification.type == NotificationType.PUSH:
+            return prefs.push_enabled
+        elif notification.type == NotificationType.IN_APP:
+            return prefs.in_app_enabled
+        
+        return True
 
     async def update_notification_status(self, notification_id: str, status: NotificationStatus, error_message: str = None):
         """Update notification status"""
@@ -450,19 +457,20 @@ class NotificationManager:
         async with postgresql_manager.get_connection() as conn:
             await conn.execute(query, status, sent_at, error_message, notification_id)
 
-    async def get_user_notifications(self, user_id: str, notification_type: NotificationType = None) -> List[Notification]:
-        """Get notifications for user"""
+    async def get_user_notifications(self, user_id: str, notification_type: NotificationType = None,
+                                     cursor: Optional[str] = None,
+                                     limit: Optional[int] = None) -> Tuple[List[Notification], Optional[str]]:
+        """Get one page of notifications for user, newest first"""
+        filters = {"user_id": user_id}
         if notification_type:
-            query = "SELECT * FROM notifications WHERE user_id = $1 AND type = $2 ORDER BY created_at DESC"
-            params = [user_id, notification_type]
-        else:
-            query = "SELECT * FROM notifications WHERE user_id = $1 ORDER BY created_at DESC"
-            params = [user_id]
+            filters["type"] = notification_type
         
         async with postgresql_manager.get_connection() as conn:
-            results = await conn.fetch(query, *params)
+            results, next_cursor = await self.paginator.fetch_page(
+                conn, filters=filters, cursor=cursor, limit=limit
+            )
             
-            return [Notification(**dict(row)) for row in results]
+            return [Notification(**dict(row)) for row in results], next_cursor
 
     async def get_in_app_notifications(self, user_id: str, unread_only: bool = False) -> List[Dict[str, Any]]:
         """Get in-app notifications"""
@@ -488,38 +496,90 @@ class NotificationManager:
 
     async def send_bulk_notification(self, bulk_data: BulkNotification) -> List[str]:
         """Send bulk notifications"""
-        notification_ids = []
+        # Resolve every recipient's contact in one batch instead of per user
+        contact_loader = BatchLoader(
+            lambda user_ids: self.get_user_contacts(user_ids, bulk_data.type)
+        )
+        recipients = await contact_loader.load_many(bulk_data.user_ids)
         
-        for user_id in bulk_data.user_ids:
-            # Get user's preferred contact method
-            recipient = await self.get_user_contact(user_id, bulk_data.type)
-            
-            if recipient:
-                notification_data = CreateNotification(
-                    user_id=user_id,
-                    type=bulk_data.type,
-                    recipient=recipient,
-                    subject=bulk_data.subject,
-                    body=bulk_data.body,
-                    priority=bulk_data.priority,
-                    scheduled_at=bulk_data.scheduled_at
-                )
-                
-                notification = await self.create_notification(notification_data)
-                notification_ids.append(notification.id)
+        notifications_data = [
+            CreateNotification(
+                user_id=user_id,
+                type=bulk_data.type,
+                recipient=recipient,
+                subject=bulk_data.subject,
+                body=bulk_data.body,
+                priority=bulk_data.priority,
+                scheduled_at=bulk_data.scheduled_at
+            )
+            for user_id, recipient in zip(bulk_data.user_ids, recipients)
+            if recipient
+        ]
         
-        return notification_ids
+        notifications = await self.create_notifications(notifications_data)
+        return [notification.id for notification in notifications]
+
+    async def create_notifications(self, notifications_data: List[CreateNotification]) -> List[Notification]:
+        """Create and queue many notifications with a single INSERT"""
+        if not notifications_data:
+            return []
+        
+        query = """
+            INSERT INTO notifications (
+                id, user_id, type, recipient, subject, body, status,
+                priority, scheduled_at, metadata
+            )
+            SELECT id, user_id, type, recipient, subject, body, status,
+                   priority, scheduled_at, metadata::jsonb
+            FROM unnest(
+                $1::uuid[], $2::uuid[], $3::text[], $4::text[], $5::text[],
+                $6::text[], $7::text[], $8::text[], $9::timestamp[], $10::text[]
+            ) AS t(id, user_id, type, recipient, subject, body, status,
+                   priority, scheduled_at, metadata)
+            RETURNING *
+        """
+        
+        async with postgresql_manager.get_connection() as conn:
+            results = await conn.fetch(
+                query,
+                [str(uuid.uuid4()) for _ in notifications_data],
+                [data.user_id for data in notifications_data],
+                [data.type for data in notifications_data],
+                [data.recipient for data in notifications_data],
+                [data.subject for data in notifications_data],
+                [data.body for data in notifications_data],
+                [NotificationStatus.PENDING] * len(notifications_data),
+                [data.priority for data in notifications_data],
+                [data.scheduled_at for data in notifications_data],
+                [json.dumps(data.metadata) for data in notifications_data]
+            )
+        
+        notifications = [Notification(**dict(row)) for row in results]
+        
+        # Queue for immediate sending if not scheduled
+        await asyncio.gather(*(
+            self.queue_notification(notification)
+            for notification in notifications
+            if not notification.scheduled_at
+        ))
+        
+        return notifications
 
     async def get_user_contact(self, user_id: str, contact_type: NotificationType) -> Optional[str]:
         """Get user contact information"""
-        # This would typically query the user service
-        # For now, return placeholder
+        contacts = await self.get_user_contacts([user_id], contact_type)
+        return contacts[0]
+
+    async def get_user_contacts(self, user_ids: List[str], contact_type: NotificationType) -> List[Optional[str]]:
+        """Get contact information for many users, in the order requested"""
+        # This would typically query the user service with one batched call
+        # For now, return placeholders
         if contact_type == NotificationType.EMAIL:
-            return f"user{user_id}@example.com"
+            return [f"user{user_id}@example.com" for user_id in user_ids]
         elif contact_type == NotificationType.SMS:
-            return "+1234567890"
+            return ["+1234567890" for _ in user_ids]
         
-        return None
+        return [None for _ in user_ids]
 
     async def process_scheduled_notifications(self):
         """Process scheduled notifications"""
@@ -531,10 +591,11 @@ class NotificationManager:
         
         async with postgresql_manager.get_connection() as conn:
             results = await conn.fetch(query)
-            
-            for row in results:
-                notification = Notification(**dict(row))
-                await self.queue_notification(notification)
+        
+        await asyncio.gather(*(
+            self.queue_notification(Notification(**dict(row)))
+            for row in results
+        ))
 
 # Message consumer
 class NotificationConsumer:
@@ -595,6 +656,9 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Notification Service...")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("notification-service")
+    
     # Initialize database connections
     await postgresql_manager.initialize()
     await mongodb_manager.initialize()
@@ -617,16 +681,19 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Notification Service...")
+    await loop_monitor.stop()
     await scheduled_task_manager.stop()
+    # Drain in-flight deliveries before their database connections go away
+    await hybrid_messaging_manager.close()
     await postgresql_manager.close()
     await mongodb_manager.close()
-    await hybrid_messaging_manager.close()
 
 # Create FastAPI app
 app = FastAPI(
     title="Notification Service",
     description="Multi-channel notification and messaging service",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -693,6 +760,8 @@ async def create_tables():
         """,
         # Indexes
         "CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications(user_id, created_at DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_type_created ON notifications(user_id, type, created_at DESC, id DESC);",
         "CREATE INDEX IF NOT EXISTS idx_notifications_status ON notifications(status);",
         "CREATE INDEX IF NOT EXISTS idx_notifications_scheduled_at ON notifications(scheduled_at);",
         "CREATE INDEX IF NOT EXISTS idx_notification_preferences_user_id ON notification_preferences(user_id);"
@@ -706,7 +775,11 @@ async def create_tables():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "notification-service"}
+    return {
+        "status": "healthy",
+        "service": "notification-service",
+        "consumers": hybrid_messaging_manager.get_consumer_stats()
+    }
 
 # Template endpoints
 @app.post("/templates", response_model=NotificationTemplate)
@@ -735,14 +808,31 @@ async def send_bulk_notification(bulk_data: BulkNotification):
     return {"notification_ids": notification_ids, "count": len(notification_ids)}
 
 @app.get("/notifications/user/{user_id}", response_model=List[Notification])
-async def get_user_notifications(user_id: str, type: Optional[NotificationType] = None):
-    """Get user notifications"""
-    return await notification_manager.get_user_notifications(user_id, type)
+async def get_user_notifications(
+    user_id: str,
+    response: Response,
+    type: Optional[NotificationType] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+):
+    """Get user notifications, newest first; the next page cursor is returned in X-Next-Cursor"""
+    try:
+        notifications, next_cursor = await notification_manager.get_user_notifications(
+            user_id, type, cursor, limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    return notifications
 
 @app.get("/notifications/in-app/{user_id}")
 async def get_in_app_notifications(user_id: str, unread_only: bool = False):
     """Get in-app notifications"""
-    return await notification_manager.get_in_app_notifications(user_id, unread_only)
+    # Raw Mongo documents; ObjectIds and datetimes are encoded by the fast renderer
+    return FastJSONResponse(await notification_manager.get_in_app_notifications(user_id, unread_only))
 
 @app.put("/notifications/in-app/{notification_id}/read")
 async def mark_notification_read(notification_id: str, user_id: str):
@@ -22,8 +22,11 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from shared.config import settings
-from shared.database import get_postgres_session
+from shared.database import get_postgres_session, postgresql_manager
 from shared.messaging import messaging_manager
+from shared.outbox import OutboxRelay, OUTBOX_DDL, enqueue_outbox_session
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
 
 # Configure logging
 logger = structlog.get_logger()
@@ -229,7 +232,7 @@ class BillingManager:
     async def _handle_payment_success(self, payment_intent: Dict[str, Any]):
         """Handle successful payment"""
         try:
-            # Update payment status in database
+            # Update payment status and record the success event in one transaction
             async with get_postgres_session() as session:
                 await session.execute(
                     """
@@ -239,17 +242,22 @@ class BillingManager:
                     """,
                     {"pi_id": payment_intent["id"]}
                 )
+                
+                await enqueue_outbox_session(
+                    session, "payment_intent", payment_intent["id"],
+                    "payment_succeeded",
+                    message={
+                        "event_type": "payment_succeeded",
+                        "data": {
+                            "payment_intent_id": payment_intent["id"],
+                            "amount": payment_intent["amount"],
+                            "currency": payment_intent["currency"],
+                            "customer_id": payment_intent.get("customer")
+                        }
+                    }
+                )
             
-            # Publish payment success event
-            await messaging_manager.publish_event(
-                "payment_succeeded",
-                {
-                    "payment_intent_id": payment_intent["id"],
-                    "amount": payment_intent["amount"],
-                    "currency": payment_intent["currency"],
-                    "customer_id": payment_intent.get("customer")
-                }
-            )
+            outbox_relay.wake()
             
             logger.info(f"Payment succeeded: {payment_intent['id']}")
             
@@ -506,6 +514,7 @@ class KYCManager:
 # Initialize managers
 billing_manager = BillingManager()
 kyc_manager = KYCManager()
+outbox_relay = OutboxRelay(postgresql_manager.get_connection, messaging_manager)
 
 
 @asynccontextmanager
@@ -514,10 +523,20 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Payment Service")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("payment-service")
+    
     try:
         # Initialize messaging
         await messaging_manager.initialize()
         
+        # Create the outbox table and start relaying events to the broker
+        await postgresql_manager.initialize()
+        async with postgresql_manager.get_connection() as conn:
+            for query in OUTBOX_DDL:
+                await conn.execute(query)
+        await outbox_relay.start()
+        
         logger.info("Payment Service startup completed")
         
         yield
@@ -525,6 +544,9 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down Payment Service")
+        await loop_monitor.stop()
+        await outbox_relay.stop()
+        await postgresql_manager.close()
 
 
 # Create FastAPI application
@@ -532,6 +554,7 @@ app = FastAPI(
     title="Payment Service",
     description="Stripe payment processing and billing management",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -1,7 +1,7 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
 from enum import Enum
@@ -20,6 +20,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from shared.config import settings
 from shared.database import postgresql_manager, redis_manager
 from shared.messaging import hybrid_messaging_manager
+from shared.pagination import KeysetPaginator, InvalidCursorError, NEXT_CURSOR_HEADER
+from shared.outbox import OutboxRelay, OUTBOX_DDL, enqueue_outbox
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -344,45 +348,50 @@ class HighPerformanceTradingEngine:
             """
             
             async with postgresql_manager.get_connection() as conn:
-                result = await conn.fetchrow(
-                    query, execution_price, commission, execution_timestamp, order.id
-                )
+                async with conn.transaction():
+                    result = await conn.fetchrow(
+                        query, execution_price, commission, execution_timestamp, order.id
+                    )
+                    
+                    if result:
+                        # Record execution event with nanosecond precision; the
+                        # outbox relay publishes it once the fill commits
+                        await enqueue_outbox(
+                            conn, "trading_account", order.account_id,
+                            "order_executed",
+                            message={
+                                "order_id": order.id,
+                                "user_id": order.user_id,
+                                "account_id": order.account_id,
+                                "symbol": order.symbol,
+                                "side": order.side,
+                                "quantity": str(order.quantity),
+                                "execution_price": str(execution_price),
+                                "commission": str(commission),
+                                "executed_at": execution_timestamp.isoformat(),
+                                "execution_timestamp_ns": event["timestamp_ns"],
+                                "processing_latency_ns": time.perf_counter_ns() - event["timestamp_ns"]
+                            }
+                        )
+                        
+                        # Balance and position change with the fill. The balance
+                        # update locks the account row, so fills for one account
+                        # apply their position changes one at a time
+                        await self.update_account_balance(conn, order.account_id, order, execution_price, commission)
+                        await self.update_position(conn, order, execution_price, commission)
                 
                 if result:
                     # Remove from active orders
                     self.active_orders.pop(order.id, None)
                     
-                    # Update account balance
-                    await self.update_account_balance(order.account_id, order, execution_price, commission)
-                    
-                    # Create or update position
-                    await self.update_position(order, execution_price, commission)
-                    
-                    # Publish execution event with nanosecond precision
-                    await hybrid_messaging_manager.publish_message(
-                        exchange="trading",
-                        routing_key="order.executed",
-                        message={
-                            "order_id": order.id,
-                            "user_id": order.user_id,
-                            "account_id": order.account_id,
-                            "symbol": order.symbol,
-                            "side": order.side,
-                            "quantity": str(order.quantity),
-                            "execution_price": str(execution_price),
-                            "commission": str(commission),
-                            "executed_at": execution_timestamp.isoformat(),
-                            "execution_timestamp_ns": event["timestamp_ns"],
-                            "processing_latency_ns": time.perf_counter_ns() - event["timestamp_ns"]
-                        }
-                    )
+                    outbox_relay.wake()
                     
                     logger.info(f"Order {order.id} executed at {execution_price} (latency: {(time.perf_counter_ns() - event['timestamp_ns'])/1_000_000:.2f}ms)")
                     
         except Exception as e:
             logger.error(f"Error executing order {order.id}: {e}")
 
-    async def update_account_balance(self, account_id: str, order: Order, execution_price: Decimal, commission: Decimal):
+    async def update_account_balance(self, conn, account_id: str, order: Order, execution_price: Decimal, commission: Decimal):
         """Update account balance after order execution"""
         trade_value = order.quantity * execution_price
         
@@ -398,28 +407,26 @@ class HighPerformanceTradingEngine:
             WHERE id = $2
         """
         
-        async with postgresql_manager.get_connection() as conn:
-            await conn.execute(query, balance_change, account_id)
+        await conn.execute(query, balance_change, account_id)
 
-    async def update_position(self, order: Order, execution_price: Decimal, commission: Decimal):
+    async def update_position(self, conn, order: Order, execution_price: Decimal, commission: Decimal):
         """Create or update position with high precision"""
-        # Check for existing position
+        # Read-modify-write: lock the existing position until the fill commits
         query = """
             SELECT * FROM positions 
             WHERE account_id = $1 AND symbol = $2
+            FOR UPDATE
         """
+        existing_position = await conn.fetchrow(query, order.account_id, order.symbol)
         
-        async with postgresql_manager.get_connection() as conn:
-            existing_position = await conn.fetchrow(query, order.account_id, order.symbol)
-            
-            if existing_position:
-                # Update existing position
-                await self.merge_position(existing_position, order, execution_price, commission)
-            else:
-                # Create new position
-                await self.create_position(order, execution_price, commission)
-
-    async def create_position(self, order: Order, execution_price: Decimal, commission: Decimal):
+        if existing_position:
+            # Update existing position
+            await self.merge_position(conn, existing_position, order, execution_price, commission)
+        else:
+            # Create new position
+            await self.create_position(conn, order, execution_price, commission)
+
+    async def create_position(self, conn, order: Order, execution_price: Decimal, commission: Decimal):
         """Create new position"""
         position_id = str(uuid.uuid4())
         
@@ -430,14 +437,13 @@ class HighPerformanceTradingEngine:
             ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
         """
         
-        async with postgresql_manager.get_connection() as conn:
-            await conn.execute(
-                query, position_id, order.account_id, order.symbol,
-                order.side, order.quantity, execution_price,
-                execution_price, Decimal('0'), Decimal('0'), commission
-            )
+        await conn.execute(
+            query, position_id, order.account_id, order.symbol,
+            order.side, order.quantity, execution_price,
+            execution_price, Decimal('0'), Decimal('0'), commission
+        )
 
-    async def merge_position(self, existing_position: dict, order: Order, execution_price: Decimal, commission: Decimal):
+    async def merge_position(self, conn, existing_position: dict, order: Order, execution_price: Decimal, commission: Decimal):
         """Merge order into existing position"""
         existing_quantity = existing_position['quantity']
         existing_avg_price = existing_position['average_price']
@@ -459,11 +465,10 @@ class HighPerformanceTradingEngine:
                 WHERE id = $4
             """
             
-            async with postgresql_manager.get_connection() as conn:
-                await conn.execute(
-                    query, new_quantity, new_avg_price, new_commission,
-                    existing_position['id']
-                )
+            await conn.execute(
+                query, new_quantity, new_avg_price, new_commission,
+                existing_position['id']
+            )
         else:
             # Opposite side - reduce or close position
             if order.quantity >= existing_quantity:
@@ -473,14 +478,13 @@ class HighPerformanceTradingEngine:
                     realized_pnl = -realized_pnl
                     
                 query = "DELETE FROM positions WHERE id = $1"
-                async with postgresql_manager.get_connection() as conn:
-                    await conn.execute(query, existing_position['id'])
+                await conn.execute(query, existing_position['id'])
                     
                 # If order quantity > position quantity, create new position for remainder
                 if order.quantity > existing_quantity:
                     remaining_quantity = order.quantity - existing_quantity
                     await self.create_position(
-                        Order(**{**order.dict(), 'quantity': remaining_quantity}),
+                        conn, Order(**{**order.dict(), 'quantity': remaining_quantity}),
                         execution_price, commission
                     )
 
@@ -496,6 +500,8 @@ class HighPerformanceTradingEngine:
         }
 
 # Account Manager
+accounts_paginator = KeysetPaginator("trading_accounts")
+
 class AccountManager:
     async def create_account(self, user_id: str, account_data: CreateTradingAccount) -> TradingAccount:
         """Create new trading account"""
@@ -530,14 +536,15 @@ class AccountManager:
             if result:
                 return TradingAccount(**dict(result))
 
-    async def get_user_accounts(self, user_id: str) -> List[TradingAccount]:
-        """Get all accounts for a user"""
-        query = "SELECT * FROM trading_accounts WHERE user_id = $1 ORDER BY created_at DESC"
-        
+    async def get_user_accounts(self, user_id: str, cursor: Optional[str] = None,
+                                limit: Optional[int] = None) -> Tuple[List[TradingAccount], Optional[str]]:
+        """Get one page of accounts for a user, newest first"""
         async with postgresql_manager.get_connection() as conn:
-            results = await conn.fetch(query, user_id)
+            results, next_cursor = await accounts_paginator.fetch_page(
+                conn, filters={"user_id": user_id}, cursor=cursor, limit=limit
+            )
             
-            return [TradingAccount(**dict(row)) for row in results]
+            return [TradingAccount(**dict(row)) for row in results], next_cursor
 
     async def get_portfolio(self, account_id: str) -> Portfolio:
         """Get portfolio for account"""
@@ -658,6 +665,7 @@ class OrderManager:
 
 # Initialize services
 trading_engine = HighPerformanceTradingEngine()
+outbox_relay = OutboxRelay(postgresql_manager.get_connection, hybrid_messaging_manager)
 account_manager = AccountManager()
 order_manager = OrderManager()
 
@@ -667,6 +675,9 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting High-Performance Trading Service...")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("trading-service")
+    
     # Initialize database connections
     await postgresql_manager.initialize()
     await redis_manager.initialize()
@@ -680,12 +691,17 @@ async def lifespan(app: FastAPI):
     # Initialize high-performance trading engine
     await trading_engine.initialize()
     
+    # Start relaying outbox events to the broker
+    await outbox_relay.start()
+    
     logger.info("High-Performance Trading Service started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Trading Service...")
+    await loop_monitor.stop()
+    await outbox_relay.stop()
     await postgresql_manager.close()
     await redis_manager.close()
     await hybrid_messaging_manager.close()
@@ -695,6 +711,7 @@ app = FastAPI(
     title="High-Performance Trading Service",
     description="Nanosecond-precision trading operations, portfolio management, and market data",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -768,12 +785,14 @@ async def create_tables():
         """,
         # High-performance indexes
         "CREATE INDEX IF NOT EXISTS idx_trading_accounts_user_id ON trading_accounts(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_trading_accounts_user_created ON trading_accounts(user_id, created_at DESC, id DESC);",
         "CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id);",
         "CREATE INDEX IF NOT EXISTS idx_orders_account_id ON orders(account_id);",
         "CREATE INDEX IF NOT EXISTS idx_orders_symbol ON orders(symbol);",
         "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);",
         "CREATE INDEX IF NOT EXISTS idx_positions_account_id ON positions(account_id);",
-        "CREATE INDEX IF NOT EXISTS idx_positions_symbol ON positions(symbol);"
+        "CREATE INDEX IF NOT EXISTS idx_positions_symbol ON positions(symbol);",
+        *OUTBOX_DDL
     ]
     
     async with postgresql_manager.get_connection() as conn:
@@ -799,9 +818,17 @@ async def create_account(account_data: CreateTradingAccount, user_id: str):
     return await account_manager.create_account(user_id, account_data)
 
 @app.get("/accounts", response_model=List[TradingAccount])
-async def get_accounts(user_id: str):
-    """Get user accounts"""
-    return await account_manager.get_user_accounts(user_id)
+async def get_accounts(user_id: str, response: Response, cursor: Optional[str] = None, limit: int = 50):
+    """Get user accounts, newest first; the next page cursor is returned in X-Next-Cursor"""
+    try:
+        accounts, next_cursor = await account_manager.get_user_accounts(user_id, cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    return accounts
 
 @app.get("/accounts/{account_id}", response_model=TradingAccount)
 async def get_account(account_id: str, user_id: str):
@@ -819,7 +846,8 @@ async def get_portfolio(account_id: str, user_id: str):
     if not account or account.user_id != user_id:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    return await account_manager.get_portfolio(account_id)
+    # Built from a validated Portfolio; skip FastAPI's re-validation
+    return FastJSONResponse(await account_manager.get_portfolio(account_id))
 
 # Order endpoints
 @app.post("/orders", response_model=Order)
@@ -835,12 +863,13 @@ async def get_market_data(symbol: str):
     if not data:
         raise HTTPException(status_code=404, detail="Symbol not found")
     
-    return MarketData(**data)
+    # Cache entries hold exactly the MarketData fields and were validated on arrival
+    return FastJSONResponse(data)
 
 @app.get("/market-data", response_model=List[MarketData])
 async def get_all_market_data():
     """Get all real-time market data"""
-    return [MarketData(**data) for data in trading_engine.market_data_cache.values()]
+    return FastJSONResponse(list(trading_engine.market_data_cache.values()))
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Security
+from fastapi import FastAPI, HTTPException, Depends, status, Security, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -8,7 +8,6 @@ from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import jwt
-import bcrypt
 import uuid
 import logging
 from contextlib import asynccontextmanager
@@ -20,8 +19,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from shared.config import settings
-from shared.database import postgresql_manager
+from shared.database import postgresql_manager, init_redis, get_redis_client
 from shared.messaging import hybrid_messaging_manager
+from shared.pagination import KeysetPaginator, InvalidCursorError, NEXT_CURSOR_HEADER
+from shared.outbox import OutboxRelay, OUTBOX_DDL, enqueue_outbox
+from shared.responses import FastJSONResponse
+from shared.diagnostics import loop_monitor
+
+from passwords import password_hasher
+from sessions import session_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +36,9 @@ logger = logging.getLogger(__name__)
 # Security
 security = HTTPBearer()
 
+USER_COLUMNS = "id, email, first_name, last_name, is_active, is_verified, role, created_at, updated_at"
+users_paginator = KeysetPaginator("users", columns=USER_COLUMNS)
+
 # Pydantic models
 class UserCreate(BaseModel):
     email: EmailStr
@@ -57,6 +66,13 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class RolePermission(BaseModel):
     role: str
@@ -70,12 +86,12 @@ class UserManager:
         self.access_token_expire_minutes = 30
 
     async def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """Hash password using bcrypt, in the password hashing thread pool"""
+        return await password_hasher.hash(password)
 
     async def verify_password(self, password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        """Verify password against hash, in the password hashing thread pool"""
+        return await password_hasher.verify(password, hashed_password)
 
     async def create_access_token(self, data: dict) -> str:
         """Create JWT access token"""
@@ -88,18 +104,32 @@ class UserManager:
         """Verify JWT access token"""
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token expired")
         except jwt.JWTError:
             raise HTTPException(status_code=401, detail="Invalid token")
+        
+        # Bloom filter first; only possibly-revoked sessions cost a Redis call
+        if await session_store.is_revoked(payload.get("sid")):
+            raise HTTPException(status_code=401, detail="Session revoked")
+        return payload
+    
+    async def issue_tokens(self, user: UserResponse, session_id: str, refresh_token: str) -> TokenResponse:
+        """Access token bound to a session, plus that session's refresh token"""
+        token_data = {"sub": user.id, "email": user.email, "role": user.role, "sid": session_id}
+        return TokenResponse(
+            access_token=await self.create_access_token(token_data),
+            token_type="bearer",
+            expires_in=self.access_token_expire_minutes * 60,
+            refresh_token=refresh_token
+        )
 
     async def create_user(self, user_data: UserCreate) -> UserResponse:
         """Create new user"""
+        # Hash password (may answer 429 when the hashing pool is saturated)
+        hashed_password = await self.hash_password(user_data.password)
+        
         try:
-            # Hash password
-            hashed_password = await self.hash_password(user_data.password)
-            
             # Create user record
             user_id = str(uuid.uuid4())
             query = """
@@ -109,24 +139,27 @@ class UserManager:
             """
             
             async with postgresql_manager.get_connection() as conn:
-                result = await conn.fetchrow(
-                    query, user_id, user_data.email, hashed_password,
-                    user_data.first_name, user_data.last_name, user_data.role
-                )
-                
-                if result:
-                    # Send welcome notification
-                    await hybrid_messaging_manager.publish_message(
-                        exchange="notifications",
-                        routing_key="user.created",
-                        message={
-                            "user_id": user_id,
-                            "email": user_data.email,
-                            "name": f"{user_data.first_name} {user_data.last_name}",
-                            "event": "user_created"
-                        }
+                async with conn.transaction():
+                    result = await conn.fetchrow(
+                        query, user_id, user_data.email, hashed_password,
+                        user_data.first_name, user_data.last_name, user_data.role
                     )
                     
+                    if result:
+                        # Send welcome notification once the user row commits
+                        await enqueue_outbox(
+                            conn, "user", user_id,
+                            "user_created",
+                            message={
+                                "user_id": user_id,
+                                "email": user_data.email,
+                                "name": f"{user_data.first_name} {user_data.last_name}",
+                                "event": "user_created"
+                            }
+                        )
+                
+                if result:
+                    outbox_relay.wake()
                     return UserResponse(**dict(result))
                     
         except Exception as e:
@@ -144,6 +177,12 @@ class UserManager:
             result = await conn.fetchrow(query, email)
             
             if result and await self.verify_password(password, result['password_hash']):
+                if password_hasher.needs_rehash(result['password_hash']):
+                    # Upgrade the stored hash to the configured cost factor
+                    await conn.execute(
+                        "UPDATE users SET password_hash = $1 WHERE id = $2",
+                        await self.hash_password(password), result['id']
+                    )
                 return UserResponse(**{k: v for k, v in dict(result).items() if k != 'password_hash'})
             
             return None
@@ -196,10 +235,20 @@ class UserManager:
             result = await conn.fetchrow(query, *values)
             
             if result:
+                if 'is_active' in update_data or 'role' in update_data:
+                    await self.publish_status_change(user_id)
                 return UserResponse(**dict(result))
             
             return None
 
+    async def publish_status_change(self, user_id: str):
+        """Tell gateway replicas to drop their cached status for a user"""
+        try:
+            await get_redis_client().publish(settings.auth_invalidation_channel, user_id)
+        except Exception as e:
+            # Gateways still pick the change up when their status TTL expires
+            logger.warning(f"Failed to publish auth invalidation for {user_id}: {e}")
+
 # RBAC implementation
 class RBACManager:
     def __init__(self):
@@ -236,6 +285,7 @@ class RBACManager:
 # Initialize managers
 user_manager = UserManager()
 rbac_manager = RBACManager()
+outbox_relay = OutboxRelay(postgresql_manager.get_connection, hybrid_messaging_manager)
 
 # Dependency functions
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> UserResponse:
@@ -275,29 +325,45 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting User Service...")
     
+    # Report event-loop lag and calls that block the loop
+    await loop_monitor.start("user-service")
+    
     # Initialize database connection
     await postgresql_manager.initialize()
     
+    # Redis carries auth invalidations to the gateway and holds sessions
+    await init_redis()
+    await session_store.start(get_redis_client(), postgresql_manager.get_connection)
+    
     # Initialize messaging
     await hybrid_messaging_manager.initialize()
     
     # Create database tables
     await create_tables()
     
+    # Start relaying outbox events to the broker
+    await outbox_relay.start()
+    
     logger.info("User Service started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down User Service...")
+    await loop_monitor.stop()
+    await outbox_relay.stop()
+    await session_store.stop()
     await postgresql_manager.close()
+    await get_redis_client().close()
     await hybrid_messaging_manager.close()
+    password_hasher.close()
 
 # Create FastAPI app
 app = FastAPI(
     title="User Service",
     description="User management, authentication, and RBAC",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -335,6 +401,9 @@ async def create_tables():
         CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
         """,
         """
+        CREATE INDEX IF NOT EXISTS idx_users_created_at_id ON users(created_at DESC, id DESC);
+        """,
+        """
         CREATE TABLE IF NOT EXISTS user_sessions (
             id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
             user_id UUID REFERENCES users(id) ON DELETE CASCADE,
@@ -348,7 +417,8 @@ async def create_tables():
         """,
         """
         CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions(expires_at);
-        """
+        """,
+        *OUTBOX_DDL
     ]
     
     async with postgresql_manager.get_connection() as conn:
@@ -374,15 +444,34 @@ async def login_user(login_data: UserLogin):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Create access token
-    token_data = {"sub": user.id, "email": user.email, "role": user.role}
-    access_token = await user_manager.create_access_token(token_data)
+    # Session lives in Redis; its user_sessions row is written behind
+    session_id, refresh_token = await session_store.create(user.id)
+    return await user_manager.issue_tokens(user, session_id, refresh_token)
+
+@app.post("/refresh", response_model=TokenResponse)
+async def refresh_tokens(refresh_data: RefreshRequest):
+    """Exchange a refresh token for a new access token and refresh token"""
+    user_id, session_id, refresh_token = await session_store.rotate(refresh_data.refresh_token)
     
-    return TokenResponse(
-        access_token=access_token,
-        token_type="bearer",
-        expires_in=user_manager.access_token_expire_minutes * 60
-    )
+    user = await user_manager.get_user(user_id)
+    if not user or not user.is_active:
+        await session_store.revoke(session_id, refresh_token)
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    return await user_manager.issue_tokens(user, session_id, refresh_token)
+
+@app.post("/logout")
+async def logout_user(
+    logout_data: LogoutRequest = LogoutRequest(),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """End the caller's session; its access and refresh tokens stop working"""
+    payload = await user_manager.verify_token(credentials.credentials)
+    if not payload.get("sid"):
+        raise HTTPException(status_code=400, detail="Token is not bound to a session")
+    
+    await session_store.revoke(payload["sid"], logout_data.refresh_token)
+    return {"message": "Logged out successfully"}
 
 @app.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: UserResponse = Depends(get_current_user)):
@@ -416,21 +505,22 @@ async def get_user_by_id(
 
 @app.get("/users", response_model=List[UserResponse])
 async def list_users(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
     current_user: UserResponse = Depends(require_permission("user.read"))
 ):
-    """List users (admin only)"""
-    query = """
-        SELECT id, email, first_name, last_name, is_active, is_verified, role, created_at, updated_at
-        FROM users
-        ORDER BY created_at DESC
-        LIMIT $1 OFFSET $2
-    """
+    """List users (admin only), newest first; the next page cursor is returned in X-Next-Cursor"""
+    try:
+        async with postgresql_manager.get_connection() as conn:
+            rows, next_cursor = await users_paginator.fetch_page(conn, cursor=cursor, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    async with postgresql_manager.get_connection() as conn:
-        results = await conn.fetch(query, limit, skip)
-        return [UserResponse(**dict(row)) for row in results]
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    return [UserResponse(**dict(row)) for row in rows]
 
 @app.get("/roles/{role}/permissions", response_model=RolePermission)
 async def get_role_permissions(
@@ -452,10 +542,9 @@ async def verify_user(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Send verification notification
-    await hybrid_messaging_manager.publish_message(
-        exchange="notifications",
-        routing_key="user.verified",
-        message={
+    await hybrid_messaging_manager.dispatch(
+        "user_verified",
+        {
             "user_id": user_id,
             "email": user.email,
             "event": "user_verified"
@@ -478,6 +567,7 @@ async def delete_user(
         if not result:
             raise HTTPException(status_code=404, detail="User not found")
     
+    await user_manager.publish_status_change(user_id)
     return {"message": "User deleted successfully"}
 
 if __name__ == "__main__":
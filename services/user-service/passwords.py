@@ -0,0 +1,79 @@
+"""
+Password hashing off the event loop for the user service
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so ``workers`` threads hash on
+    that many cores in parallel while the event loop keeps serving other
+    requests. At most ``max_queue`` hashes wait for a free thread; beyond
+    that the request is refused with a 429 rather than queueing logins
+    until they time out. New hashes use ``rounds`` as the cost factor.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 rounds: Optional[int] = None):
+        self.workers = workers or settings.password_hash_workers or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else settings.password_hash_max_queue
+        self.rounds = rounds or settings.bcrypt_rounds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.workers + self.max_queue:
+            logger.warning(f"Password hashing saturated with {self._pending} pending, rejecting")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many sign-in attempts in progress, please retry",
+                headers={"Retry-After": "1"}
+            )
+
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash password using bcrypt"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = await self._run(bcrypt.hashpw, password.encode('utf-8'), salt)
+        return hashed.decode('utf-8')
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify password against hash"""
+        return await self._run(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Whether a stored hash was made with a different cost factor"""
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
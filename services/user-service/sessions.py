@@ -0,0 +1,289 @@
+"""
+Redis-backed refresh sessions and revocation for the user service
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import asyncpg
+from fastapi import HTTPException
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREFIX = "session:"
+REVOKED_PREFIX = "revoked-session:"
+
+_UPSERT_QUERY = """
+    INSERT INTO user_sessions (id, user_id, token_hash, expires_at)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (id) DO UPDATE SET token_hash = EXCLUDED.token_hash,
+                                   expires_at = EXCLUDED.expires_at
+"""
+_DELETE_QUERY = "DELETE FROM user_sessions WHERE id = ANY($1::uuid[])"
+
+# Postgres unreachable or the connection dropped: the write is retried later.
+# Anything else means Postgres rejected the rows, which retrying will not fix.
+_TRANSIENT_ERRORS = (
+    OSError, asyncio.TimeoutError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError, asyncpg.TooManyConnectionsError
+)
+
+
+def hash_token(token: str) -> str:
+    """Refresh tokens are only ever stored hashed"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class SessionStore:
+    """Refresh sessions and session revocation without synchronous Postgres writes.
+
+    A session's hashed refresh token lives in Redis under ``session:<hash>``
+    and revoked session ids under ``revoked-session:<id>``, both expiring
+    after ``refresh_token_expire_days``. Access tokens carry their session
+    id (``sid``); checking one first consults a local Bloom filter of
+    revoked ids, so the common case - a live session - costs no Redis call,
+    and only filter hits are confirmed in Redis. Replicas keep their
+    filters in sync over ``session_revocation_channel`` and reload them from
+    Redis whenever they resubscribe.
+
+    ``user_sessions`` rows are written behind: login, refresh and logout
+    queue inserts and deletes, and a background task flushes them to
+    Postgres in batches. A batch that fails because Postgres is unreachable
+    is retried; one Postgres rejects is retried row by row and the rejected
+    rows are dropped.
+    """
+
+    def __init__(self, redis_client=None, connection_factory: Optional[Callable] = None,
+                 ttl: Optional[timedelta] = None, bloom_capacity: Optional[int] = None,
+                 bloom_error_rate: Optional[float] = None, flush_interval: Optional[float] = None,
+                 batch_size: Optional[int] = None):
+        self.redis = redis_client
+        self.connection_factory = connection_factory
+        self.ttl = ttl or timedelta(days=settings.refresh_token_expire_days)
+        self.bloom_capacity = bloom_capacity or settings.session_bloom_capacity
+        self.bloom_error_rate = bloom_error_rate or settings.session_bloom_error_rate
+        self.flush_interval = flush_interval or settings.session_writeback_interval
+        self.batch_size = batch_size or settings.session_writeback_batch_size
+        self.revoked = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        self._pending: List[Tuple[str, Tuple]] = []  # ("upsert", row) / ("delete", (session_id,))
+        self._reloading: Optional[List[str]] = None  # ids revoked while a reload runs
+        self._reload_at = self.bloom_capacity
+        self._reload_task: Optional[asyncio.Task] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def create(self, user_id: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+        """Start a session, or issue a session a new refresh token; returns (session id, refresh token)"""
+        session_id = session_id or str(uuid.uuid4())
+        refresh_token = secrets.token_urlsafe(32)
+        token_hash = hash_token(refresh_token)
+        expires_at = datetime.utcnow() + self.ttl
+
+        await self.redis.set(
+            SESSION_PREFIX + token_hash,
+            json.dumps({"session_id": session_id, "user_id": user_id}),
+            ex=int(self.ttl.total_seconds())
+        )
+        self._queue("upsert", (session_id, user_id, token_hash, expires_at))
+        return session_id, refresh_token
+
+    async def rotate(self, refresh_token: str) -> Tuple[str, str, str]:
+        """Exchange a refresh token for a new one; returns (user id, session id, refresh token).
+
+        The old token is consumed atomically, so a replayed token fails. The
+        session id stays the same, so access tokens already issued for the
+        session remain valid until they expire.
+        """
+        record = await self.redis.getdel(SESSION_PREFIX + hash_token(refresh_token))
+        if record is None:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+        old = json.loads(record)
+        if await self.is_revoked(old["session_id"]):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        session_id, new_token = await self.create(old["user_id"], old["session_id"])
+        if await self.is_revoked(session_id):
+            # Revoked while rotating: drop the new token and queue the delete
+            # again so it lands after this upsert
+            await self.redis.delete(SESSION_PREFIX + hash_token(new_token))
+            self._queue("delete", (session_id,))
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        return old["user_id"], session_id, new_token
+
+    async def revoke(self, session_id: str, refresh_token: Optional[str] = None):
+        """End a session: its refresh token stops working and its access tokens are rejected"""
+        if refresh_token:
+            await self.redis.delete(SESSION_PREFIX + hash_token(refresh_token))
+        await self._revoke_session(session_id)
+
+    async def _revoke_session(self, session_id: str):
+        await self.redis.set(REVOKED_PREFIX + session_id, "1", ex=int(self.ttl.total_seconds()))
+        self._add_revoked(session_id)
+        self._queue("delete", (session_id,))
+        try:
+            await self.redis.publish(settings.session_revocation_channel, session_id)
+        except Exception as e:
+            # Other replicas still find the revocation in Redis after their next reload
+            logger.warning(f"Failed to publish session revocation for {session_id}: {e}")
+
+    async def is_revoked(self, session_id: Optional[str]) -> bool:
+        """Whether an access token's session was revoked"""
+        if not session_id or session_id not in self.revoked:
+            return False
+        return bool(await self.redis.exists(REVOKED_PREFIX + session_id))
+
+    def _add_revoked(self, session_id: str):
+        self.revoked.add(session_id)
+        if self._reloading is not None:
+            self._reloading.append(session_id)
+        elif self.revoked.count >= self._reload_at and (self._reload_task is None or self._reload_task.done()):
+            # Past capacity the false-positive rate climbs; reloading from
+            # Redis drops revocations that have expired
+            self._reload_task = asyncio.create_task(self.reload_revocations())
+
+    async def reload_revocations(self):
+        """Rebuild the Bloom filter from the revocations still in Redis"""
+        self._reloading = []
+        try:
+            revoked = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+            async for key in self.redis.scan_iter(match=REVOKED_PREFIX + "*", count=1000):
+                key = key.decode() if isinstance(key, bytes) else key
+                revoked.add(key[len(REVOKED_PREFIX):])
+            for session_id in self._reloading:
+                revoked.add(session_id)
+            self.revoked = revoked
+            # Many live revocations: wait for the count to double before reloading again
+            self._reload_at = max(self.bloom_capacity, revoked.count * 2)
+        finally:
+            self._reloading = None
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(settings.session_revocation_channel)
+                # Anything published while we were not subscribed is in Redis
+                await self.reload_revocations()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        data = message["data"]
+                        self._add_revoked(data.decode() if isinstance(data, bytes) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Session revocation listener failed, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _queue(self, op: str, row: Tuple):
+        self._pending.append((op, row))
+        overflow = len(self._pending) - self.batch_size * 100
+        if overflow > 0:
+            # Postgres has been unreachable for a while; Redis stays authoritative
+            logger.warning(f"Session write-back backlog full, dropping {overflow} oldest changes")
+            del self._pending[:overflow]
+
+    async def flush(self) -> int:
+        """Write queued session row changes to Postgres; returns how many were written"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        # Latest token per session; sessions deleted in this batch are not written
+        deletes = [row[0] for op, row in batch if op == "delete"]
+        deleted = set(deletes)
+        upserts = [
+            row for row in {row[0]: row for op, row in batch if op == "upsert"}.values() if row[0] not in deleted
+        ]
+
+        try:
+            async with self.connection_factory() as conn:
+                try:
+                    async with conn.transaction():
+                        if upserts:
+                            await conn.executemany(_UPSERT_QUERY, upserts)
+                        if deletes:
+                            await conn.execute(_DELETE_QUERY, deletes)
+                except _TRANSIENT_ERRORS:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Session write-back of {len(batch)} changes rejected, retrying row by row: {e}")
+                    await self._flush_rows(conn, upserts, deletes)
+        except _TRANSIENT_ERRORS as e:
+            logger.error(f"Session write-back of {len(batch)} changes failed, retrying: {e}")
+            self._pending[:0] = batch
+            return 0
+        return len(batch)
+
+    async def _flush_rows(self, conn, upserts: List[Tuple], deletes: List[str]):
+        """Write changes one by one, dropping those Postgres rejects (e.g. a deleted user)"""
+        statements = [(row[0], _UPSERT_QUERY, row) for row in upserts]
+        statements += [(session_id, _DELETE_QUERY, ([session_id],)) for session_id in deletes]
+        for session_id, query, args in statements:
+            try:
+                await conn.execute(query, *args)
+            except _TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Dropping session write-back for session {session_id}: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            while await self.flush() >= self.batch_size:
+                pass
+
+    async def start(self, redis_client, connection_factory: Callable):
+        """Connect to Redis and Postgres and start the listener and write-back tasks"""
+        self.redis = redis_client
+        self.connection_factory = connection_factory
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop background tasks after flushing queued session rows"""
+        for task in (self._listener, self._flusher, self._reload_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._listener = self._flusher = self._reload_task = None
+
+        while self._pending and await self.flush():
+            pass
+
+
+session_store = SessionStore()
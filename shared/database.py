@@ -187,6 +187,41 @@ class PostgreSQLManager:
         pass
 
 
+class PostgreSQLPoolManager:
+    """asyncpg connection pool for services that run raw SQL"""
+    
+    def __init__(self):
+        self.pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+    
+    async def initialize(self):
+        """Create the connection pool"""
+        async with self._lock:
+            if self.pool is None:
+                self.pool = await asyncpg.create_pool(
+                    settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1),
+                    min_size=settings.postgres_pool_min_size,
+                    max_size=settings.postgres_pool_max_size,
+                    command_timeout=60,
+                    server_settings={"jit": "off", "application_name": "ai_trading_platform"}
+                )
+    
+    @asynccontextmanager
+    async def get_connection(self) -> AsyncGenerator[asyncpg.Connection, None]:
+        """Borrow a pooled connection for the duration of the block"""
+        if self.pool is None:
+            await self.initialize()
+        
+        async with self.pool.acquire() as conn:
+            yield conn
+    
+    async def close(self):
+        """Close the connection pool"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+
 class MongoDBManager:
     """MongoDB connection manager with advanced features"""
     
@@ -241,4 +276,5 @@ class MongoDBManager:
 
 # Global database managers
 postgres_manager = PostgreSQLManager()
+postgresql_manager = PostgreSQLPoolManager()
 mongodb_manager = MongoDBManager() 
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Shared async batch loader for collapsing N+1 lookups
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+BatchFunction = Callable[[List[Any]], Awaitable[Sequence[Any]]]
+
+
+class BatchLoader:
+    """Collects keys requested within one event-loop tick and resolves them in one batch.
+
+    ``batch_fn`` receives the list of distinct keys and must return a sequence
+    of values in the same order (``None`` for missing keys). With ``cache``
+    enabled every key is resolved at most once for the lifetime of the loader,
+    so loaders that cache should be created per request; long-lived loaders
+    should pass ``cache=False`` and only deduplicate concurrent lookups.
+    """
+
+    def __init__(self, batch_fn: BatchFunction, max_batch_size: int = 1000,
+                 cache: bool = True, key_fn: Optional[Callable[[Any], Hashable]] = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.cache_enabled = cache
+        self.key_fn = key_fn or (lambda key: key)
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Any] = []
+        self._queued: Dict[Hashable, asyncio.Future] = {}
+        self._dispatch_scheduled = False
+        self.stats = {"loads": 0, "batches": 0, "cache_hits": 0}
+
+    def load(self, key: Any) -> Awaitable[Any]:
+        """Request a single key; resolved together with other keys from this tick"""
+        self.stats["loads"] += 1
+        cache_key = self.key_fn(key)
+
+        future = self._cache.get(cache_key)
+        if future is None:
+            future = self._queued.get(cache_key)
+        if future is not None:
+            self.stats["cache_hits"] += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append(key)
+        self._queued[cache_key] = future
+        if self.cache_enabled:
+            self._cache[cache_key] = future
+
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch)
+
+        return future
+
+    async def load_many(self, keys: Sequence[Any]) -> List[Any]:
+        """Request several keys at once"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: Any, value: Any) -> None:
+        """Seed the cache with a known value, e.g. a row returned by a write"""
+        if not self.cache_enabled:
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._cache[self.key_fn(key)] = future
+
+    def clear(self, key: Any = None) -> None:
+        """Drop one key (or everything) from the cache after a mutation"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(self.key_fn(key), None)
+
+    def _dispatch(self):
+        """Hand the keys collected during this tick to batch tasks"""
+        self._dispatch_scheduled = False
+        queue, queued = self._queue, self._queued
+        self._queue, self._queued = [], {}
+
+        for start in range(0, len(queue), self.max_batch_size):
+            keys = queue[start:start + self.max_batch_size]
+            futures = [queued[self.key_fn(key)] for key in keys]
+            asyncio.ensure_future(self._run_batch(keys, futures))
+
+    async def _run_batch(self, keys: List[Any], futures: List[asyncio.Future]):
+        """Resolve one batch and fan the results back out to waiting callers"""
+        self.stats["batches"] += 1
+        try:
+            values = await self.batch_fn(keys)
+            if len(values) != len(keys):
+                raise ValueError(
+                    f"Batch function returned {len(values)} values for {len(keys)} keys"
+                )
+        except Exception as e:
+            logger.error(f"Batch load of {len(keys)} keys failed: {e}")
+            for key, future in zip(keys, futures):
+                self._cache.pop(self.key_fn(key), None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, value in zip(futures, values):
+            if not future.done():
+                future.set_result(value)
+
+
+def make_row_loader(connection_factory: Callable, table: str, key_column: str = "id",
+                    columns: str = "*", **loader_kwargs) -> BatchLoader:
+    """Build a loader that fetches rows with a single ``WHERE key = ANY($1)`` query.
+
+    ``connection_factory`` is an asyncpg-style connection context manager
+    factory such as ``postgresql_manager.get_connection``.
+    """
+    query = f"SELECT {columns} FROM {table} WHERE {key_column} = ANY($1)"
+
+    async def batch_fn(keys: List[Any]) -> List[Any]:
+        async with connection_factory() as conn:
+            rows = await conn.fetch(query, list(keys))
+
+        rows_by_key = {str(row[key_column]): row for row in rows}
+        return [rows_by_key.get(str(key)) for key in keys]
+
+    return BatchLoader(batch_fn, key_fn=str, **loader_kwargs)
@@ -0,0 +1,189 @@
+"""
+Dead letter inspection and rate-limited replay
+
+Usage:
+    python -m shared.dead_letters inspect trading.orders --limit 20
+    python -m shared.dead_letters replay trading.orders --rate 50 --limit 1000
+    python -m shared.dead_letters purge trading.orders
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+from .messaging import (
+    QUEUE_BINDINGS, ATTEMPTS_HEADER, LAST_ERROR_HEADER, REPLAYED_HEADER,
+    dead_letter_queue_name, unbatch
+)
+from .serialization import message_serializer, SerializationError
+
+logger = logging.getLogger(__name__)
+
+WORK_QUEUES = [queue for queue, _, _ in QUEUE_BINDINGS]
+
+
+def _plain(value: Any) -> Any:
+    """Convert AMQP header values (bytes, datetimes, nested tables) to JSON-friendly values"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class DeadLetterManager:
+    """Inspects, replays and purges a work queue's dead letter queue"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def _dead_letter_queue(self, queue: str) -> str:
+        if queue not in WORK_QUEUES:
+            raise KeyError(f"Unknown queue: {queue}")
+        return dead_letter_queue_name(queue)
+
+    async def depth(self, queue: str) -> int:
+        """Number of messages waiting in the dead letter queue"""
+        return await self.broker.queue_depth(self._dead_letter_queue(queue))
+
+    def describe(self, message) -> Dict[str, Any]:
+        """Summarize a dead-lettered message for inspection"""
+        headers = dict(message.headers or {})
+        try:
+            payload = message_serializer.deserialize(
+                message.body, message.content_type, message.content_encoding
+            )
+            messages = unbatch(payload, headers)
+        except SerializationError as e:
+            messages = None
+            headers['decode_error'] = str(e)
+
+        deaths = headers.get('x-death') or []
+        return {
+            "attempts": headers.get(ATTEMPTS_HEADER, 0),
+            "last_error": _plain(headers.get(LAST_ERROR_HEADER)),
+            "death_reason": _plain(deaths[0].get('reason')) if deaths else _plain(headers.get('x-first-death-reason')),
+            "replayed": headers.get(REPLAYED_HEADER, 0),
+            "headers": _plain(headers),
+            "messages": messages
+        }
+
+    async def inspect(self, queue: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Peek at up to ``limit`` dead letters; they are returned to the queue afterwards"""
+        dead_letter_queue = self._dead_letter_queue(queue)
+        fetched = []
+        try:
+            for _ in range(limit):
+                message = await self.broker.get_message(dead_letter_queue)
+                if message is None:
+                    break
+                fetched.append(message)
+            return [self.describe(message) for message in fetched]
+        finally:
+            for message in fetched:
+                await message.nack(requeue=True)
+
+    async def replay(self, queue: str, limit: Optional[int] = None, rate: Optional[float] = None) -> int:
+        """Move dead letters back onto the work queue at no more than ``rate`` messages per second.
+
+        Attempt counters are reset so replayed messages get the full retry
+        schedule again. Returns the number of messages replayed.
+        """
+        dead_letter_queue = self._dead_letter_queue(queue)
+        interval = 1 / (rate or settings.dead_letter_replay_rate)
+        next_send = time.monotonic()
+        replayed = 0
+
+        while limit is None or replayed < limit:
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_send = max(next_send + interval, time.monotonic())
+
+            message = await self.broker.get_message(dead_letter_queue)
+            if message is None:
+                break
+
+            headers = {
+                key: value for key, value in (message.headers or {}).items()
+                if key not in (ATTEMPTS_HEADER, 'x-death')
+            }
+            headers[REPLAYED_HEADER] = int(headers.get(REPLAYED_HEADER, 0)) + 1
+
+            if not await self.broker.publish_raw(
+                '', queue, message.body, headers, message.content_type, message.content_encoding,
+                message.priority
+            ):
+                await message.nack(requeue=True)
+                logger.error(f"Stopping replay of {queue} after {replayed} messages: publish failed")
+                break
+
+            await message.ack()
+            replayed += 1
+
+        logger.info(f"Replayed {replayed} dead letters onto {queue}")
+        return replayed
+
+    async def purge(self, queue: str) -> int:
+        """Drop every dead letter for a queue; returns the number removed"""
+        dead_letter_queue = self._dead_letter_queue(queue)
+        purged = 0
+        while True:
+            message = await self.broker.get_message(dead_letter_queue)
+            if message is None:
+                return purged
+            await message.ack()
+            purged += 1
+
+
+async def _run_cli(args: argparse.Namespace):
+    from .messaging import messaging_manager
+
+    await messaging_manager.rabbitmq.connect()
+    manager = DeadLetterManager(messaging_manager.rabbitmq)
+    try:
+        if args.command == "inspect":
+            result = {
+                "queue": args.queue,
+                "depth": await manager.depth(args.queue),
+                "messages": await manager.inspect(args.queue, args.limit)
+            }
+        elif args.command == "replay":
+            result = {"queue": args.queue, "replayed": await manager.replay(args.queue, args.limit, args.rate)}
+        else:
+            result = {"queue": args.queue, "purged": await manager.purge(args.queue)}
+
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        await messaging_manager.rabbitmq.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay dead-lettered messages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    inspect_parser = subparsers.add_parser("inspect", help="Show dead letters without removing them")
+    inspect_parser.add_argument("queue", choices=WORK_QUEUES)
+    inspect_parser.add_argument("--limit", type=int, default=10)
+
+    replay_parser = subparsers.add_parser("replay", help="Move dead letters back onto the work queue")
+    replay_parser.add_argument("queue", choices=WORK_QUEUES)
+    replay_parser.add_argument("--limit", type=int, default=None)
+    replay_parser.add_argument("--rate", type=float, default=None, help="Messages per second")
+
+    purge_parser = subparsers.add_parser("purge", help="Delete all dead letters")
+    purge_parser.add_argument("queue", choices=WORK_QUEUES)
+
+    asyncio.run(_run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Shared runtime diagnostics: event-loop lag monitoring and blocking-call detection
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds', 'Delay of a scheduled wake-up on the event loop', ['service'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+EVENT_LOOP_BLOCKED = Counter(
+    'event_loop_blocked_total', 'Times a callback held the event loop past the blocking threshold', ['service']
+)
+
+
+class EventLoopMonitor:
+    """Measures event-loop lag and reports what is blocking the loop.
+
+    A task on the loop sleeps for ``interval`` and records how late it woke
+    up; every wake-up is observed in ``event_loop_lag_seconds`` and refreshes
+    a heartbeat. A watchdog thread checks the heartbeat, and when the loop
+    has not come back within ``interval + threshold`` it captures the loop
+    thread's current stack - the blocking call itself, e.g. a synchronous
+    SDK or bcrypt call inside ``async def`` - logs it once per stall and
+    keeps the most recent reports in ``reports``.
+    """
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None, max_reports: int = 20):
+        self.interval = interval or settings.loop_monitor_interval
+        self.threshold = threshold or settings.loop_monitor_threshold
+        self.service = "unknown"
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=max_reports)
+        self._heartbeat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def _measure(self):
+        loop = asyncio.get_running_loop()
+        lag = EVENT_LOOP_LAG.labels(service=self.service)
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag.observe(max(0.0, loop.time() - scheduled - self.interval))
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        stalled_since = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat <= self.interval + self.threshold:
+                stalled_since = None
+                continue
+            if stalled_since == heartbeat:
+                continue  # already reported this stall
+            stalled_since = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._report(frame, time.monotonic() - heartbeat - self.interval)
+
+    def _report(self, frame, blocked_for: float):
+        stack = traceback.format_stack(frame)
+        EVENT_LOOP_BLOCKED.labels(service=self.service).inc()
+        self.reports.append({"timestamp": time.time(), "blocked_for": blocked_for, "stack": stack})
+        logger.warning(
+            f"Event loop of {self.service} blocked for over {blocked_for:.3f}s at:\n{''.join(stack[-10:])}"
+        )
+
+    def recent_reports(self) -> List[Dict[str, Any]]:
+        return list(self.reports)
+
+    async def start(self, service: str):
+        """Start monitoring the running loop; call from the service lifespan"""
+        if not settings.loop_monitor_enabled or self._task is not None:
+            return
+        self.service = service
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name=f"{service}-loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started for {service}")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join(timeout=self.interval)
+        self._watchdog = None
+
+
+# Global monitor instance, one per service process
+loop_monitor = EventLoopMonitor()
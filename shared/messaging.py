@@ -1,20 +1,280 @@
 """
 Shared messaging utilities for RabbitMQ, AWS SQS, and AWS SNS
 """
-import json
+import base64
+import re
+import time
 import asyncio
-from typing import Dict, Any, Optional, Callable, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from enum import IntEnum
+from functools import lru_cache, partial
+from typing import Dict, Any, Optional, Callable, List, NamedTuple, Tuple
 from abc import ABC, abstractmethod
 import logging
 
-import pika
+import aio_pika
+from aio_pika import DeliveryMode, ExchangeType
+from aio_pika.pool import Pool
 import boto3
 from aioboto3 import Session
+from prometheus_client import Counter, Histogram, Gauge
 
 from .config import settings
+from .serialization import (
+    JSON_CONTENT_TYPE, MessageSerializer, get_codec, message_serializer, json_serializer
+)
 
 logger = logging.getLogger(__name__)
 
+# Consumer metrics
+CONSUMER_MESSAGES = Counter(
+    'messaging_consumer_messages_total', 'Messages handled by queue consumers', ['queue', 'status']
+)
+CONSUMER_HANDLER_DURATION = Histogram(
+    'messaging_consumer_handler_seconds', 'Queue consumer handler latency', ['queue'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+CONSUMER_IN_FLIGHT = Gauge(
+    'messaging_consumer_in_flight', 'Messages currently being handled', ['queue']
+)
+PUBLISHER_BATCH_SIZE = Histogram(
+    'messaging_publisher_batch_size', 'Messages per batched publish', ['exchange'],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+PUBLISHER_FLUSH_LATENCY = Histogram(
+    'messaging_publisher_flush_seconds', 'Time from first queued message to batch confirm', ['exchange'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+SQS_API_CALLS = Counter(
+    'messaging_sqs_api_calls_total', 'SQS API requests', ['operation']
+)
+DELIVERY_LATENCY = Histogram(
+    'messaging_delivery_latency_seconds', 'Time from publish to handler start', ['queue', 'priority'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+)
+
+# Header marking a message whose body is a list of batched messages
+BATCH_HEADER = 'x-batch-size'
+
+# Header carrying the publish time (epoch seconds) for delivery latency metrics
+PUBLISHED_AT_HEADER = 'x-published-at'
+
+
+class Priority(IntEnum):
+    """Message priority; priority queues deliver higher values first"""
+    LOW = 0
+    NORMAL = 1
+    HIGH = 2
+    URGENT = 3
+
+
+def priority_label(priority: Optional[int]) -> str:
+    """Metric label for a delivered message's priority (unset counts as the lowest)"""
+    return Priority(min(max(priority or 0, Priority.LOW), Priority.URGENT)).name.lower()
+
+# SQS batch request limits
+SQS_MAX_BATCH_SIZE = 10
+SQS_MAX_BATCH_BYTES = 262144  # 256 KiB total payload per SendMessageBatch
+
+
+# Broker topology shared by every MessageBroker implementation
+DEAD_LETTER_EXCHANGE = 'dead.letter'
+QUEUE_MESSAGE_TTL_MS = 3600000  # 1 hour TTL
+
+EXCHANGES = {
+    'trading.events': 'topic',      # Trading events
+    'payment.events': 'topic',      # Payment events
+    'ai.processing': 'topic',       # AI processing
+    'notifications': 'fanout',      # Notifications
+    DEAD_LETTER_EXCHANGE: 'direct'  # Dead letters
+}
+
+# (queue, exchange, binding key)
+QUEUE_BINDINGS = [
+    # Document processing queues
+    ('document.processing', 'ai.processing', 'document.process'),
+    ('document.completed', 'ai.processing', 'document.completed'),
+    
+    # Trading queues
+    ('trading.orders', 'trading.events', 'order.*'),
+    ('trading.positions', 'trading.events', 'position.*'),
+    
+    # Payment queues
+    ('payment.webhooks', 'payment.events', 'stripe.*'),
+    ('payment.billing', 'payment.events', 'billing.*'),
+    
+    # Notification queues
+    ('notifications.email', 'notifications', ''),
+    ('notifications.push', 'notifications', ''),
+]
+
+# Queues declared with x-max-priority. Each priority level is a separate
+# sub-queue inside RabbitMQ, so levels are kept few and only queues that mix
+# bulk and latency-sensitive traffic get them
+PRIORITY_QUEUES = {
+    'document.processing',   # small documents ahead of large PDF backlogs
+    'trading.orders',
+    'notifications.email',   # margin calls ahead of campaigns
+    'notifications.push',
+}
+
+
+def unbatch(payload: Any, headers: Optional[Dict[str, Any]]) -> List[Any]:
+    """Split a delivered payload into the messages it carries"""
+    if headers and BATCH_HEADER in headers:
+        return list(payload)
+    return [payload]
+
+
+# Retry bookkeeping headers
+ATTEMPTS_HEADER = 'x-attempts'
+LAST_ERROR_HEADER = 'x-last-error'
+REPLAYED_HEADER = 'x-replayed'
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    return f'{queue_name}.dead'
+
+
+def retry_queue_name(queue_name: str, delay_ms: int) -> str:
+    return f'{queue_name}.retry.{delay_ms}'
+
+
+def retry_queue_arguments(queue_name: str, delay_ms: int) -> Dict[str, Any]:
+    """Delay queue arguments: messages wait ``delay_ms`` then return to the work queue"""
+    return {
+        'x-dead-letter-exchange': '',
+        'x-dead-letter-routing-key': queue_name,
+        'x-message-ttl': delay_ms
+    }
+
+
+def retry_delay_for_attempt(attempt: int) -> Optional[int]:
+    """Delay tier for a failed delivery attempt, or None once attempts are exhausted"""
+    delays = settings.retry_delays_ms
+    if not delays or attempt >= settings.max_delivery_attempts:
+        return None
+    return delays[min(attempt, len(delays)) - 1]
+
+
+async def schedule_retry(broker: "MessageBroker", queue_name: str, message, error: Exception) -> bool:
+    """Copy a failed delivery to its delay queue, or dead-letter it once attempts run out.
+
+    Returns True when the delivery was copied; the caller must then ack the
+    original. Otherwise the delivery has been nacked to the dead letter queue.
+    """
+    headers = dict(message.headers or {})
+    attempt = int(headers.get(ATTEMPTS_HEADER, 0)) + 1
+    delay_ms = retry_delay_for_attempt(attempt)
+    
+    if delay_ms is not None:
+        headers[ATTEMPTS_HEADER] = attempt
+        headers[LAST_ERROR_HEADER] = str(error)[:256]
+        if await broker.publish_raw(
+            '', retry_queue_name(queue_name, delay_ms), message.body, headers,
+            message.content_type, message.content_encoding, message.priority
+        ):
+            return True
+    
+    try:
+        await message.nack(requeue=False)
+    except Exception as nack_error:
+        logger.error(f"Failed to nack message on {queue_name}: {nack_error}")
+    return False
+
+
+def dead_letter_arguments(queue_name: str) -> Dict[str, Any]:
+    """Queue arguments routing rejected and expired messages to the queue's dead letter queue"""
+    return {
+        'x-dead-letter-exchange': DEAD_LETTER_EXCHANGE,
+        'x-dead-letter-routing-key': dead_letter_queue_name(queue_name),
+        'x-message-ttl': QUEUE_MESSAGE_TTL_MS
+    }
+
+
+def work_queue_arguments(queue_name: str) -> Dict[str, Any]:
+    """Arguments for a work queue: dead lettering plus priority levels where enabled"""
+    arguments = dead_letter_arguments(queue_name)
+    if queue_name in PRIORITY_QUEUES:
+        arguments['x-max-priority'] = int(Priority.URGENT)
+    return arguments
+
+
+class MicroBatcher:
+    """Coalesces individual operations into batch calls.
+
+    Items are flushed when ``max_batch_size`` are pending or ``flush_interval``
+    seconds after the first item arrived, whichever comes first. ``batch_fn``
+    receives the items and returns per-item success flags. ``on_flush`` is
+    called with the batch size and the seconds from the first item's arrival
+    until the batch completed.
+    """
+    
+    def __init__(self, batch_fn: Callable[[List[Any]], Any], max_batch_size: int,
+                 flush_interval: float, on_flush: Optional[Callable[[int, float], None]] = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.pending: List[Tuple[Any, asyncio.Future]] = []
+        self.tasks: set = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._first_item_at = 0.0
+        self.stats = {"items": 0, "batches": 0}
+    
+    def submit(self, item: Any) -> "asyncio.Future":
+        """Queue an item; the returned future resolves to its success flag"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.pending:
+            self._first_item_at = time.perf_counter()
+        self.pending.append((item, future))
+        self.stats["items"] += 1
+        
+        if len(self.pending) >= self.max_batch_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._flush_pending)
+        
+        return future
+    
+    def _flush_pending(self):
+        """Hand the pending items to a background batch call"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        
+        if not self.pending:
+            return
+        
+        batch, self.pending = self.pending, []
+        task = asyncio.ensure_future(self._run_batch(batch, self._first_item_at))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future]], first_item_at: float):
+        self.stats["batches"] += 1
+        try:
+            results = await self.batch_fn([item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} items failed: {e}")
+            results = [False] * len(batch)
+        
+        for (_, future), success in zip(batch, results):
+            if not future.done():
+                future.set_result(success)
+        
+        if self.on_flush:
+            self.on_flush(len(batch), time.perf_counter() - first_item_at)
+    
+    async def flush(self):
+        """Send everything pending and wait for in-flight batches"""
+        self._flush_pending()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
 
 class MessageBroker(ABC):
     """Abstract base class for message brokers"""
@@ -36,143 +296,179 @@ class MessageBroker(ABC):
 
 
 class RabbitMQManager(MessageBroker):
-    """RabbitMQ message broker implementation"""
+    """RabbitMQ message broker implementation on a native asyncio AMQP client"""
     
     def __init__(self):
         self.connection = None
         self.channel = None
+        self.connection_pool: Optional[Pool] = None
+        self.channel_pool: Optional[Pool] = None
         self.callbacks = {}
+        self._connect_lock = asyncio.Lock()
     
     async def connect(self):
-        """Establish RabbitMQ connection"""
-        try:
-            # Parse RabbitMQ URL
-            import pika
-            from urllib.parse import urlparse
-            
-            parsed = urlparse(settings.rabbitmq_url)
-            credentials = pika.PlainCredentials(parsed.username, parsed.password)
-            parameters = pika.ConnectionParameters(
-                host=parsed.hostname,
-                port=parsed.port or 5672,
-                credentials=credentials,
-                heartbeat=600,
-                blocked_connection_timeout=300
-            )
-            
-            self.connection = pika.BlockingConnection(parameters)
-            self.channel = self.connection.channel()
-            
-            # Declare exchanges and queues
-            await self._setup_exchanges_and_queues()
-            
-            logger.info("Connected to RabbitMQ")
+        """Establish RabbitMQ connection, publisher pools and topology"""
+        async with self._connect_lock:
+            if self.channel and not self.channel.is_closed:
+                return
             
-        except Exception as e:
-            logger.error(f"Failed to connect to RabbitMQ: {e}")
-            raise
+            try:
+                # Dedicated connection for topology and consumers
+                self.connection = await aio_pika.connect_robust(
+                    settings.rabbitmq_url,
+                    heartbeat=settings.rabbitmq_heartbeat
+                )
+                self.channel = await self.connection.channel()
+                
+                # Pooled publisher connections and confirm-mode channels so that
+                # concurrent publishers never serialize on a single channel
+                self.connection_pool = Pool(
+                    self._create_connection,
+                    max_size=settings.rabbitmq_connection_pool_size
+                )
+                self.channel_pool = Pool(
+                    self._create_channel,
+                    max_size=settings.rabbitmq_channel_pool_size
+                )
+                
+                # Declare exchanges and queues
+                await self._setup_exchanges_and_queues()
+                
+                logger.info("Connected to RabbitMQ")
+                
+            except Exception as e:
+                logger.error(f"Failed to connect to RabbitMQ: {e}")
+                raise
+    
+    async def _create_connection(self) -> aio_pika.abc.AbstractRobustConnection:
+        """Create a pooled publisher connection"""
+        return await aio_pika.connect_robust(
+            settings.rabbitmq_url,
+            heartbeat=settings.rabbitmq_heartbeat
+        )
+    
+    async def _create_channel(self) -> aio_pika.abc.AbstractChannel:
+        """Create a pooled publisher channel with publisher confirms enabled"""
+        async with self.connection_pool.acquire() as connection:
+            return await connection.channel(publisher_confirms=True)
     
     async def _setup_exchanges_and_queues(self):
         """Setup RabbitMQ exchanges and queues"""
-        # Trading events exchange
-        self.channel.exchange_declare(
-            exchange='trading.events',
-            exchange_type='topic',
-            durable=True
-        )
-        
-        # Payment events exchange
-        self.channel.exchange_declare(
-            exchange='payment.events',
-            exchange_type='topic',
-            durable=True
-        )
-        
-        # AI processing exchange
-        self.channel.exchange_declare(
-            exchange='ai.processing',
-            exchange_type='topic',
-            durable=True
-        )
-        
-        # Notification exchange
-        self.channel.exchange_declare(
-            exchange='notifications',
-            exchange_type='fanout',
-            durable=True
-        )
-        
-        # Dead letter exchange
-        self.channel.exchange_declare(
-            exchange='dead.letter',
-            exchange_type='direct',
-            durable=True
-        )
-        
-        # Document processing queues
-        self._declare_queue_with_dlx('document.processing', 'ai.processing', 'document.process')
-        self._declare_queue_with_dlx('document.completed', 'ai.processing', 'document.completed')
-        
-        # Trading queues
-        self._declare_queue_with_dlx('trading.orders', 'trading.events', 'order.*')
-        self._declare_queue_with_dlx('trading.positions', 'trading.events', 'position.*')
-        
-        # Payment queues
-        self._declare_queue_with_dlx('payment.webhooks', 'payment.events', 'stripe.*')
-        self._declare_queue_with_dlx('payment.billing', 'payment.events', 'billing.*')
+        for exchange, exchange_type in EXCHANGES.items():
+            await self.channel.declare_exchange(
+                exchange, ExchangeType(exchange_type), durable=True
+            )
         
-        # Notification queues
-        self._declare_queue_with_dlx('notifications.email', 'notifications', '')
-        self._declare_queue_with_dlx('notifications.push', 'notifications', '')
+        for queue_name, exchange, routing_key in QUEUE_BINDINGS:
+            await self._declare_queue_with_dlx(queue_name, exchange, routing_key)
     
-    def _declare_queue_with_dlx(self, queue_name: str, exchange: str, routing_key: str):
+    async def _declare_queue_with_dlx(self, queue_name: str, exchange: str, routing_key: str):
         """Declare queue with dead letter exchange"""
         # Main queue
-        self.channel.queue_declare(
-            queue=queue_name,
+        queue = await self.channel.declare_queue(
+            queue_name,
             durable=True,
-            arguments={
-                'x-dead-letter-exchange': 'dead.letter',
-                'x-dead-letter-routing-key': f'{queue_name}.dead',
-                'x-message-ttl': 3600000  # 1 hour TTL
-            }
+            arguments=work_queue_arguments(queue_name)
         )
         
         # Dead letter queue
-        self.channel.queue_declare(
-            queue=f'{queue_name}.dead',
+        dead_letter_queue = await self.channel.declare_queue(
+            dead_letter_queue_name(queue_name),
             durable=True
         )
         
+        # Retry delay queues, published to through the default exchange
+        for delay_ms in settings.retry_delays_ms:
+            await self.channel.declare_queue(
+                retry_queue_name(queue_name, delay_ms),
+                durable=True,
+                arguments=retry_queue_arguments(queue_name, delay_ms)
+            )
+        
         # Bind queues
-        self.channel.queue_bind(
-            exchange=exchange,
-            queue=queue_name,
-            routing_key=routing_key
+        await queue.bind(exchange, routing_key=routing_key)
+        await dead_letter_queue.bind(DEAD_LETTER_EXCHANGE, routing_key=dead_letter_queue_name(queue_name))
+    
+    def _build_message(self, message: Any, headers: Optional[Dict[str, Any]] = None,
+                       priority: Optional[int] = None,
+                       serializer: Optional[MessageSerializer] = None) -> aio_pika.Message:
+        """Build a persistent AMQP message stamped with its publish time"""
+        body, content_type, content_encoding = (serializer or message_serializer).serialize(message)
+        return aio_pika.Message(
+            body=body,
+            headers={**(headers or {}), PUBLISHED_AT_HEADER: time.time()},
+            content_type=content_type,
+            content_encoding=content_encoding,
+            delivery_mode=DeliveryMode.PERSISTENT,
+            priority=int(Priority.NORMAL if priority is None else priority),
+            timestamp=datetime.utcnow()
         )
+    
+    async def publish_raw(self, exchange: str, routing_key: str, body: bytes, headers: Dict[str, Any],
+                          content_type: Optional[str], content_encoding: Optional[str],
+                          priority: Optional[int] = None) -> bool:
+        """Republish an already-encoded body (retries and dead letter replay)"""
+        try:
+            if not self.channel_pool:
+                await self.connect()
+            
+            async with self.channel_pool.acquire() as channel:
+                target = await self._get_exchange(channel, exchange)
+                await target.publish(
+                    aio_pika.Message(
+                        body=body,
+                        headers=headers,
+                        content_type=content_type,
+                        content_encoding=content_encoding,
+                        delivery_mode=DeliveryMode.PERSISTENT,
+                        priority=priority,
+                        timestamp=datetime.utcnow()
+                    ),
+                    routing_key=routing_key
+                )
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to republish message to {exchange or 'default'}/{routing_key}: {e}")
+            return False
+    
+    async def get_message(self, queue: str) -> Optional[aio_pika.abc.AbstractIncomingMessage]:
+        """Fetch one unacknowledged message from a queue, or None when it is empty"""
+        if not self.channel:
+            await self.connect()
         
-        self.channel.queue_bind(
-            exchange='dead.letter',
-            queue=f'{queue_name}.dead',
-            routing_key=f'{queue_name}.dead'
-        )
+        amqp_queue = await self.channel.get_queue(queue, ensure=False)
+        return await amqp_queue.get(no_ack=False, fail=False)
+    
+    async def queue_depth(self, queue: str) -> int:
+        """Number of ready messages in a queue"""
+        if not self.channel:
+            await self.connect()
+        
+        amqp_queue = await self.channel.declare_queue(queue, passive=True)
+        return amqp_queue.declaration_result.message_count
     
-    async def publish(self, exchange: str, routing_key: str, message: Dict[str, Any]) -> bool:
-        """Publish message to RabbitMQ"""
+    async def _get_exchange(self, channel: aio_pika.abc.AbstractChannel, exchange: str):
+        """Resolve an exchange on a channel without a broker round trip"""
+        if not exchange:
+            return channel.default_exchange
+        return await channel.get_exchange(exchange, ensure=False)
+    
+    async def publish(self, exchange: str, routing_key: str, message: Any,
+                      headers: Optional[Dict[str, Any]] = None, priority: Optional[int] = None,
+                      serializer: Optional[MessageSerializer] = None) -> bool:
+        """Publish message to RabbitMQ and wait for the broker confirm"""
         try:
-            if not self.channel:
+            if not self.channel_pool:
                 await self.connect()
             
-            self.channel.basic_publish(
-                exchange=exchange,
-                routing_key=routing_key,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Persistent message
-                    content_type='application/json',
-                    timestamp=int(asyncio.get_event_loop().time())
+            async with self.channel_pool.acquire() as channel:
+                target = await self._get_exchange(channel, exchange)
+                await target.publish(
+                    self._build_message(message, headers, priority, serializer),
+                    routing_key=routing_key,
+                    mandatory=False
                 )
-            )
             
             logger.debug(f"Published message to {exchange}/{routing_key}")
             return True
@@ -181,25 +477,69 @@ class RabbitMQManager(MessageBroker):
             logger.error(f"Failed to publish message: {e}")
             return False
     
+    async def publish_batch(self, exchange: str, messages: List[Tuple[str, Dict[str, Any]]],
+                            priority: Optional[int] = None,
+                            serializer: Optional[MessageSerializer] = None) -> int:
+        """Publish many (routing_key, message) pairs on one channel.
+
+        All messages are written before any confirm is awaited, so the broker
+        acknowledges the batch together instead of one round trip per message.
+        Returns the number of confirmed messages.
+        """
+        if not messages:
+            return 0
+        
+        try:
+            if not self.channel_pool:
+                await self.connect()
+            
+            async with self.channel_pool.acquire() as channel:
+                target = await self._get_exchange(channel, exchange)
+                results = await asyncio.gather(
+                    *(
+                        target.publish(
+                            self._build_message(message, priority=priority, serializer=serializer),
+                            routing_key=routing_key,
+                            mandatory=False
+                        )
+                        for routing_key, message in messages
+                    ),
+                    return_exceptions=True
+                )
+            
+            failures = [r for r in results if isinstance(r, Exception)]
+            if failures:
+                logger.error(f"Failed to confirm {len(failures)}/{len(messages)} messages on {exchange}: {failures[0]}")
+            
+            return len(messages) - len(failures)
+            
+        except Exception as e:
+            logger.error(f"Failed to publish batch to {exchange}: {e}")
+            return 0
+    
     async def subscribe(self, queue: str, callback: Callable) -> None:
         """Subscribe to queue with callback"""
         try:
             if not self.channel:
                 await self.connect()
             
-            def wrapper(ch, method, properties, body):
+            async def wrapper(incoming: aio_pika.abc.AbstractIncomingMessage):
                 try:
-                    message = json.loads(body)
-                    callback(message)
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    payload = message_serializer.deserialize(
+                        incoming.body, incoming.content_type, incoming.content_encoding
+                    )
+                    for message in unbatch(payload, incoming.headers):
+                        result = callback(message)
+                        if asyncio.iscoroutine(result):
+                            await result
+                    await incoming.ack()
                 except Exception as e:
-                    logger.error(f"Error processing message: {e}")
-                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                    logger.error(f"Error processing message from {queue}: {e}")
+                    if await schedule_retry(self, queue, incoming, e):
+                        await incoming.ack()
             
-            self.channel.basic_consume(
-                queue=queue,
-                on_message_callback=wrapper
-            )
+            amqp_queue = await self.channel.get_queue(queue, ensure=False)
+            await amqp_queue.consume(wrapper)
             
             self.callbacks[queue] = callback
             
@@ -208,9 +548,576 @@ class RabbitMQManager(MessageBroker):
             raise
     
     async def close(self):
-        """Close RabbitMQ connection"""
+        """Close RabbitMQ connection and publisher pools"""
+        if self.channel_pool:
+            await self.channel_pool.close()
+        if self.connection_pool:
+            await self.connection_pool.close()
         if self.connection and not self.connection.is_closed:
-            self.connection.close()
+            await self.connection.close()
+        self.channel = None
+        self.channel_pool = None
+        self.connection_pool = None
+
+
+@lru_cache(maxsize=1024)
+def _compile_topic_pattern(binding_key: str) -> "re.Pattern":
+    """Compile an AMQP topic binding key ('*' = one word, '#' = zero or more words)"""
+    if binding_key == '#':
+        return re.compile(r'.*')
+    
+    pattern = ''
+    separator = ''
+    for index, word in enumerate(binding_key.split('.')):
+        if word == '#':
+            # '#' absorbs the dot next to it so it can also match zero words
+            pattern += r'(?:[^.]+\.)*' if index == 0 else r'(?:\.[^.]+)*'
+            separator = '' if index == 0 else r'\.'
+            continue
+        pattern += separator + (r'[^.]+' if word == '*' else re.escape(word))
+        separator = r'\.'
+    
+    return re.compile(pattern)
+
+
+def topic_matches(binding_key: str, routing_key: str) -> bool:
+    """Check whether a routing key matches an AMQP topic binding key"""
+    return _compile_topic_pattern(binding_key).fullmatch(routing_key) is not None
+
+
+def matching_queues(exchange_type: str, bindings: List[Tuple[str, str]], routing_key: str) -> List[str]:
+    """Queues an exchange of the given type delivers a routing key to, given (binding key, queue) pairs"""
+    if exchange_type == 'fanout':
+        targets = [queue for _, queue in bindings]
+    elif exchange_type == 'direct':
+        targets = [queue for key, queue in bindings if key == routing_key]
+    else:
+        targets = [queue for key, queue in bindings if topic_matches(key, routing_key)]
+    return list(dict.fromkeys(targets))
+
+
+class EventRoute(NamedTuple):
+    """Where and how an event type is published"""
+    event_type: str
+    exchange: str
+    routing_key: str
+    serializer: MessageSerializer
+    priority: Optional[Priority]
+    queues: Tuple[str, ...]
+
+
+# Event registry: event type -> (exchange, routing key, codec, priority).
+# A codec of None uses MESSAGE_CODEC and a priority of None publishes at
+# NORMAL unless the caller overrides it
+EVENT_DEFINITIONS = {
+    # Trading events
+    'order_created': ('trading.events', 'order.created', None, None),
+    'order_filled': ('trading.events', 'order.filled', None, None),
+    'order_executed': ('trading.events', 'order.executed', None, None),
+    'position_updated': ('trading.events', 'position.updated', None, None),
+    
+    # Payment events
+    'payment_received': ('payment.events', 'billing.payment_received', None, None),
+    'payment_succeeded': ('payment.events', 'billing.payment_succeeded', None, None),
+    'payment_failed': ('payment.events', 'billing.payment_failed', None, Priority.HIGH),
+    'subscription_created': ('payment.events', 'billing.subscription_created', None, None),
+    
+    # Document processing events
+    'document_uploaded': ('ai.processing', 'document.process', None, None),
+    'document_processed': ('ai.processing', 'document.completed', None, None),
+    
+    # Notification events (fanout; routing keys are descriptive only)
+    'user_created': ('notifications', 'user.created', None, None),
+    'user_verified': ('notifications', 'user.verified', None, None),
+    'user_notification': ('notifications', 'user.notification', None, None),
+    'notification_requested': ('notifications', 'notification.requested', None, None),
+    'margin_call': ('notifications', 'margin.call', None, Priority.URGENT),
+}
+
+
+def compile_event_registry(definitions: Dict[str, tuple],
+                           exchanges: Optional[Dict[str, str]] = None,
+                           bindings: Optional[List[Tuple[str, str, str]]] = None) -> Dict[str, EventRoute]:
+    """Resolve event definitions against the declared topology.
+
+    Raises ValueError for an event published to an undeclared exchange or
+    with a routing key no queue is bound to, so misrouted events fail at
+    startup instead of being silently dropped by the broker.
+    """
+    exchanges = EXCHANGES if exchanges is None else exchanges
+    bindings = QUEUE_BINDINGS if bindings is None else bindings
+    
+    exchange_bindings: Dict[str, List[Tuple[str, str]]] = {}
+    for queue, exchange, binding_key in bindings:
+        exchange_bindings.setdefault(exchange, []).append((binding_key, queue))
+    
+    serializers = {None: message_serializer, 'json': json_serializer}
+    registry = {}
+    errors = []
+    
+    for event_type, (exchange, routing_key, codec, priority) in definitions.items():
+        if exchange not in exchanges:
+            errors.append(f"{event_type}: exchange '{exchange}' is not declared")
+            continue
+        
+        queues = matching_queues(exchanges[exchange], exchange_bindings.get(exchange, []), routing_key)
+        if not queues:
+            errors.append(f"{event_type}: no queue bound to {exchange}/{routing_key}")
+            continue
+        
+        if codec not in serializers:
+            serializers[codec] = MessageSerializer(
+                get_codec(codec),
+                compression_threshold=settings.message_compression_threshold,
+                compression_level=settings.message_compression_level
+            )
+        
+        registry[event_type] = EventRoute(
+            event_type, exchange, routing_key, serializers[codec],
+            Priority(priority) if priority is not None else None, tuple(queues)
+        )
+    
+    if errors:
+        raise ValueError("Invalid event registry: " + "; ".join(errors))
+    return registry
+
+
+# Compiled at import so a bad route stops the service at startup and every
+# publish is a single dict lookup
+EVENT_REGISTRY = compile_event_registry(EVENT_DEFINITIONS)
+
+
+def get_event_route(event_type: str) -> EventRoute:
+    """Registered route for an event type"""
+    try:
+        return EVENT_REGISTRY[event_type]
+    except KeyError:
+        raise KeyError(f"Unregistered event type: {event_type}") from None
+
+
+def resolve_event(event_type: str) -> Tuple[str, str]:
+    """Exchange and routing key an event type is published to"""
+    route = get_event_route(event_type)
+    return route.exchange, route.routing_key
+
+
+class InMemoryMessage:
+    """Delivery from the in-process broker, mirroring aio-pika's IncomingMessage"""
+    
+    def __init__(self, channel: "InMemoryChannel", queue: "InMemoryQueue", delivery_tag: int,
+                 body: bytes, headers: Dict[str, Any], properties: Dict[str, Any], redelivered: bool):
+        self.channel = channel
+        self.queue = queue
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.headers = headers
+        self.properties = properties
+        self.content_type = properties.get('content_type')
+        self.content_encoding = properties.get('content_encoding')
+        self.priority = properties.get('priority')
+        self.redelivered = redelivered
+    
+    async def ack(self, multiple: bool = False):
+        self.channel._settle(self.delivery_tag, multiple, dead_letter=False, requeue=False)
+    
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        self.channel._settle(self.delivery_tag, multiple, dead_letter=not requeue, requeue=requeue)
+    
+    async def reject(self, requeue: bool = False):
+        await self.nack(requeue=requeue)
+
+
+class InMemoryQueue:
+    """Queue held by the in-process broker"""
+    
+    def __init__(self, broker: "InMemoryBroker", name: str, arguments: Optional[Dict[str, Any]] = None):
+        self.broker = broker
+        self.name = name
+        self.arguments = arguments or {}
+        self.max_priority = self.arguments.get('x-max-priority')
+        self.messages: deque = deque()
+        self.consumer_tasks: Dict[str, asyncio.Task] = {}
+        self._not_empty = asyncio.Event()
+        self._expiry_timer: Optional[asyncio.TimerHandle] = None
+    
+    def put(self, body: bytes, headers: Dict[str, Any], properties: Dict[str, Any], redelivered: bool = False):
+        """Enqueue a message, stamping its TTL deadline.
+
+        Priority queues keep messages ordered by priority (FIFO within a
+        level); scanning from the tail keeps the common same-priority case O(1).
+        """
+        ttl = self.arguments.get('x-message-ttl')
+        expires_at = time.monotonic() + ttl / 1000 if ttl else None
+        item = (body, headers, properties, expires_at, redelivered)
+        
+        if self.max_priority:
+            priority = self._priority(properties)
+            index = len(self.messages)
+            while index and self._priority(self.messages[index - 1][2]) < priority:
+                index -= 1
+            self.messages.insert(index, item)
+        else:
+            self.messages.append(item)
+        self._not_empty.set()
+        
+        if ttl:
+            # Like RabbitMQ, expire from the head even when nobody consumes
+            self._schedule_expiry()
+    
+    def _priority(self, properties: Dict[str, Any]) -> int:
+        return min(properties.get('priority') or 0, self.max_priority)
+    
+    def get_nowait(self) -> Optional[tuple]:
+        """Pop the next live message, dead-lettering expired ones"""
+        self.expire()
+        if not self.messages:
+            self._not_empty.clear()
+            return None
+        return self.messages.popleft()
+    
+    async def get(self) -> tuple:
+        """Wait for the next live message"""
+        while True:
+            item = self.get_nowait()
+            if item is not None:
+                return item
+            await self._not_empty.wait()
+    
+    def _schedule_expiry(self):
+        """Keep one timer per queue, due when the message at the head expires"""
+        if self._expiry_timer is not None or not self.messages or self.messages[0][3] is None:
+            return
+        delay = max(0.0, self.messages[0][3] - time.monotonic())
+        self._expiry_timer = asyncio.get_running_loop().call_later(delay, self._expiry_due)
+    
+    def _expiry_due(self):
+        self._expiry_timer = None
+        self.expire()
+        self._schedule_expiry()
+    
+    def expire(self):
+        """Dead-letter expired messages at the head of the queue"""
+        now = time.monotonic()
+        while self.messages and self.messages[0][3] is not None and self.messages[0][3] <= now:
+            body, headers, properties, _, _ = self.messages.popleft()
+            self.dead_letter(body, headers, properties, 'expired')
+    
+    async def bind(self, exchange: str, routing_key: str = ''):
+        self.broker.bind(self.name, exchange, routing_key)
+    
+    async def consume(self, callback: Callable, **kwargs) -> str:
+        """Start delivering messages to callback; returns the consumer tag"""
+        return self.broker._start_consumer(self, callback)
+    
+    async def cancel(self, consumer_tag: str, **kwargs):
+        task = self.consumer_tasks.pop(consumer_tag, None)
+        if task:
+            task.cancel()
+    
+    def dead_letter(self, body: bytes, headers: Dict[str, Any], properties: Dict[str, Any], reason: str):
+        """Route a rejected or expired message through the queue's dead letter exchange"""
+        if 'x-dead-letter-exchange' not in self.arguments:
+            return
+        exchange = self.arguments['x-dead-letter-exchange']
+        
+        headers = {**headers, 'x-first-death-queue': headers.get('x-first-death-queue', self.name),
+                   'x-first-death-reason': headers.get('x-first-death-reason', reason)}
+        self.broker.route(
+            exchange, self.arguments.get('x-dead-letter-routing-key', self.name),
+            body, headers, properties
+        )
+
+
+class InMemoryChannel:
+    """Channel of the in-process broker with prefetch and unacked-delivery tracking"""
+    
+    def __init__(self, broker: "InMemoryBroker"):
+        self.broker = broker
+        self.is_closed = False
+        self.prefetch: Optional[asyncio.Semaphore] = None
+        self.unacked: Dict[int, InMemoryMessage] = {}
+        self._next_tag = 0
+    
+    async def set_qos(self, prefetch_count: int = 0, **kwargs):
+        self.prefetch = asyncio.Semaphore(prefetch_count) if prefetch_count else None
+    
+    async def get_queue(self, name: str, ensure: bool = True) -> "_ChannelQueue":
+        return _ChannelQueue(self, self.broker.get_queue(name))
+    
+    def _deliver(self, queue: InMemoryQueue, body: bytes, headers: Dict[str, Any],
+                 properties: Dict[str, Any], redelivered: bool) -> InMemoryMessage:
+        self._next_tag += 1
+        message = InMemoryMessage(self, queue, self._next_tag, body, headers, properties, redelivered)
+        self.unacked[message.delivery_tag] = message
+        return message
+    
+    def _settle(self, delivery_tag: int, multiple: bool, dead_letter: bool, requeue: bool):
+        """Ack, reject or requeue one delivery (or every delivery up to the tag)"""
+        tags = [t for t in self.unacked if t <= delivery_tag] if multiple else [delivery_tag]
+        
+        for tag in tags:
+            message = self.unacked.pop(tag, None)
+            if message is None:
+                continue
+            if requeue:
+                message.queue.put(message.body, message.headers, message.properties, redelivered=True)
+            elif dead_letter:
+                message.queue.dead_letter(message.body, message.headers, message.properties, 'rejected')
+            if self.prefetch:
+                self.prefetch.release()
+    
+    async def close(self):
+        """Close the channel; unacknowledged deliveries go back to their queues"""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for tag in list(self.unacked):
+            self._settle(tag, False, dead_letter=False, requeue=True)
+
+
+class _ChannelQueue:
+    """Queue handle bound to the channel that consumes from it"""
+    
+    def __init__(self, channel: InMemoryChannel, queue: InMemoryQueue):
+        self.channel = channel
+        self.queue = queue
+    
+    async def consume(self, callback: Callable, **kwargs) -> str:
+        return self.channel.broker._start_consumer(self.queue, callback, self.channel)
+    
+    async def cancel(self, consumer_tag: str, **kwargs):
+        await self.queue.cancel(consumer_tag)
+
+
+class InMemoryBroker(MessageBroker):
+    """In-process broker with the same exchange, routing key and dead letter semantics as RabbitMQ.
+
+    Selected with ``MESSAGE_BROKER=memory``; lets tests and single-machine
+    benchmarks run full publish/consume pipelines without RabbitMQ or AWS.
+    Bodies go through the configured serializer so payloads that RabbitMQ
+    would reject fail here too.
+    """
+    
+    def __init__(self):
+        self.exchanges: Dict[str, str] = {}
+        self.bindings: Dict[str, List[Tuple[str, str]]] = {}
+        self.queues: Dict[str, InMemoryQueue] = {}
+        self.callbacks = {}
+        self.connection = None
+        self.default_channel: Optional[InMemoryChannel] = None
+        self._routes: Dict[Tuple[str, str], List[str]] = {}
+        self._consumer_count = 0
+        self.stats = {"published": 0, "routed": 0, "unroutable": 0}
+    
+    async def connect(self):
+        """Declare the standard topology"""
+        if self.connection:
+            return
+        
+        self.connection = self
+        self.default_channel = InMemoryChannel(self)
+        await self._setup_exchanges_and_queues()
+        logger.info("Connected to in-memory broker")
+    
+    async def _setup_exchanges_and_queues(self):
+        """Setup exchanges and queues (mirrors RabbitMQManager)"""
+        for exchange, exchange_type in EXCHANGES.items():
+            self.declare_exchange(exchange, exchange_type)
+        
+        for queue_name, exchange, routing_key in QUEUE_BINDINGS:
+            dead_letter_queue = dead_letter_queue_name(queue_name)
+            self.declare_queue(queue_name, work_queue_arguments(queue_name))
+            self.declare_queue(dead_letter_queue)
+            for delay_ms in settings.retry_delays_ms:
+                self.declare_queue(
+                    retry_queue_name(queue_name, delay_ms), retry_queue_arguments(queue_name, delay_ms)
+                )
+            self.bind(queue_name, exchange, routing_key)
+            self.bind(dead_letter_queue, DEAD_LETTER_EXCHANGE, dead_letter_queue)
+    
+    async def channel(self) -> InMemoryChannel:
+        """Open a channel (the broker doubles as its own connection)"""
+        return InMemoryChannel(self)
+    
+    @property
+    def is_closed(self) -> bool:
+        return self.connection is None
+    
+    def declare_exchange(self, name: str, exchange_type: str):
+        self.exchanges[name] = exchange_type
+        self.bindings.setdefault(name, [])
+    
+    def declare_queue(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> InMemoryQueue:
+        if name not in self.queues:
+            self.queues[name] = InMemoryQueue(self, name, arguments)
+        return self.queues[name]
+    
+    def get_queue(self, name: str) -> InMemoryQueue:
+        if name not in self.queues:
+            raise KeyError(f"Queue not declared: {name}")
+        return self.queues[name]
+    
+    def bind(self, queue: str, exchange: str, routing_key: str = ''):
+        if exchange not in self.exchanges:
+            raise KeyError(f"Exchange not declared: {exchange}")
+        self.bindings[exchange].append((routing_key, queue))
+        self._routes.clear()
+    
+    def route(self, exchange: str, routing_key: str, body: bytes,
+              headers: Dict[str, Any], properties: Dict[str, Any]) -> int:
+        """Deliver a message to every bound queue; returns the number of queues reached"""
+        if not exchange:
+            targets = [routing_key] if routing_key in self.queues else []
+        else:
+            # Binding matches are cached per routing key until the next bind
+            targets = self._routes.get((exchange, routing_key))
+            if targets is None:
+                exchange_type = self.exchanges.get(exchange)
+                if exchange_type is None:
+                    raise KeyError(f"Exchange not declared: {exchange}")
+                targets = matching_queues(exchange_type, self.bindings[exchange], routing_key)
+                self._routes[(exchange, routing_key)] = targets
+        
+        for queue in targets:
+            self.queues[queue].put(body, headers, properties)
+        
+        self.stats["routed" if targets else "unroutable"] += 1
+        return len(targets)
+    
+    async def publish(self, exchange: str, routing_key: str, message: Any,
+                      headers: Optional[Dict[str, Any]] = None, priority: Optional[int] = None,
+                      serializer: Optional[MessageSerializer] = None) -> bool:
+        """Publish message to the in-memory exchange"""
+        try:
+            if not self.connection:
+                await self.connect()
+            
+            body, content_type, content_encoding = (serializer or message_serializer).serialize(message)
+            self.route(
+                exchange, routing_key, body, {**(headers or {}), PUBLISHED_AT_HEADER: time.time()},
+                {
+                    'content_type': content_type,
+                    'content_encoding': content_encoding,
+                    'priority': int(Priority.NORMAL if priority is None else priority)
+                }
+            )
+            self.stats["published"] += 1
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to publish message: {e}")
+            return False
+    
+    async def publish_batch(self, exchange: str, messages: List[Tuple[str, Dict[str, Any]]],
+                            priority: Optional[int] = None,
+                            serializer: Optional[MessageSerializer] = None) -> int:
+        """Publish many (routing_key, message) pairs"""
+        published = 0
+        for routing_key, message in messages:
+            if await self.publish(exchange, routing_key, message, priority=priority, serializer=serializer):
+                published += 1
+        return published
+    
+    async def publish_raw(self, exchange: str, routing_key: str, body: bytes, headers: Dict[str, Any],
+                          content_type: Optional[str], content_encoding: Optional[str],
+                          priority: Optional[int] = None) -> bool:
+        """Republish an already-encoded body (retries and dead letter replay)"""
+        try:
+            self.route(
+                exchange, routing_key, body, dict(headers or {}),
+                {'content_type': content_type, 'content_encoding': content_encoding, 'priority': priority}
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to republish message to {exchange or 'default'}/{routing_key}: {e}")
+            return False
+    
+    async def get_message(self, queue: str) -> Optional[InMemoryMessage]:
+        """Fetch one unacknowledged message from a queue, or None when it is empty"""
+        item = self.get_queue(queue).get_nowait()
+        if item is None:
+            return None
+        body, headers, properties, _, redelivered = item
+        return self.default_channel._deliver(self.get_queue(queue), body, headers, properties, redelivered)
+    
+    async def queue_depth(self, queue: str) -> int:
+        """Number of ready messages in a queue"""
+        return self.get_queue_depth(queue)
+    
+    def _start_consumer(self, queue: InMemoryQueue, callback: Callable,
+                        channel: Optional[InMemoryChannel] = None) -> str:
+        """Spawn a delivery loop for one consumer"""
+        channel = channel or self.default_channel
+        self._consumer_count += 1
+        consumer_tag = f"ctag-{self._consumer_count}"
+        queue.consumer_tasks[consumer_tag] = asyncio.create_task(
+            self._deliver_loop(queue, channel, callback)
+        )
+        return consumer_tag
+    
+    async def _deliver_loop(self, queue: InMemoryQueue, channel: InMemoryChannel, callback: Callable):
+        """Deliver messages while respecting the channel's prefetch window"""
+        while not channel.is_closed:
+            if channel.prefetch:
+                await channel.prefetch.acquire()
+            
+            body, headers, properties, _, redelivered = await queue.get()
+            
+            message = channel._deliver(queue, body, headers, properties, redelivered)
+            try:
+                await callback(message)
+            except Exception as e:
+                logger.error(f"In-memory consumer on {queue.name} failed: {e}")
+    
+    async def subscribe(self, queue: str, callback: Callable) -> None:
+        """Subscribe to queue with callback"""
+        if not self.connection:
+            await self.connect()
+        
+        async def wrapper(incoming: InMemoryMessage):
+            try:
+                payload = message_serializer.deserialize(
+                    incoming.body, incoming.content_type, incoming.content_encoding
+                )
+                for message in unbatch(payload, incoming.headers):
+                    result = callback(message)
+                    if asyncio.iscoroutine(result):
+                        await result
+                await incoming.ack()
+            except Exception as e:
+                logger.error(f"Error processing message from {queue}: {e}")
+                if await schedule_retry(self, queue, incoming, e):
+                    await incoming.ack()
+        
+        self._start_consumer(self.get_queue(queue), wrapper)
+        self.callbacks[queue] = callback
+    
+    def get_queue_depth(self, queue: str) -> int:
+        """Number of ready (undelivered) messages in a queue"""
+        return len(self.get_queue(queue).messages)
+    
+    def get_messages(self, queue: str) -> List[Dict[str, Any]]:
+        """Remove and decode every ready message in a queue, unpacking batches (test helper)"""
+        messages = []
+        pending = self.get_queue(queue)
+        while pending.messages:
+            item = pending.get_nowait()
+            if item is None:
+                break
+            body, headers, properties, _, _ = item
+            payload = message_serializer.deserialize(
+                body, properties.get('content_type'), properties.get('content_encoding')
+            )
+            messages.extend(unbatch(payload, headers))
+        return messages
+    
+    async def close(self):
+        """Stop every consumer loop"""
+        for queue in self.queues.values():
+            for task in queue.consumer_tasks.values():
+                task.cancel()
+            queue.consumer_tasks.clear()
+        self.connection = None
 
 
 class AWSMessagingManager:
@@ -220,6 +1127,8 @@ class AWSMessagingManager:
         self.session = Session()
         self.sqs_client = None
         self.sns_client = None
+        self.sqs_senders: Dict[str, MicroBatcher] = {}
+        self.sqs_consumers: Dict[str, "SQSConsumer"] = {}
     
     async def initialize(self):
         """Initialize AWS clients"""
@@ -243,15 +1152,12 @@ class AWSMessagingManager:
             if not self.sqs_client:
                 await self.initialize()
             
+            body, attributes = self._encode_sqs_body(message)
+            SQS_API_CALLS.labels(operation='SendMessage').inc()
             response = await self.sqs_client.send_message(
                 QueueUrl=queue_url,
-                MessageBody=json.dumps(message),
-                MessageAttributes={
-                    'Source': {
-                        'StringValue': 'ai-trading-platform',
-                        'DataType': 'String'
-                    }
-                }
+                MessageBody=body,
+                MessageAttributes=attributes
             )
             
             logger.debug(f"Sent SQS message: {response['MessageId']}")
@@ -261,18 +1167,129 @@ class AWSMessagingManager:
             logger.error(f"Failed to send SQS message: {e}")
             return False
     
-    async def receive_sqs_messages(self, queue_url: str, max_messages: int = 10) -> List[Dict]:
+    def _encode_sqs_body(self, message: Dict[str, Any]) -> Tuple[str, Dict[str, Dict[str, str]]]:
+        """Serialize a message into an SQS text body plus content attributes.
+
+        SQS bodies are text, so binary or compressed payloads are base64-encoded
+        and ``base64`` is appended to the content encoding.
+        """
+        body, content_type, content_encoding = message_serializer.serialize(message)
+        encodings = [content_encoding] if content_encoding else []
+        
+        if content_type == JSON_CONTENT_TYPE and not encodings:
+            text = body.decode('utf-8')
+        else:
+            text = base64.b64encode(body).decode('ascii')
+            encodings.append('base64')
+        
+        attributes = {
+            'Source': {
+                'StringValue': 'ai-trading-platform',
+                'DataType': 'String'
+            },
+            'ContentType': {
+                'StringValue': content_type,
+                'DataType': 'String'
+            }
+        }
+        if encodings:
+            attributes['ContentEncoding'] = {
+                'StringValue': ','.join(encodings),
+                'DataType': 'String'
+            }
+        return text, attributes
+    
+    def decode_sqs_message(self, sqs_message: Dict[str, Any]) -> Any:
+        """Decode the body of a message returned by receive_sqs_messages"""
+        attributes = sqs_message.get('MessageAttributes') or {}
+        content_type = attributes.get('ContentType', {}).get('StringValue')
+        encodings = attributes.get('ContentEncoding', {}).get('StringValue', '')
+        encodings = [encoding for encoding in encodings.split(',') if encoding]
+        
+        body = sqs_message['Body'].encode('utf-8')
+        if encodings and encodings[-1] == 'base64':
+            body = base64.b64decode(body)
+            encodings.pop()
+        
+        return message_serializer.deserialize(body, content_type, encodings[0] if encodings else None)
+    
+    async def send_sqs_messages(self, queue_url: str, messages: List[Dict[str, Any]]) -> List[bool]:
+        """Send messages with SendMessageBatch; returns per-message success"""
+        entries = []
+        for message in messages:
+            body, attributes = self._encode_sqs_body(message)
+            entries.append({'MessageBody': body, 'MessageAttributes': attributes})
+        
+        return await self._call_sqs_batch('send_message_batch', 'SendMessageBatch', queue_url, entries)
+    
+    async def queue_sqs_message(self, queue_url: str, message: Dict[str, Any]) -> bool:
+        """Send a message through the queue's micro-batching sender"""
+        sender = self.sqs_senders.get(queue_url)
+        if sender is None:
+            sender = self._sqs_batcher(partial(self.send_sqs_messages, queue_url))
+            self.sqs_senders[queue_url] = sender
+        return await sender.submit(message)
+    
+    def _sqs_batcher(self, batch_fn: Callable) -> MicroBatcher:
+        return MicroBatcher(
+            batch_fn,
+            max_batch_size=SQS_MAX_BATCH_SIZE,
+            flush_interval=settings.sqs_batch_flush_interval_ms / 1000
+        )
+    
+    async def _call_sqs_batch(self, method: str, operation: str, queue_url: str,
+                              entries: List[Dict[str, Any]]) -> List[bool]:
+        """Run an SQS batch API over entries, chunked to the request limits"""
+        if not entries:
+            return []
+        
+        if not self.sqs_client:
+            await self.initialize()
+        
+        chunks = _chunk_sqs_entries(entries)
+        results = await asyncio.gather(
+            *(self._send_sqs_chunk(method, operation, queue_url, chunk) for chunk in chunks)
+        )
+        return [success for chunk_results in results for success in chunk_results]
+    
+    async def _send_sqs_chunk(self, method: str, operation: str, queue_url: str,
+                              chunk: List[Dict[str, Any]]) -> List[bool]:
+        """Send one batch request; entry ids are positions within the chunk"""
+        try:
+            SQS_API_CALLS.labels(operation=operation).inc()
+            response = await getattr(self.sqs_client, method)(
+                QueueUrl=queue_url,
+                Entries=[{'Id': str(i), **entry} for i, entry in enumerate(chunk)]
+            )
+        except Exception as e:
+            logger.error(f"SQS {operation} of {len(chunk)} entries failed: {e}")
+            return [False] * len(chunk)
+        
+        failed = response.get('Failed', [])
+        for failure in failed:
+            logger.error(f"SQS {operation} entry failed: {failure.get('Code')} {failure.get('Message')}")
+        
+        failed_ids = {failure['Id'] for failure in failed}
+        return [str(i) not in failed_ids for i in range(len(chunk))]
+    
+    async def receive_sqs_messages(self, queue_url: str, max_messages: int = 10, wait_time: int = 20,
+                                   visibility_timeout: Optional[int] = None) -> List[Dict]:
         """Receive messages from SQS queue"""
         try:
             if not self.sqs_client:
                 await self.initialize()
             
-            response = await self.sqs_client.receive_message(
-                QueueUrl=queue_url,
-                MaxNumberOfMessages=max_messages,
-                WaitTimeSeconds=20,  # Long polling
-                MessageAttributeNames=['All']
-            )
+            kwargs = {
+                'QueueUrl': queue_url,
+                'MaxNumberOfMessages': max_messages,
+                'WaitTimeSeconds': wait_time,  # Long polling
+                'MessageAttributeNames': ['All']
+            }
+            if visibility_timeout is not None:
+                kwargs['VisibilityTimeout'] = visibility_timeout
+            
+            SQS_API_CALLS.labels(operation='ReceiveMessage').inc()
+            response = await self.sqs_client.receive_message(**kwargs)
             
             return response.get('Messages', [])
             
@@ -286,6 +1303,7 @@ class AWSMessagingManager:
             if not self.sqs_client:
                 await self.initialize()
             
+            SQS_API_CALLS.labels(operation='DeleteMessage').inc()
             await self.sqs_client.delete_message(
                 QueueUrl=queue_url,
                 ReceiptHandle=receipt_handle
@@ -297,6 +1315,51 @@ class AWSMessagingManager:
             logger.error(f"Failed to delete SQS message: {e}")
             return False
     
+    async def delete_sqs_messages(self, queue_url: str, receipt_handles: List[str]) -> List[bool]:
+        """Delete messages with DeleteMessageBatch; returns per-message success"""
+        entries = [{'ReceiptHandle': handle} for handle in receipt_handles]
+        return await self._call_sqs_batch('delete_message_batch', 'DeleteMessageBatch', queue_url, entries)
+    
+    async def change_sqs_visibility(self, queue_url: str, receipt_handles: List[str],
+                                    visibility_timeout: int) -> List[bool]:
+        """Extend (or reset) the visibility timeout of in-flight messages in batches"""
+        entries = [
+            {'ReceiptHandle': handle, 'VisibilityTimeout': visibility_timeout}
+            for handle in receipt_handles
+        ]
+        return await self._call_sqs_batch(
+            'change_message_visibility_batch', 'ChangeMessageVisibilityBatch', queue_url, entries
+        )
+    
+    async def consume_sqs(self, queue_url: str, callback: Callable, concurrency: Optional[int] = None,
+                          visibility_timeout: Optional[int] = None) -> "SQSConsumer":
+        """Start a long-polling consumer with batched deletes and visibility extension"""
+        consumer = SQSConsumer(
+            self,
+            queue_url,
+            callback,
+            concurrency=concurrency or settings.sqs_consumer_concurrency,
+            visibility_timeout=visibility_timeout or settings.sqs_visibility_timeout,
+            wait_time=settings.sqs_wait_time_seconds
+        )
+        await consumer.start()
+        
+        self.sqs_consumers[queue_url] = consumer
+        return consumer
+    
+    async def close(self):
+        """Stop SQS consumers and flush pending batched sends"""
+        await asyncio.gather(
+            *(consumer.stop(settings.consumer_drain_timeout) for consumer in self.sqs_consumers.values()),
+            return_exceptions=True
+        )
+        self.sqs_consumers.clear()
+        
+        await asyncio.gather(
+            *(sender.flush() for sender in self.sqs_senders.values()),
+            return_exceptions=True
+        )
+    
     async def publish_sns_message(self, topic_arn: str, message: Dict[str, Any], subject: str = None) -> bool:
         """Publish message to SNS topic"""
         try:
@@ -305,11 +1368,16 @@ class AWSMessagingManager:
             
             kwargs = {
                 'TopicArn': topic_arn,
-                'Message': json.dumps(message),
+                # SNS fans out to external subscribers (email, HTTP), so it stays JSON
+                'Message': json_serializer.serialize(message)[0].decode('utf-8'),
                 'MessageAttributes': {
                     'Source': {
                         'StringValue': 'ai-trading-platform',
                         'DataType': 'String'
+                    },
+                    'ContentType': {
+                        'StringValue': json_serializer.content_type,
+                        'DataType': 'String'
                     }
                 }
             }
@@ -327,22 +1395,533 @@ class AWSMessagingManager:
             return False
 
 
+class ConsumerMetrics:
+    """Per-queue consumer throughput and handler latency metrics"""
+    
+    def __init__(self, queue_name: str):
+        self.queue_name = queue_name
+        self.started_at = time.monotonic()
+        self.processed = 0
+        self.failed = 0
+        self.total_handler_time = 0.0
+        self.max_handler_time = 0.0
+        self.acks_sent = 0
+        self.delivery_latency: Dict[str, List[float]] = {}
+        
+        self._messages = CONSUMER_MESSAGES
+        self._duration = CONSUMER_HANDLER_DURATION.labels(queue=queue_name)
+        self._in_flight = CONSUMER_IN_FLIGHT.labels(queue=queue_name)
+    
+    def handler_started(self):
+        self._in_flight.inc()
+    
+    def delivered(self, message):
+        """Record publish-to-handler latency by priority for first deliveries"""
+        headers = message.headers or {}
+        published_at = headers.get(PUBLISHED_AT_HEADER)
+        if published_at is None or ATTEMPTS_HEADER in headers or REPLAYED_HEADER in headers:
+            return
+        
+        label = priority_label(message.priority)
+        latency = max(time.time() - float(published_at), 0.0)
+        DELIVERY_LATENCY.labels(queue=self.queue_name, priority=label).observe(latency)
+        
+        totals = self.delivery_latency.setdefault(label, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += latency
+        totals[2] = max(totals[2], latency)
+    
+    def handler_finished(self, elapsed: float, success: bool):
+        self._in_flight.dec()
+        self._duration.observe(elapsed)
+        self._messages.labels(queue=self.queue_name, status="success" if success else "failed").inc()
+        
+        if success:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.total_handler_time += elapsed
+        self.max_handler_time = max(self.max_handler_time, elapsed)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of consumer statistics"""
+        handled = self.processed + self.failed
+        uptime = time.monotonic() - self.started_at
+        return {
+            "queue": self.queue_name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "acks_sent": self.acks_sent,
+            "throughput_per_second": handled / uptime if uptime > 0 else 0,
+            "avg_handler_time_ms": (self.total_handler_time / handled) * 1000 if handled else 0,
+            "max_handler_time_ms": self.max_handler_time * 1000,
+            "delivery_latency_ms": {
+                label: {"count": count, "avg": total / count * 1000, "max": peak * 1000}
+                for label, (count, total, peak) in self.delivery_latency.items()
+            }
+        }
+
+
+class QueueConsumer:
+    """Concurrent consumer for a single queue.
+
+    Deliveries are buffered up to ``prefetch_count`` and handled by
+    ``concurrency`` worker tasks, highest message priority first. Successful deliveries are acknowledged in
+    batches with ``multiple=True`` up to the highest contiguous completed
+    delivery tag. Failures are copied to an exponential delay queue with an
+    incremented ``x-attempts`` header and acked; after
+    ``max_delivery_attempts`` they are nacked to the dead letter queue
+    immediately so they are never covered by a batch ack. Batch envelopes from BatchingPublisher are unpacked and
+    their messages handled in order; if one fails the whole envelope is
+    dead-lettered, so handlers must tolerate seeing the others again.
+    """
+    
+    def __init__(self, runtime: "ConsumerRuntime", queue_name: str, callback: Callable,
+                 concurrency: int, prefetch_count: int, ack_batch_size: int,
+                 ack_interval: float, process_pool: bool = False):
+        self.runtime = runtime
+        self.queue_name = queue_name
+        self.callback = callback
+        self.concurrency = concurrency
+        self.prefetch_count = prefetch_count
+        self.ack_batch_size = ack_batch_size
+        self.ack_interval = ack_interval
+        self.process_pool = process_pool
+        self.metrics = ConsumerMetrics(queue_name)
+        
+        self.channel = None
+        self.queue = None
+        self.consumer_tag = None
+        self.work_queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.workers: List[asyncio.Task] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # Ack tracking: delivery tags in delivery order, completed tags and the
+        # highest contiguous successfully handled message not yet acknowledged
+        self._outstanding: deque = deque()
+        self._completed: Dict[int, Tuple[bool, Any]] = {}
+        self._ack_candidate = None
+        self._unacked_successes = 0
+        self._ack_lock = asyncio.Lock()
+    
+    async def start(self, connection):
+        """Open a dedicated channel, apply QoS and start workers"""
+        self.channel = await connection.channel()
+        await self.channel.set_qos(prefetch_count=self.prefetch_count)
+        
+        self.queue = await self.channel.get_queue(self.queue_name, ensure=False)
+        self.consumer_tag = await self.queue.consume(self._on_message)
+        
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+        self._flush_task = asyncio.create_task(self._periodic_flush())
+        
+        logger.info(
+            f"Consuming {self.queue_name} with {self.concurrency} workers "
+            f"(prefetch={self.prefetch_count}, ack_batch={self.ack_batch_size})"
+        )
+    
+    async def _on_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        """Buffer a delivery for the worker pool, ordered by priority then delivery"""
+        self._outstanding.append(message.delivery_tag)
+        await self.work_queue.put((-(message.priority or 0), message.delivery_tag, message))
+    
+    async def _worker(self):
+        """Handle buffered deliveries until cancelled"""
+        while True:
+            _, _, message = await self.work_queue.get()
+            try:
+                await self._handle(message)
+            finally:
+                self.work_queue.task_done()
+    
+    async def _handle(self, message: aio_pika.abc.AbstractIncomingMessage):
+        """Run the callback for one delivery and settle it"""
+        self.metrics.delivered(message)
+        self.metrics.handler_started()
+        start = time.perf_counter()
+        success = False
+        
+        try:
+            payload = message_serializer.deserialize(
+                message.body, message.content_type, message.content_encoding
+            )
+            for item in unbatch(payload, message.headers):
+                if self.process_pool:
+                    await self.runtime.run_in_process(self.callback, item)
+                else:
+                    result = self.callback(item)
+                    if asyncio.iscoroutine(result):
+                        await result
+            success = True
+            
+        except Exception as e:
+            logger.error(f"Error processing message from {self.queue_name}: {e}")
+            retried = await self._schedule_retry(message, e)
+        
+        finally:
+            self.metrics.handler_finished(time.perf_counter() - start, success)
+        
+        # A message copied to a retry queue is settled by the normal batched ack
+        await self._complete(message, success or retried)
+    
+    async def _schedule_retry(self, message, error: Exception) -> bool:
+        """Copy a failed delivery to its delay queue, or dead-letter it once attempts run out"""
+        return await schedule_retry(self.runtime.rabbitmq, self.queue_name, message, error)
+    
+    async def _complete(self, message, success: bool):
+        """Record completion and ack once a full contiguous batch is ready"""
+        self._completed[message.delivery_tag] = (success, message)
+        
+        while self._outstanding and self._outstanding[0] in self._completed:
+            tag = self._outstanding.popleft()
+            tag_success, tag_message = self._completed.pop(tag)
+            if tag_success:
+                self._ack_candidate = tag_message
+                self._unacked_successes += 1
+        
+        if self._unacked_successes >= self.ack_batch_size:
+            await self.flush_acks()
+    
+    async def flush_acks(self):
+        """Acknowledge every contiguous handled delivery with one multiple ack"""
+        async with self._ack_lock:
+            candidate = self._ack_candidate
+            if candidate is None:
+                return
+            
+            self._ack_candidate = None
+            self._unacked_successes = 0
+            
+            try:
+                await candidate.ack(multiple=True)
+                self.metrics.acks_sent += 1
+            except Exception as e:
+                logger.error(f"Failed to ack batch on {self.queue_name}: {e}")
+    
+    async def _periodic_flush(self):
+        """Flush partial ack batches so slow queues are not left unacked"""
+        while True:
+            await asyncio.sleep(self.ack_interval)
+            await self.flush_acks()
+    
+    async def stop(self, timeout: float):
+        """Stop new deliveries, drain in-flight work and flush acks"""
+        if self.queue and self.consumer_tag:
+            try:
+                await self.queue.cancel(self.consumer_tag)
+            except Exception as e:
+                logger.warning(f"Failed to cancel consumer on {self.queue_name}: {e}")
+        
+        try:
+            await asyncio.wait_for(self.work_queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Timed out draining {self.queue_name}; "
+                f"{self.work_queue.qsize()} buffered messages will be redelivered"
+            )
+        
+        for task in self.workers + [self._flush_task]:
+            if task:
+                task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        
+        await self.flush_acks()
+        
+        if self.channel and not self.channel.is_closed:
+            await self.channel.close()
+
+
+class ConsumerRuntime:
+    """Runs concurrent queue consumers and an optional process pool for CPU-heavy work"""
+    
+    def __init__(self, rabbitmq: MessageBroker):
+        self.rabbitmq = rabbitmq
+        self.consumers: Dict[str, QueueConsumer] = {}
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=settings.consumer_process_workers)
+        return self.process_pool
+    
+    async def run_in_process(self, func: Callable, *args) -> Any:
+        """Run a picklable, synchronous function in the shared process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_process_pool(), partial(func, *args))
+    
+    async def consume(self, queue: str, callback: Callable, concurrency: Optional[int] = None,
+                      prefetch_count: Optional[int] = None, ack_batch_size: Optional[int] = None,
+                      process_pool: bool = False) -> QueueConsumer:
+        """Start a concurrent consumer for a queue"""
+        if not self.rabbitmq.connection:
+            await self.rabbitmq.connect()
+        
+        concurrency = concurrency or settings.consumer_concurrency
+        consumer = QueueConsumer(
+            self,
+            queue,
+            callback,
+            concurrency=concurrency,
+            prefetch_count=max(prefetch_count or settings.consumer_prefetch_count, concurrency),
+            ack_batch_size=ack_batch_size or settings.consumer_ack_batch_size,
+            ack_interval=settings.consumer_ack_interval_ms / 1000,
+            process_pool=process_pool
+        )
+        await consumer.start(self.rabbitmq.connection)
+        
+        self.consumers[queue] = consumer
+        return consumer
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-queue consumer statistics"""
+        return {name: consumer.metrics.get_stats() for name, consumer in self.consumers.items()}
+    
+    async def stop(self, timeout: Optional[float] = None):
+        """Gracefully drain every consumer, then shut down the process pool"""
+        timeout = timeout if timeout is not None else settings.consumer_drain_timeout
+        await asyncio.gather(
+            *(consumer.stop(timeout) for consumer in self.consumers.values()),
+            return_exceptions=True
+        )
+        self.consumers.clear()
+        
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
+
+def _chunk_sqs_entries(entries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split batch entries into requests of at most 10 entries and 256 KiB of bodies"""
+    chunks = []
+    chunk: List[Dict[str, Any]] = []
+    chunk_bytes = 0
+    
+    for entry in entries:
+        size = len(entry.get('MessageBody', '').encode('utf-8'))
+        if chunk and (len(chunk) == SQS_MAX_BATCH_SIZE or chunk_bytes + size > SQS_MAX_BATCH_BYTES):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(entry)
+        chunk_bytes += size
+    
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class SQSConsumer:
+    """Concurrent long-poll SQS consumer.
+
+    Pollers fetch up to 10 messages per ReceiveMessage call into a buffer
+    bounded by ``concurrency``; worker tasks run the callback. Messages are
+    kept invisible while buffered or being handled by extending their
+    visibility in batches, successes are deleted through a micro-batcher, and
+    failures are left to reappear after the visibility timeout (and the
+    queue's redrive policy).
+    """
+    
+    def __init__(self, aws: AWSMessagingManager, queue_url: str, callback: Callable,
+                 concurrency: int, visibility_timeout: int, wait_time: int):
+        self.aws = aws
+        self.queue_url = queue_url
+        self.callback = callback
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.wait_time = wait_time
+        self.metrics = ConsumerMetrics(queue_url.rsplit('/', 1)[-1])
+        
+        self.buffer: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        self.in_flight: set = set()  # receipt handles buffered or being handled
+        self.deleter = aws._sqs_batcher(partial(aws.delete_sqs_messages, queue_url))
+        self.pollers: List[asyncio.Task] = []
+        self.workers: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Start pollers, workers and the visibility heartbeat"""
+        poller_count = max(1, -(-self.concurrency // SQS_MAX_BATCH_SIZE))
+        self.pollers = [asyncio.create_task(self._poll()) for _ in range(poller_count)]
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        
+        logger.info(f"Consuming SQS {self.queue_url} with {self.concurrency} workers and {poller_count} pollers")
+    
+    async def _poll(self):
+        """Long-poll SQS while there is room in the buffer"""
+        while True:
+            free = self.buffer.maxsize - self.buffer.qsize()
+            if free <= 0:
+                await asyncio.sleep(0.01)
+                continue
+            
+            messages = await self.aws.receive_sqs_messages(
+                self.queue_url,
+                max_messages=min(free, SQS_MAX_BATCH_SIZE),
+                wait_time=self.wait_time,
+                visibility_timeout=self.visibility_timeout
+            )
+            
+            for message in messages:
+                self.in_flight.add(message['ReceiptHandle'])
+                await self.buffer.put(message)
+    
+    async def _worker(self):
+        """Handle buffered messages until cancelled"""
+        while True:
+            message = await self.buffer.get()
+            try:
+                await self._handle(message)
+            finally:
+                self.buffer.task_done()
+    
+    async def _handle(self, message: Dict[str, Any]):
+        """Run the callback for one message and schedule its deletion"""
+        receipt_handle = message['ReceiptHandle']
+        self.metrics.handler_started()
+        start = time.perf_counter()
+        success = False
+        
+        try:
+            result = self.callback(self.aws.decode_sqs_message(message))
+            if asyncio.iscoroutine(result):
+                await result
+            success = True
+        except Exception as e:
+            logger.error(f"Error processing SQS message {message.get('MessageId')}: {e}")
+        finally:
+            self.metrics.handler_finished(time.perf_counter() - start, success)
+            self.in_flight.discard(receipt_handle)
+        
+        if success:
+            self.deleter.submit(receipt_handle)
+    
+    async def _heartbeat(self):
+        """Every half visibility timeout, extend every message still held"""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 2)
+            if self.in_flight:
+                await self.aws.change_sqs_visibility(
+                    self.queue_url, list(self.in_flight), self.visibility_timeout
+                )
+    
+    async def stop(self, timeout: float):
+        """Stop polling, drain buffered messages and flush pending deletes"""
+        for task in self.pollers:
+            task.cancel()
+        await asyncio.gather(*self.pollers, return_exceptions=True)
+        
+        try:
+            await asyncio.wait_for(self.buffer.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out draining SQS consumer for {self.queue_url}")
+        
+        for task in self.workers + [self._heartbeat_task]:
+            if task:
+                task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        
+        await self.deleter.flush()
+
+
+class BatchingPublisher:
+    """Coalesces publishes per exchange and routing key into batches.
+
+    Messages are held for up to ``max_delay`` seconds or ``max_batch_size``
+    messages. With ``envelope`` a batch goes out as one broker message whose
+    body is the list of messages (marked with ``BATCH_HEADER`` so consumers
+    unbatch it); otherwise the messages are published individually on one
+    channel with pipelined confirms. Each priority (and codec) is batched
+    separately so an urgent message never shares an envelope with bulk
+    traffic. Message
+    order within a routing key and priority is preserved either way.
+    """
+    
+    def __init__(self, broker: MessageBroker, max_batch_size: Optional[int] = None,
+                 max_delay: Optional[float] = None, envelope: bool = True):
+        self.broker = broker
+        self.max_batch_size = max_batch_size or settings.publisher_batch_size
+        self.max_delay = max_delay if max_delay is not None else settings.publisher_batch_delay_ms / 1000
+        self.envelope = envelope
+        self.batchers: Dict[Tuple[str, str, Optional[int]], MicroBatcher] = {}
+    
+    def publish(self, exchange: str, routing_key: str, message: Dict[str, Any],
+                priority: Optional[int] = None,
+                serializer: Optional[MessageSerializer] = None) -> "asyncio.Future":
+        """Queue a message; the returned future resolves once its batch is confirmed"""
+        key = (exchange, routing_key, priority, serializer)
+        batcher = self.batchers.get(key)
+        if batcher is None:
+            batcher = MicroBatcher(
+                partial(self._send_batch, exchange, routing_key, priority, serializer),
+                max_batch_size=self.max_batch_size,
+                flush_interval=self.max_delay,
+                on_flush=partial(self._record_flush, exchange)
+            )
+            self.batchers[key] = batcher
+        return batcher.submit(message)
+    
+    async def _send_batch(self, exchange: str, routing_key: str, priority: Optional[int],
+                          serializer: Optional[MessageSerializer], messages: List[Dict[str, Any]]) -> List[bool]:
+        if self.envelope:
+            success = await self.broker.publish(
+                exchange, routing_key, messages, headers={BATCH_HEADER: len(messages)}, priority=priority,
+                serializer=serializer
+            )
+        else:
+            confirmed = await self.broker.publish_batch(
+                exchange, [(routing_key, message) for message in messages], priority, serializer
+            )
+            success = confirmed == len(messages)
+        return [success] * len(messages)
+    
+    def _record_flush(self, exchange: str, batch_size: int, latency: float):
+        PUBLISHER_BATCH_SIZE.labels(exchange=exchange).observe(batch_size)
+        PUBLISHER_FLUSH_LATENCY.labels(exchange=exchange).observe(latency)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Messages and batches per exchange/routing key"""
+        stats = {}
+        for (exchange, routing_key, priority, _), batcher in self.batchers.items():
+            batches = batcher.stats["batches"]
+            key = f"{exchange}/{routing_key}"
+            if priority is not None:
+                key = f"{key}@{priority_label(priority)}"
+            stats[key] = {
+                **batcher.stats,
+                "avg_batch_size": batcher.stats["items"] / batches if batches else 0
+            }
+        return stats
+    
+    async def flush(self):
+        """Publish everything pending"""
+        await asyncio.gather(*(batcher.flush() for batcher in self.batchers.values()))
+
+
 class HybridMessagingManager:
     """Hybrid messaging manager combining RabbitMQ and AWS services"""
     
-    def __init__(self):
-        self.rabbitmq = RabbitMQManager()
+    def __init__(self, broker: Optional[str] = None):
+        self.broker = broker or settings.message_broker
+        self.in_memory = self.broker == 'memory'
+        self.rabbitmq = InMemoryBroker() if self.in_memory else RabbitMQManager()
         self.aws = AWSMessagingManager()
+        self.consumers = ConsumerRuntime(self.rabbitmq)
+        self.publisher = BatchingPublisher(self.rabbitmq)
         self.initialized = False
     
     async def initialize(self):
         """Initialize all messaging services"""
         try:
-            await asyncio.gather(
-                self.rabbitmq.connect(),
-                self.aws.initialize(),
-                return_exceptions=True
-            )
+            if self.in_memory:
+                await self.rabbitmq.connect()
+            else:
+                await asyncio.gather(
+                    self.rabbitmq.connect(),
+                    self.aws.initialize(),
+                    return_exceptions=True
+                )
             self.initialized = True
             logger.info("Initialized hybrid messaging manager")
             
@@ -350,9 +1929,10 @@ class HybridMessagingManager:
             logger.error(f"Failed to initialize messaging manager: {e}")
             raise
     
-    async def publish_event(self, event_type: str, data: Dict[str, Any], use_aws: bool = False):
+    async def publish_event(self, event_type: str, data: Dict[str, Any], use_aws: bool = False,
+                            priority: Optional[int] = None):
         """Publish event using appropriate messaging system"""
-        if use_aws and settings.sns_topic_arn:
+        if use_aws and settings.sns_topic_arn and not self.in_memory:
             # Use SNS for AWS integrations
             await self.aws.publish_sns_message(
                 settings.sns_topic_arn,
@@ -360,37 +1940,87 @@ class HybridMessagingManager:
             )
         else:
             # Use RabbitMQ for internal communication
-            exchange = self._get_exchange_for_event(event_type)
-            routing_key = self._get_routing_key_for_event(event_type)
-            
-            await self.rabbitmq.publish(
-                exchange=exchange,
-                routing_key=routing_key,
-                message={'event_type': event_type, 'data': data}
-            )
+            await self.dispatch(event_type, {'event_type': event_type, 'data': data}, priority)
     
-    def _get_exchange_for_event(self, event_type: str) -> str:
-        """Get appropriate exchange for event type"""
-        event_mapping = {
-            'order_created': 'trading.events',
-            'order_filled': 'trading.events',
-            'payment_received': 'payment.events',
-            'document_processed': 'ai.processing',
-            'user_notification': 'notifications'
-        }
-        return event_mapping.get(event_type, 'trading.events')
+    async def dispatch(self, event_type: str, message: Dict[str, Any], priority: Optional[int] = None) -> bool:
+        """Publish a message as-is on the route registered for an event type"""
+        route = get_event_route(event_type)
+        return await self.rabbitmq.publish(
+            exchange=route.exchange,
+            routing_key=route.routing_key,
+            message=message,
+            priority=route.priority if priority is None else priority,
+            serializer=route.serializer
+        )
+    
+    async def publish_message(self, exchange: str, routing_key: str, message: Dict[str, Any],
+                              priority: Optional[int] = None) -> bool:
+        """Publish a message directly to a RabbitMQ exchange"""
+        return await self.rabbitmq.publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            message=message,
+            priority=priority
+        )
+    
+    async def publish_batched(self, exchange: str, routing_key: str, message: Dict[str, Any],
+                              priority: Optional[int] = None) -> bool:
+        """Publish through the batching publisher; waits for the batch confirm"""
+        return await self.publisher.publish(exchange, routing_key, message, priority)
+    
+    async def dispatch_batched(self, event_type: str, message: Dict[str, Any],
+                               priority: Optional[int] = None) -> bool:
+        """Publish through the batching publisher on the route registered for an event type"""
+        route = get_event_route(event_type)
+        return await self.publisher.publish(
+            route.exchange, route.routing_key, message,
+            route.priority if priority is None else priority,
+            route.serializer
+        )
+    
+    async def publish_messages(self, exchange: str, messages: List[Tuple[str, Dict[str, Any]]],
+                               priority: Optional[int] = None) -> int:
+        """Publish (routing_key, message) pairs with batched publisher confirms"""
+        return await self.rabbitmq.publish_batch(exchange, messages, priority)
+    
+    async def consume_messages(self, queue: str, callback: Callable, concurrency: Optional[int] = None,
+                               prefetch_count: Optional[int] = None, process_pool: bool = False) -> QueueConsumer:
+        """Consume a RabbitMQ queue with concurrent handlers and batched acks.
+
+        With ``process_pool`` the callback must be a picklable synchronous
+        function; it then runs in the shared process pool instead of the loop.
+        """
+        return await self.consumers.consume(
+            queue,
+            callback,
+            concurrency=concurrency,
+            prefetch_count=prefetch_count,
+            process_pool=process_pool
+        )
+    
+    async def run_in_process(self, func: Callable, *args) -> Any:
+        """Offload CPU-heavy work to the shared process pool"""
+        return await self.consumers.run_in_process(func, *args)
+    
+    def get_consumer_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-queue consumer throughput and latency statistics"""
+        return self.consumers.get_stats()
     
-    def _get_routing_key_for_event(self, event_type: str) -> str:
-        """Get appropriate routing key for event type"""
-        return event_type.replace('_', '.')
+    def resolve_event(self, event_type: str) -> Tuple[str, str]:
+        """Exchange and routing key an event type is published to"""
+        return resolve_event(event_type)
     
     async def close(self):
-        """Close all connections"""
+        """Drain consumers and pending batches, then close all connections"""
+        await self.consumers.stop()
+        await self.publisher.flush()
         await asyncio.gather(
             self.rabbitmq.close(),
+            self.aws.close(),
             return_exceptions=True
         )
 
 
 # Global messaging manager
-messaging_manager = HybridMessagingManager() 
\ No newline at end of file
+messaging_manager = HybridMessagingManager()
+hybrid_messaging_manager = messaging_manager 
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""
+Shared transactional outbox for publishing events written in database transactions
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from .config import settings
+from .messaging import get_event_route
+from .serialization import json_serializer
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_TABLE = "message_outbox"
+
+# Arbitrary constant identifying the relay's advisory lock; only one relay
+# claims rows at a time so no aggregate is claimed by two relays at once
+OUTBOX_LOCK_ID = 7_242_031
+
+OUTBOX_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+        id BIGSERIAL PRIMARY KEY,
+        aggregate_type VARCHAR(100) NOT NULL,
+        aggregate_id VARCHAR(255) NOT NULL,
+        exchange VARCHAR(255) NOT NULL,
+        routing_key VARCHAR(255) NOT NULL,
+        event_type VARCHAR(100),
+        payload JSONB NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW(),
+        claimed_until TIMESTAMP
+    )
+    """,
+    f"ALTER TABLE {OUTBOX_TABLE} ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP;",
+    f"ALTER TABLE {OUTBOX_TABLE} ADD COLUMN IF NOT EXISTS event_type VARCHAR(100);",
+    f"CREATE INDEX IF NOT EXISTS idx_{OUTBOX_TABLE}_aggregate ON {OUTBOX_TABLE}(aggregate_type, aggregate_id, id);",
+]
+
+_INSERT_QUERY = f"""
+    INSERT INTO {OUTBOX_TABLE} (aggregate_type, aggregate_id, exchange, routing_key, event_type, payload)
+    VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+"""
+
+_INSERT_SESSION_QUERY = f"""
+    INSERT INTO {OUTBOX_TABLE} (aggregate_type, aggregate_id, exchange, routing_key, event_type, payload)
+    VALUES (:aggregate_type, :aggregate_id, :exchange, :routing_key, :event_type, CAST(:payload AS JSONB))
+"""
+
+# Oldest rows of aggregates no other relay holds an unexpired claim on
+_CLAIM_QUERY = f"""
+    UPDATE {OUTBOX_TABLE} SET claimed_until = NOW() + make_interval(secs => $2)
+    WHERE id IN (
+        SELECT o.id FROM {OUTBOX_TABLE} o
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {OUTBOX_TABLE} c
+            WHERE c.aggregate_type = o.aggregate_type AND c.aggregate_id = o.aggregate_id
+              AND c.claimed_until > NOW()
+        )
+        ORDER BY o.id LIMIT $1
+    )
+    RETURNING id, aggregate_type, aggregate_id, exchange, routing_key, event_type, payload
+"""
+
+
+def _encode_payload(message: Dict[str, Any]) -> str:
+    return json_serializer.serialize(message)[0].decode('utf-8')
+
+
+async def enqueue_outbox(conn, aggregate_type: str, aggregate_id: str, event_type: str,
+                         message: Dict[str, Any]) -> None:
+    """Record an event in the outbox on an asyncpg connection.
+
+    Call inside the transaction that makes the change the event announces;
+    the relay publishes it on the event's registered route, with its
+    priority and codec, only if that transaction commits.
+    """
+    route = get_event_route(event_type)
+    await conn.execute(
+        _INSERT_QUERY, aggregate_type, str(aggregate_id), route.exchange, route.routing_key, event_type,
+        _encode_payload(message)
+    )
+
+
+async def enqueue_outbox_session(session, aggregate_type: str, aggregate_id: str, event_type: str,
+                                 message: Dict[str, Any]) -> None:
+    """Record an event in the outbox within a SQLAlchemy session's transaction"""
+    route = get_event_route(event_type)
+    await session.execute(
+        text(_INSERT_SESSION_QUERY),
+        {
+            "aggregate_type": aggregate_type,
+            "aggregate_id": str(aggregate_id),
+            "exchange": route.exchange,
+            "routing_key": route.routing_key,
+            "event_type": event_type,
+            "payload": _encode_payload(message)
+        }
+    )
+
+
+class OutboxRelay:
+    """Drains the outbox to the message broker in batches.
+
+    Each pass claims the oldest ``batch_size`` rows in a short transaction
+    under an advisory lock, skipping aggregates another relay has claimed,
+    and commits. It then publishes with no connection or lock held -
+    different aggregates concurrently and each aggregate's events strictly
+    in order - and finally deletes the published rows and releases the rest
+    in a second short transaction. Publishes go through the messaging
+    manager's batching publisher, so concurrent aggregates share batch
+    envelopes. When an event fails, the rest of that aggregate's events wait
+    for the next pass. Delivery is at-least-once: rows claimed by a relay
+    that crashes, or that outlive ``claim_timeout``, are republished.
+    """
+
+    def __init__(self, connection_factory: Callable, messaging, batch_size: Optional[int] = None,
+                 poll_interval: Optional[float] = None, claim_timeout: Optional[float] = None):
+        self.connection_factory = connection_factory
+        self.messaging = messaging
+        self.batch_size = batch_size or settings.outbox_batch_size
+        self.claim_timeout = claim_timeout or settings.outbox_claim_timeout_seconds
+        self.poll_interval = (
+            poll_interval if poll_interval is not None else settings.outbox_poll_interval_ms / 1000
+        )
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"published": 0, "failed": 0, "passes": 0}
+
+    async def start(self):
+        """Start the background relay loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Outbox relay started (batch_size={self.batch_size})")
+
+    def wake(self):
+        """Drain immediately instead of waiting for the next poll, e.g. after a commit"""
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                published = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay pass failed: {e}")
+                published = 0
+
+            # A full batch means there is likely a backlog; keep draining
+            if published >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain_once(self) -> int:
+        """Publish one batch of outbox rows; returns the number published"""
+        self.stats["passes"] += 1
+
+        async with self.connection_factory() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", OUTBOX_LOCK_ID):
+                    return 0
+                rows = await conn.fetch(_CLAIM_QUERY, self.batch_size, float(self.claim_timeout))
+        if not rows:
+            return 0
+        rows = sorted(rows, key=lambda row: row['id'])
+
+        published_ids = await self.publish_rows(rows)
+
+        published = set(published_ids)
+        deferred_ids = [row['id'] for row in rows if row['id'] not in published]
+        async with self.connection_factory() as conn:
+            async with conn.transaction():
+                if published_ids:
+                    await conn.execute(
+                        f"DELETE FROM {OUTBOX_TABLE} WHERE id = ANY($1::bigint[])", published_ids
+                    )
+                if deferred_ids:
+                    await conn.execute(
+                        f"UPDATE {OUTBOX_TABLE} SET claimed_until = NULL WHERE id = ANY($1::bigint[])",
+                        deferred_ids
+                    )
+
+        return len(published_ids)
+
+    async def publish_rows(self, rows: List[Any]) -> List[int]:
+        """Publish rows grouped by aggregate; returns ids that were confirmed"""
+        aggregates: Dict[tuple, List[Any]] = {}
+        for row in rows:
+            aggregates.setdefault((row['aggregate_type'], row['aggregate_id']), []).append(row)
+
+        results = await asyncio.gather(
+            *(self._publish_aggregate(aggregate_rows) for aggregate_rows in aggregates.values())
+        )
+        return [row_id for published in results for row_id in published]
+
+    async def _publish_aggregate(self, rows: List[Any]) -> List[int]:
+        """Publish one aggregate's events in order, stopping at the first failure"""
+        published = []
+        for row in rows:
+            payload = row['payload']
+            message = json.loads(payload) if isinstance(payload, (str, bytes)) else payload
+
+            if row['event_type']:
+                # Registered route: the event keeps its priority and codec
+                sent = await self.messaging.dispatch_batched(row['event_type'], message)
+            else:
+                sent = await self.messaging.publish_batched(row['exchange'], row['routing_key'], message)
+            if not sent:
+                self.stats["failed"] += 1
+                logger.warning(
+                    f"Outbox publish failed for {row['aggregate_type']} {row['aggregate_id']}; "
+                    f"{len(rows) - len(published)} events deferred"
+                )
+                break
+
+            published.append(row['id'])
+
+        self.stats["published"] += len(published)
+        return published
+
+    async def stop(self):
+        """Stop the relay after a final drain"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        try:
+            await self.drain_once()
+        except Exception as e:
+            logger.error(f"Final outbox drain failed: {e}")
@@ -0,0 +1,110 @@
+"""
+Shared keyset (cursor) pagination utilities
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client supplies a malformed or tampered cursor"""
+
+
+def encode_cursor(created_at: datetime, row_id: Any) -> str:
+    """Encode a (created_at, id) position as an opaque URL-safe cursor"""
+    payload = json.dumps([created_at.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode an opaque cursor back into its (created_at, id) position"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid pagination cursor: {cursor!r}") from e
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to the supported range"""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+class KeysetPaginator:
+    """Keyset pagination over (created_at, id), newest first.
+
+    Pages are selected with a row-value comparison against the last seen
+    position instead of OFFSET, so every page is a bounded index range scan
+    on ``(<filters>, created_at DESC, id DESC)`` regardless of page depth.
+    """
+
+    def __init__(self, table: str, columns: str = "*",
+                 sort_column: str = "created_at", id_column: str = "id"):
+        self.table = table
+        self.columns = columns
+        self.sort_column = sort_column
+        self.id_column = id_column
+
+    def build_query(self, filters: Optional[Dict[str, Any]] = None,
+                    cursor: Optional[str] = None,
+                    limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+        """Build the page query and its positional parameters.
+
+        One extra row is requested so that the caller can tell whether a
+        further page exists without issuing a COUNT.
+        """
+        conditions = []
+        params: List[Any] = []
+
+        for column, value in (filters or {}).items():
+            params.append(value)
+            conditions.append(f"{column} = ${len(params)}")
+
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            params.extend([created_at, row_id])
+            conditions.append(
+                f"({self.sort_column}, {self.id_column}) < (${len(params) - 1}, ${len(params)})"
+            )
+
+        params.append(clamp_page_size(limit) + 1)
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT {self.columns} FROM {self.table}
+            {where_clause}
+            ORDER BY {self.sort_column} DESC, {self.id_column} DESC
+            LIMIT ${len(params)}
+        """
+        return query, params
+
+    def paginate(self, rows: Sequence[Any], limit: Optional[int] = None) -> Tuple[List[Any], Optional[str]]:
+        """Trim the look-ahead row and compute the cursor for the next page"""
+        page_size = clamp_page_size(limit)
+        items = list(rows[:page_size])
+
+        next_cursor = None
+        if len(rows) > page_size and items:
+            last = items[-1]
+            next_cursor = encode_cursor(last[self.sort_column], last[self.id_column])
+
+        return items, next_cursor
+
+    async def fetch_page(self, conn, filters: Optional[Dict[str, Any]] = None,
+                         cursor: Optional[str] = None,
+                         limit: Optional[int] = None) -> Tuple[List[Any], Optional[str]]:
+        """Fetch one page of rows using an asyncpg-style connection"""
+        query, params = self.build_query(filters, cursor, limit)
+        rows = await conn.fetch(query, *params)
+        return self.paginate(rows, limit)
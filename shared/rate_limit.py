@@ -0,0 +1,177 @@
+"""
+Distributed token-bucket rate limiting backed by Redis
+"""
+import hashlib
+import logging
+import time
+from typing import Dict, NamedTuple, Optional
+
+from prometheus_client import Counter
+from redis.exceptions import NoScriptError, RedisError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DECISIONS = Counter(
+    'rate_limit_decisions_total', 'Rate limit decisions', ['policy', 'decision', 'source']
+)
+
+# Atomic token bucket. KEYS[1] is the bucket; ARGV is capacity, refill rate
+# (tokens per second) and the number of tokens the caller would like to
+# lease. Uses the Redis clock so replicas with skewed clocks agree.
+# Returns {granted, remaining, retry_after_ms}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(bucket[2])) * rate)
+end
+
+local granted = 0
+if tokens >= 1 then
+    granted = 1
+    -- Lease extra tokens only while the bucket stays more than half full
+    local spare = math.floor(tokens - 1 - capacity / 2)
+    if spare > 0 and lease > 1 then
+        granted = granted + math.min(lease - 1, spare)
+    end
+    tokens = tokens - granted
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+
+local retry_after = 0
+if granted == 0 then
+    retry_after = math.ceil((1 - tokens) / rate * 1000)
+end
+return {granted, math.floor(tokens), retry_after}
+"""
+TOKEN_BUCKET_SHA = hashlib.sha1(TOKEN_BUCKET_SCRIPT.encode('utf-8')).hexdigest()
+
+
+class RateLimitPolicy(NamedTuple):
+    """Token bucket parameters; each policy keeps its own bucket per client"""
+    name: str
+    capacity: int        # burst size
+    refill_rate: float   # tokens per second
+
+    @classmethod
+    def per_minute(cls, name: str, limit: int, burst: Optional[int] = None) -> "RateLimitPolicy":
+        return cls(name, burst or limit, limit / 60)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    limit: int
+    retry_after: float  # seconds until a token is available when denied
+
+
+class _LocalBucket:
+    """Tokens leased to this process, or a cached denial"""
+    __slots__ = ('tokens', 'remaining', 'expires_at', 'blocked_until')
+
+    def __init__(self):
+        self.tokens = 0
+        self.remaining = 0
+        self.expires_at = 0.0
+        self.blocked_until = 0.0
+
+
+class RateLimiter:
+    """Token-bucket limiter shared by every gateway replica through Redis.
+
+    A check that reaches Redis is one atomic Lua script call. While a
+    client's bucket is more than half full the script leases a few extra
+    tokens to this process, so the client's next requests are admitted
+    locally without a round trip; near the limit leases shrink to single
+    tokens. Denials are cached locally until the bucket refills. Leased
+    tokens are already debited in Redis, so replicas never over-admit;
+    leases unused after ``lease_ttl`` are dropped. If Redis is unavailable
+    requests are allowed rather than failing the API.
+    """
+
+    def __init__(self, redis_client, lease_size: Optional[int] = None, lease_ttl: Optional[float] = None,
+                 key_prefix: str = "ratelimit", max_local_entries: int = 100_000):
+        self.redis = redis_client
+        self.lease_size = lease_size or settings.rate_limit_lease_size
+        self.lease_ttl = lease_ttl if lease_ttl is not None else settings.rate_limit_lease_ttl_ms / 1000
+        self.key_prefix = key_prefix
+        self.max_local_entries = max_local_entries
+        self._local: Dict[str, _LocalBucket] = {}
+        self.stats = {"local": 0, "redis": 0, "denied": 0, "errors": 0}
+
+    async def check(self, identity: str, policy: RateLimitPolicy) -> RateLimitResult:
+        """Take one token from ``identity``'s bucket for ``policy``"""
+        key = f"{self.key_prefix}:{policy.name}:{identity}"
+        now = time.monotonic()
+        local = self._local.get(key)
+
+        if local is not None:
+            if local.blocked_until > now:
+                self.stats["local"] += 1
+                self.stats["denied"] += 1
+                RATE_LIMIT_DECISIONS.labels(policy=policy.name, decision="denied", source="local").inc()
+                return RateLimitResult(False, 0, policy.capacity, local.blocked_until - now)
+
+            if local.tokens > 0 and local.expires_at > now:
+                local.tokens -= 1
+                self.stats["local"] += 1
+                RATE_LIMIT_DECISIONS.labels(policy=policy.name, decision="allowed", source="local").inc()
+                return RateLimitResult(True, local.remaining + local.tokens, policy.capacity, 0.0)
+
+        try:
+            granted, remaining, retry_after_ms = await self._take(key, policy)
+        except RedisError as e:
+            self.stats["errors"] += 1
+            RATE_LIMIT_DECISIONS.labels(policy=policy.name, decision="allowed", source="fail_open").inc()
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            return RateLimitResult(True, policy.capacity, policy.capacity, 0.0)
+
+        self.stats["redis"] += 1
+        if local is None:
+            if len(self._local) >= self.max_local_entries:
+                self._prune(now)
+            local = self._local[key] = _LocalBucket()
+
+        if granted < 1:
+            local.tokens = 0
+            local.blocked_until = now + retry_after_ms / 1000
+            self.stats["denied"] += 1
+            RATE_LIMIT_DECISIONS.labels(policy=policy.name, decision="denied", source="redis").inc()
+            return RateLimitResult(False, 0, policy.capacity, retry_after_ms / 1000)
+
+        local.tokens = granted - 1
+        local.remaining = remaining
+        local.expires_at = now + self.lease_ttl
+        local.blocked_until = 0.0
+        RATE_LIMIT_DECISIONS.labels(policy=policy.name, decision="allowed", source="redis").inc()
+        return RateLimitResult(True, remaining + local.tokens, policy.capacity, 0.0)
+
+    async def _take(self, key: str, policy: RateLimitPolicy):
+        args = (policy.capacity, policy.refill_rate, self.lease_size)
+        try:
+            result = await self.redis.evalsha(TOKEN_BUCKET_SHA, 1, key, *args)
+        except NoScriptError:
+            # First use on this Redis (or after a restart / SCRIPT FLUSH)
+            await self.redis.script_load(TOKEN_BUCKET_SCRIPT)
+            result = await self.redis.evalsha(TOKEN_BUCKET_SHA, 1, key, *args)
+        return int(result[0]), int(result[1]), int(result[2])
+
+    def _prune(self, now: float):
+        """Forget expired leases and denials to bound memory"""
+        self._local = {
+            key: local for key, local in self._local.items()
+            if local.blocked_until > now or (local.tokens > 0 and local.expires_at > now)
+        }
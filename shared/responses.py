@@ -0,0 +1,47 @@
+"""
+Fast JSON responses for the FastAPI services
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Naive datetimes are written as-is and UTC as "Z", matching pydantic's JSON output
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not encode natively"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if type(value).__name__ == "ObjectId":  # MongoDB document ids
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON; Decimals become strings as in pydantic"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Used as every service's ``default_response_class``. Endpoints on hot
+    paths can also return one directly: FastAPI then skips validating and
+    re-encoding the result against ``response_model``, so this should only
+    wrap data that is already valid (models, or dicts with the model's
+    fields). ``bytes`` content is treated as pre-serialized JSON and sent
+    unchanged.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
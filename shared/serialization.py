@@ -0,0 +1,180 @@
+"""
+Shared message serialization with pluggable codecs and optional compression
+"""
+import json
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+import msgpack
+
+from .config import settings
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+DEFLATE_ENCODING = "deflate"
+
+# msgpack extension type codes
+_EXT_DECIMAL = 1
+_EXT_DATETIME = 2
+_EXT_DATE = 3
+
+
+class SerializationError(ValueError):
+    """Raised when a message body cannot be encoded or decoded"""
+
+
+class MessageCodec(ABC):
+    """Encodes message payloads to bytes and back"""
+
+    content_type: str
+
+    @abstractmethod
+    def encode(self, message: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, body: bytes) -> Any:
+        pass
+
+
+def _json_default(value: Any) -> Any:
+    """Fallback for types the json module cannot encode"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONCodec(MessageCodec):
+    """UTF-8 JSON; Decimals and datetimes are stringified"""
+
+    content_type = JSON_CONTENT_TYPE
+
+    def encode(self, message: Any) -> bytes:
+        return json.dumps(message, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, body: bytes) -> Any:
+        return json.loads(body)
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Encode Decimal and datetime as extension types so they round-trip exactly"""
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode('ascii'))
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode('ascii'))
+    if isinstance(value, date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode('ascii'))
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not msgpack serializable")
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode('ascii'))
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode('ascii'))
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode('ascii'))
+    return msgpack.ExtType(code, data)
+
+
+class MsgpackCodec(MessageCodec):
+    """Compact binary encoding with native Decimal, datetime and date support"""
+
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def encode(self, message: Any) -> bytes:
+        return msgpack.packb(message, default=_msgpack_default, use_bin_type=True)
+
+    def decode(self, body: bytes) -> Any:
+        return msgpack.unpackb(body, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+
+
+CODECS: Dict[str, MessageCodec] = {
+    JSON_CONTENT_TYPE: JSONCodec(),
+    MSGPACK_CONTENT_TYPE: MsgpackCodec(),
+}
+
+CODEC_ALIASES = {
+    "json": JSON_CONTENT_TYPE,
+    "msgpack": MSGPACK_CONTENT_TYPE,
+}
+
+
+def get_codec(name: Optional[str]) -> MessageCodec:
+    """Look up a codec by short name ("json", "msgpack") or content type"""
+    content_type = CODEC_ALIASES.get(name or "json", name)
+    codec = CODECS.get(content_type)
+    if codec is None:
+        raise SerializationError(f"Unsupported message content type: {name}")
+    return codec
+
+
+class MessageSerializer:
+    """Encodes outgoing messages with one codec and decodes any registered codec.
+
+    Bodies larger than ``compression_threshold`` bytes are deflated; the codec
+    and compression are reported as ``content_type``/``content_encoding`` so
+    consumers can decode without knowing the producer's settings. Messages
+    without a content type are treated as JSON.
+    """
+
+    def __init__(self, codec: MessageCodec, compression_threshold: int = 0, compression_level: int = 1):
+        self.codec = codec
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+
+    @property
+    def content_type(self) -> str:
+        return self.codec.content_type
+
+    def serialize(self, message: Any) -> Tuple[bytes, str, Optional[str]]:
+        """Encode a message; returns (body, content_type, content_encoding)"""
+        try:
+            body = self.codec.encode(message)
+        except (TypeError, ValueError) as e:
+            raise SerializationError(f"Failed to encode message: {e}") from e
+
+        if self.compression_threshold and len(body) > self.compression_threshold:
+            return zlib.compress(body, self.compression_level), self.codec.content_type, DEFLATE_ENCODING
+
+        return body, self.codec.content_type, None
+
+    def deserialize(self, body: bytes, content_type: Optional[str] = None,
+                    content_encoding: Optional[str] = None) -> Any:
+        """Decode a message using the content type and encoding it was sent with"""
+        try:
+            if content_encoding == DEFLATE_ENCODING:
+                body = zlib.decompress(body)
+            elif content_encoding:
+                raise SerializationError(f"Unsupported content encoding: {content_encoding}")
+
+            return get_codec(content_type or JSON_CONTENT_TYPE).decode(body)
+
+        except SerializationError:
+            raise
+        except Exception as e:
+            raise SerializationError(f"Failed to decode {content_type} message: {e}") from e
+
+
+# Global serializer used by the messaging layer
+message_serializer = MessageSerializer(
+    get_codec(settings.message_codec),
+    compression_threshold=settings.message_compression_threshold,
+    compression_level=settings.message_compression_level
+)
+json_serializer = MessageSerializer(get_codec("json"))
@@ -0,0 +1,91 @@
+import pytest
+import asyncio
+
+# Import the shared batch loader
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.dataloader import BatchLoader
+
+
+class TestBatchLoader:
+    """Test suite for the async batch loader"""
+
+    @pytest.mark.asyncio
+    async def test_keys_from_one_tick_share_a_batch(self):
+        """Concurrent loads are resolved by a single batch call"""
+        calls = []
+
+        async def batch_fn(keys):
+            calls.append(list(keys))
+            return [key * 10 for key in keys]
+
+        loader = BatchLoader(batch_fn)
+        results = await asyncio.gather(*(loader.load(i) for i in range(5)))
+
+        assert results == [0, 10, 20, 30, 40]
+        assert calls == [[0, 1, 2, 3, 4]]
+
+    @pytest.mark.asyncio
+    async def test_duplicate_keys_and_cache(self):
+        """Duplicate keys are deduplicated and cached keys skip the batch"""
+        calls = []
+
+        async def batch_fn(keys):
+            calls.append(list(keys))
+            return [f"value-{key}" for key in keys]
+
+        loader = BatchLoader(batch_fn)
+        assert await loader.load_many(["a", "b", "a"]) == ["value-a", "value-b", "value-a"]
+        assert await loader.load("a") == "value-a"
+        assert calls == [["a", "b"]]
+
+        loader.clear("a")
+        await loader.load("a")
+        assert calls[-1] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_uncached_loader_reloads(self):
+        """Loaders without a cache only coalesce concurrent lookups"""
+        calls = []
+
+        async def batch_fn(keys):
+            calls.append(list(keys))
+            return list(keys)
+
+        loader = BatchLoader(batch_fn, cache=False)
+        await loader.load(1)
+        await loader.load(1)
+        assert calls == [[1], [1]]
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_splits_batches(self):
+        """Large requests are split into batches of max_batch_size"""
+        calls = []
+
+        async def batch_fn(keys):
+            calls.append(len(keys))
+            return list(keys)
+
+        loader = BatchLoader(batch_fn, max_batch_size=4)
+        assert await loader.load_many(list(range(10))) == list(range(10))
+        assert calls == [4, 4, 2]
+
+    @pytest.mark.asyncio
+    async def test_batch_failure_propagates_and_is_not_cached(self):
+        """A failed batch rejects every waiter and leaves nothing cached"""
+        attempts = 0
+
+        async def batch_fn(keys):
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RuntimeError("database unavailable")
+            return list(keys)
+
+        loader = BatchLoader(batch_fn)
+        with pytest.raises(RuntimeError):
+            await loader.load_many([1, 2])
+
+        assert await loader.load(1) == 1
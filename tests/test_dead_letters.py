@@ -0,0 +1,134 @@
+import pytest
+import asyncio
+import time
+
+# Import the shared messaging layer
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.config import settings
+from shared.messaging import HybridMessagingManager, ATTEMPTS_HEADER, retry_delay_for_attempt
+from shared.dead_letters import DeadLetterManager
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "retry_delays_ms", [20, 40])
+    monkeypatch.setattr(settings, "max_delivery_attempts", 3)
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def broker_body(n: int) -> bytes:
+    return f'{{"n": {n}}}'.encode("utf-8")
+
+
+class TestRetryTiers:
+    """Test suite for delayed retries of failed deliveries"""
+
+    def test_retry_schedule(self, fast_retries):
+        """Attempts walk the delay tiers until the attempt limit"""
+        assert [retry_delay_for_attempt(attempt) for attempt in (1, 2, 3)] == [20, 40, None]
+
+    @pytest.mark.asyncio
+    async def test_transient_failure_is_retried(self, fast_retries):
+        """A handler that fails once succeeds on the delayed retry"""
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        attempts = []
+
+        async def handler(message):
+            attempts.append(message["order_id"])
+            if len(attempts) == 1:
+                raise ConnectionError("database unavailable")
+
+        await manager.consume_messages("trading.orders", handler, concurrency=1)
+        await manager.publish_message("trading.events", "order.created", {"order_id": "o-1"})
+        await wait_for(lambda: len(attempts) == 2)
+        await manager.close()
+
+        assert attempts == ["o-1", "o-1"]
+        assert manager.rabbitmq.get_queue_depth("trading.orders.dead") == 0
+
+    @pytest.mark.asyncio
+    async def test_poison_message_dead_lettered_after_max_attempts(self, fast_retries):
+        """Messages that keep failing end up in the dead letter queue with their attempt count"""
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        attempts = []
+
+        async def handler(message):
+            attempts.append(time.monotonic())
+            raise ValueError("malformed order")
+
+        await manager.consume_messages("trading.orders", handler, concurrency=1)
+        await manager.publish_message("trading.events", "order.created", {"order_id": "bad"})
+        await wait_for(lambda: manager.rabbitmq.get_queue_depth("trading.orders.dead") == 1)
+        await manager.close()
+
+        assert len(attempts) == 3
+        assert attempts[1] - attempts[0] >= 0.02
+        assert attempts[2] - attempts[1] >= 0.04
+
+        dead_letters = await DeadLetterManager(manager.rabbitmq).inspect("trading.orders")
+        assert dead_letters[0]["attempts"] == 2
+        assert dead_letters[0]["last_error"] == "malformed order"
+        assert dead_letters[0]["messages"] == [{"order_id": "bad"}]
+
+
+class TestDeadLetterManager:
+    """Test suite for dead letter inspection and replay"""
+
+    async def make_dead_letters(self, count):
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        broker = manager.rabbitmq
+        for i in range(count):
+            await broker.publish_raw(
+                "", "trading.orders.dead", broker_body(i), {ATTEMPTS_HEADER: 4}, "application/json", None
+            )
+        return broker
+
+    @pytest.mark.asyncio
+    async def test_inspect_leaves_messages(self):
+        """Inspection returns messages to the dead letter queue"""
+        broker = await self.make_dead_letters(3)
+        dead_letters = DeadLetterManager(broker)
+
+        messages = await dead_letters.inspect("trading.orders", limit=2)
+
+        assert [m["messages"] for m in messages] == [[{"n": 0}], [{"n": 1}]]
+        assert await dead_letters.depth("trading.orders") == 3
+
+    @pytest.mark.asyncio
+    async def test_replay_is_rate_limited_and_resets_attempts(self):
+        """Replay moves messages back at the requested rate with fresh attempt counters"""
+        broker = await self.make_dead_letters(10)
+        dead_letters = DeadLetterManager(broker)
+
+        start_time = time.perf_counter()
+        replayed = await dead_letters.replay("trading.orders", limit=5, rate=100)
+        elapsed = time.perf_counter() - start_time
+
+        assert replayed == 5
+        assert elapsed >= 0.04
+        assert broker.get_queue_depth("trading.orders.dead") == 5
+
+        replayed_message = await broker.get_message("trading.orders")
+        assert ATTEMPTS_HEADER not in replayed_message.headers
+        assert replayed_message.headers["x-replayed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_purge_and_unknown_queue(self):
+        """Purge empties the dead letter queue; unknown queues are rejected"""
+        broker = await self.make_dead_letters(4)
+        dead_letters = DeadLetterManager(broker)
+
+        assert await dead_letters.purge("trading.orders") == 4
+        with pytest.raises(KeyError):
+            await dead_letters.inspect("no.such.queue")
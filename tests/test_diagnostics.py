@@ -0,0 +1,57 @@
+import pytest
+import asyncio
+import time
+
+from prometheus_client import REGISTRY
+
+# Import the shared diagnostics module
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.diagnostics import EventLoopMonitor
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def hash_password_on_the_loop():
+    """Stands in for a synchronous call made inside ``async def``"""
+    time.sleep(0.3)
+
+
+class TestEventLoopMonitor:
+    """Test suite for the shared event-loop lag monitor"""
+
+    @pytest.mark.asyncio
+    async def test_blocking_call_is_reported_with_its_stack(self):
+        """A callback holding the loop is caught in the act and counted once"""
+        monitor = EventLoopMonitor(interval=0.02, threshold=0.05)
+        await monitor.start("diagnostics-blocking")
+        await asyncio.sleep(0.05)
+
+        hash_password_on_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert len(monitor.reports) == 1
+        report = monitor.reports[0]
+        assert "hash_password_on_the_loop" in "".join(report["stack"])
+        assert report["blocked_for"] >= 0.05
+        assert sample("event_loop_blocked_total", service="diagnostics-blocking") == 1
+        assert sample("event_loop_lag_seconds_sum", service="diagnostics-blocking") >= 0.2
+
+    @pytest.mark.asyncio
+    async def test_cooperative_code_is_not_reported(self):
+        """Awaiting work records lag samples but no blocking reports"""
+        monitor = EventLoopMonitor(interval=0.02, threshold=0.05)
+        await monitor.start("diagnostics-healthy")
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            time.sleep(0.001)
+        await monitor.stop()
+
+        assert monitor.recent_reports() == []
+        assert sample("event_loop_lag_seconds_count", service="diagnostics-healthy") >= 3
+        assert sample("event_loop_blocked_total", service="diagnostics-healthy") == 0
@@ -0,0 +1,277 @@
+import pytest
+import asyncio
+import importlib.util
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import jwt
+from fastapi import Depends, FastAPI, HTTPException
+
+# Import the gateway edge authenticator
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from auth import EdgeAuthenticator, UserStatus
+
+SECRET = "test-secret"
+
+
+def make_token(sub="user-1", expires_in=300, secret=SECRET, algorithm="HS256", **claims):
+    payload = {"sub": sub, "email": f"{sub}@example.com", "exp": int(time.time()) + expires_in, **claims}
+    return jwt.encode(payload, secret, algorithm=algorithm)
+
+
+class StatusStore:
+    """User status table standing in for Postgres"""
+
+    def __init__(self, delay=0.0):
+        self.rows = {"user-1": UserStatus(True, "trader"), "user-2": UserStatus(True, "admin")}
+        self.delay = delay
+        self.loads = 0
+
+    async def load(self, user_id):
+        self.loads += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.rows.get(user_id)
+
+
+class FakePubSub:
+    def __init__(self, channel_queue):
+        self.queue = channel_queue
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        while True:
+            yield {"type": "message", "data": await self.queue.get()}
+
+    async def aclose(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def pubsub(self):
+        return FakePubSub(self.queue)
+
+
+class TestEdgeAuthenticator:
+    """Test suite for gateway edge authentication"""
+
+    @pytest.mark.asyncio
+    async def test_verifies_and_caches(self):
+        """Valid tokens authenticate; claims and status are reused across requests"""
+        store = StatusStore()
+        auth = EdgeAuthenticator(secret=SECRET, status_loader=store.load)
+        token = make_token()
+
+        users = [await auth.authenticate(token) for _ in range(100)]
+
+        assert users[0] == {"user_id": "user-1", "email": "user-1@example.com", "role": "trader"}
+        assert all(user == users[0] for user in users)
+        assert store.loads == 1
+        assert len(auth._claims) == 1
+
+    @pytest.mark.asyncio
+    async def test_rejects_bad_tokens(self):
+        """Expired, forged, unsigned and unsupported-algorithm tokens get 401"""
+        auth = EdgeAuthenticator(secret=SECRET, status_loader=StatusStore().load)
+        bad_tokens = {
+            "expired": make_token(expires_in=-10),
+            "forged": make_token(secret="other-secret"),
+            "unsigned": jwt.encode({"sub": "user-1", "exp": int(time.time()) + 60}, None, algorithm="none"),
+            "wrong_alg": make_token(algorithm="HS512"),
+            "garbage": "not-a-token",
+        }
+
+        details = {}
+        for name, token in bad_tokens.items():
+            with pytest.raises(HTTPException) as excinfo:
+                await auth.authenticate(token)
+            assert excinfo.value.status_code == 401
+            details[name] = excinfo.value.detail
+
+        assert details["expired"] == "Token expired"
+        assert auth._claims == {}
+
+    @pytest.mark.asyncio
+    async def test_deactivation_and_role_change(self):
+        """Status changes apply on invalidation even though the token is still valid"""
+        store = StatusStore()
+        auth = EdgeAuthenticator(secret=SECRET, status_loader=store.load, status_ttl=3600)
+        token = make_token()
+
+        assert (await auth.authenticate(token))["role"] == "trader"
+
+        store.rows["user-1"] = UserStatus(True, "user")
+        assert (await auth.authenticate(token))["role"] == "trader"  # cached within TTL
+        auth.invalidate_user("user-1")
+        assert (await auth.authenticate(token))["role"] == "user"
+
+        store.rows["user-1"] = UserStatus(False, "user")
+        auth.invalidate_user("user-1")
+        with pytest.raises(HTTPException) as excinfo:
+            await auth.authenticate(token)
+        assert excinfo.value.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_load_is_not_lost(self):
+        """A status read that races with an invalidation is not cached"""
+        store = StatusStore(delay=0.05)
+        auth = EdgeAuthenticator(secret=SECRET, status_loader=store.load, status_ttl=3600)
+
+        load = asyncio.create_task(auth.user_status("user-1"))
+        await asyncio.sleep(0.01)
+        store.rows["user-1"] = UserStatus(False, "trader")
+        auth.invalidate_user("user-1")
+        await load
+
+        assert (await auth.user_status("user-1")).is_active is False
+
+    @pytest.mark.asyncio
+    async def test_pushed_invalidations(self):
+        """User ids published on the invalidation channel evict cached status"""
+        store = StatusStore()
+        auth = EdgeAuthenticator(secret=SECRET, status_loader=store.load, status_ttl=3600)
+        redis = FakeRedis()
+        await auth.start(redis)
+        await asyncio.sleep(0)
+
+        await auth.user_status("user-1")
+        await auth.user_status("user-2")
+        await redis.queue.put("user-1")
+        await asyncio.sleep(0.01)
+        await auth.stop()
+
+        assert "user-1" not in auth._status and "user-2" in auth._status
+
+    @pytest.mark.asyncio
+    async def test_rs256_tokens(self):
+        """RS256 tokens verify with the configured public key only"""
+        pytest.importorskip("cryptography")
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        auth = EdgeAuthenticator(secret=SECRET, public_key=public_pem, status_loader=StatusStore().load)
+
+        user = await auth.authenticate(make_token(sub="user-2", secret=private_key, algorithm="RS256"))
+        assert user["role"] == "admin"
+
+        # The public key must not be accepted as an HMAC secret
+        with pytest.raises(HTTPException):
+            auth.decode(jwt.encode({"sub": "user-2", "exp": int(time.time()) + 60}, "x", algorithm="HS384"))
+
+    @pytest.mark.asyncio
+    async def test_dependency_and_overhead(self, monkeypatch):
+        """The route dependency authenticates at the edge in microseconds once warm"""
+        import dependencies
+
+        store = StatusStore()
+        auth = EdgeAuthenticator(secret=SECRET, status_loader=store.load)
+        monkeypatch.setattr(dependencies, "edge_auth", auth)
+        app = FastAPI()
+
+        @app.get("/me")
+        async def me(user: dict = Depends(dependencies.get_current_user)):
+            return user
+
+        token = make_token()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            ok = await client.get("/me", headers={"Authorization": f"Bearer {token}"})
+            missing = await client.get("/me")
+
+        assert ok.json()["user_id"] == "user-1"
+        assert missing.status_code == 401
+
+        iterations = 10000
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            await auth.authenticate(token)
+        warm_us = (time.perf_counter() - start_time) / iterations * 1e6
+
+        cold = EdgeAuthenticator(secret=SECRET, status_loader=StatusStore().load, max_tokens=1)
+        tokens = [make_token(sub="user-1", jti=str(i)) for i in range(500)]
+        start_time = time.perf_counter()
+        for cold_token in tokens:
+            await cold.authenticate(cold_token)
+        cold_us = (time.perf_counter() - start_time) / len(tokens) * 1e6
+
+        print(f"Edge auth: {warm_us:.1f}us/request warm, {cold_us:.1f}us/request verifying the signature")
+        assert store.loads == 1
+        assert warm_us < cold_us
+
+    @pytest.mark.asyncio
+    async def test_api_keys_are_rejected_without_a_key_store(self):
+        """API-key routes refuse every key until keys can be verified"""
+        import dependencies
+
+        app = FastAPI()
+
+        @app.get("/keyed")
+        async def keyed(api_key: str = Depends(dependencies.check_api_key)):
+            return {"ok": True}
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            missing = await client.get("/keyed")
+            presented = await client.get("/keyed", headers={"X-API-Key": "any-key"})
+
+        assert missing.status_code == 401
+        assert presented.status_code == 401 and presented.json() == {"detail": "Invalid API key"}
+
+    @pytest.mark.asyncio
+    async def test_default_status_loader_reads_postgres(self, monkeypatch):
+        """Without a stub, status misses are batched through the shared asyncpg pool"""
+        pytest.importorskip("motor")
+        from shared import database
+
+        class Connection:
+            def __init__(self):
+                self.queries = []
+
+            async def fetch(self, query, user_ids):
+                self.queries.append((query, user_ids))
+                rows = {"user-1": "trader", "user-2": "admin"}
+                return [{"id": user_id, "is_active": True, "role": rows[user_id]} for user_id in user_ids]
+
+        class Pool:
+            def __init__(self, conn):
+                self.conn = conn
+
+            @asynccontextmanager
+            async def acquire(self):
+                yield self.conn
+
+        conn = Connection()
+        monkeypatch.setattr(database.postgresql_manager, "pool", Pool(conn))
+        auth = EdgeAuthenticator(secret=SECRET)
+
+        users = await asyncio.gather(auth.authenticate(make_token("user-1")), auth.authenticate(make_token("user-2")))
+
+        assert [user["role"] for user in users] == ["trader", "admin"]
+        assert len(conn.queries) == 1
+        assert "FROM users WHERE id = ANY($1)" in conn.queries[0][0]
+
+    def test_gateway_app_imports(self):
+        """The gateway module imports with the proxy as its only route to backends"""
+        pytest.importorskip("motor")
+        pytest.importorskip("uvicorn")
+        spec = importlib.util.spec_from_file_location(
+            "gateway_main", os.path.join(os.path.dirname(os.path.dirname(__file__)), "services", "api-gateway", "main.py")
+        )
+        gateway = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gateway)
+
+        assert "/api/v1/{service}/{path:path}" in [route.path for route in gateway.app.routes]
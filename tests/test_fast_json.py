@@ -0,0 +1,189 @@
+import pytest
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+# Import the shared response layer
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.responses import FastJSONResponse, dumps
+
+
+class Side(str, Enum):
+    BUY = "buy"
+    SELL = "sell"
+
+
+class MarketData(BaseModel):
+    symbol: str
+    bid: Decimal
+    ask: Decimal
+    last: Decimal
+    volume: Decimal
+    high: Decimal
+    low: Decimal
+    change: Decimal
+    change_percent: Decimal
+    timestamp: datetime
+
+
+class Position(BaseModel):
+    id: str
+    symbol: str
+    side: Side
+    quantity: Decimal
+    average_price: Decimal
+    current_price: Decimal
+    unrealized_pnl: Decimal
+    opened_at: datetime
+
+
+class Portfolio(BaseModel):
+    account_id: str
+    total_value: Decimal
+    cash_balance: Decimal
+    positions: List[Position]
+    updated_at: datetime
+
+
+class ObjectId:
+    """Minimal stand-in for bson.ObjectId"""
+
+    def __init__(self, value: str):
+        self.value = value
+
+    def __str__(self):
+        return self.value
+
+
+NOW = datetime(2024, 5, 1, 12, 30, 15, 123456)
+
+MARKET_DATA = {
+    f"SYM{i}": {
+        "symbol": f"SYM{i}", "bid": Decimal("1.08421"), "ask": Decimal("1.08443"), "last": Decimal("1.08432"),
+        "volume": Decimal("25000"), "high": Decimal("1.0912"), "low": Decimal("1.0801"),
+        "change": Decimal("-0.00012"), "change_percent": Decimal("-0.011"), "timestamp": NOW
+    }
+    for i in range(100)
+}
+
+PORTFOLIO = Portfolio(
+    account_id="acc-1", total_value=Decimal("125000.50"), cash_balance=Decimal("25000.00"), updated_at=NOW,
+    positions=[
+        Position(id=f"pos-{i}", symbol=f"SYM{i}", side=Side.BUY if i % 2 else Side.SELL,
+                 quantity=Decimal("1000"), average_price=Decimal("1.0821"), current_price=Decimal("1.0843"),
+                 unrealized_pnl=Decimal("2.2000"), opened_at=NOW)
+        for i in range(50)
+    ]
+)
+
+NOTIFICATIONS = [
+    {"_id": f"66320f{i:018d}", "user_id": "user-1", "title": "Order filled", "message": f"Order {i} filled",
+     "is_read": bool(i % 3), "created_at": NOW}
+    for i in range(100)
+]
+
+
+def make_app() -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    default = FastAPI()
+
+    @default.get("/market-data", response_model=List[MarketData])
+    async def default_market_data():
+        return [MarketData(**data) for data in MARKET_DATA.values()]
+
+    @app.get("/market-data", response_model=List[MarketData])
+    async def fast_market_data():
+        return FastJSONResponse(list(MARKET_DATA.values()))
+
+    @default.get("/portfolio", response_model=Portfolio)
+    async def default_portfolio():
+        return PORTFOLIO
+
+    @app.get("/portfolio", response_model=Portfolio)
+    async def fast_portfolio():
+        return FastJSONResponse(PORTFOLIO)
+
+    @default.get("/in-app")
+    async def default_in_app():
+        return NOTIFICATIONS
+
+    @app.get("/in-app")
+    async def fast_in_app():
+        return FastJSONResponse([{**doc, "_id": ObjectId(doc["_id"])} for doc in NOTIFICATIONS])
+
+    @app.get("/validated", response_model=MarketData)
+    async def validated():
+        return MarketData(**MARKET_DATA["SYM0"])
+
+    return app, default
+
+
+def client_for(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://service")
+
+
+class TestFastJSON:
+    """Test suite for the shared fast JSON response layer"""
+
+    def test_encodes_like_pydantic(self):
+        """Decimals, datetimes, enums, models and ObjectIds encode the way pydantic's JSON mode does"""
+        aware = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+        assert json.loads(dumps({"d": Decimal("1.10"), "t": aware, "n": NOW})) == {
+            "d": "1.10", "t": "2024-05-01T12:00:00Z", "n": "2024-05-01T12:30:15.123456"
+        }
+        assert json.loads(dumps(PORTFOLIO)) == json.loads(PORTFOLIO.model_dump_json())
+        assert dumps({"id": ObjectId("abc"), 1: {"x"}}) == b'{"id":"abc","1":["x"]}'
+        assert FastJSONResponse(b'{"pre":"rendered"}').body == b'{"pre":"rendered"}'
+
+        with pytest.raises(TypeError):
+            dumps({"x": object()})
+
+    @pytest.mark.asyncio
+    async def test_fast_paths_match_default_output(self):
+        """Returning FastJSONResponse directly produces the same JSON as the validated default path"""
+        app, default = make_app()
+
+        async with client_for(app) as fast_client, client_for(default) as default_client:
+            for path in ("/market-data", "/portfolio", "/in-app"):
+                fast = await fast_client.get(path)
+                slow = await default_client.get(path)
+                assert fast.headers["content-type"] == "application/json"
+                assert fast.json() == slow.json(), path
+
+            # Regular endpoints still validate and render through the default class
+            validated = await fast_client.get("/validated")
+        assert validated.json()["bid"] == "1.08421"
+
+    @pytest.mark.asyncio
+    async def test_endpoint_benchmark(self):
+        """Per-endpoint throughput of the default path vs the fast path"""
+        app, default = make_app()
+        iterations = 200
+        results = {}
+
+        async with client_for(app) as fast_client, client_for(default) as default_client:
+            for path in ("/market-data", "/portfolio", "/in-app"):
+                timings = {}
+                for name, client in (("default", default_client), ("fast", fast_client)):
+                    await client.get(path)  # warm up
+                    start_time = time.perf_counter()
+                    for _ in range(iterations):
+                        await client.get(path)
+                    timings[name] = iterations / (time.perf_counter() - start_time)
+                results[path] = timings
+                print(f"{path}: {timings['default']:.0f} req/s default, {timings['fast']:.0f} req/s fast "
+                      f"({timings['fast'] / timings['default']:.1f}x)")
+
+        assert results["/market-data"]["fast"] > results["/market-data"]["default"]
+        assert results["/portfolio"]["fast"] > results["/portfolio"]["default"]
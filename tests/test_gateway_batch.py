@@ -0,0 +1,199 @@
+import pytest
+import asyncio
+import json
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+
+# Import the gateway batch executor
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+import dependencies
+from batch import BATCH_PATH, BatchExecutor, BatchRequest
+from dependencies import get_current_user
+from proxy import ReverseProxy
+
+
+def json_response(status, body):
+    return httpx.Response(
+        status, headers={"content-type": "application/json"},
+        stream=httpx.ByteStream(json.dumps(body).encode())
+    )
+
+
+class Upstream:
+    """Mock backend that answers after a fixed delay and records each call"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append((request.method, request.url.path, request.headers.get("authorization")))
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if request.url.path.endswith("/missing"):
+            return json_response(404, {"detail": "Not found"})
+        body = {"path": request.url.path, "query": request.url.query.decode()}
+        if request.method == "POST":
+            body["received"] = (await request.aread()).decode()
+        return json_response(200, body)
+
+
+class CountingAuth:
+    """Stands in for the edge authenticator and counts verifications"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def authenticate(self, token):
+        self.calls += 1
+        if token != "good-token":
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return {"user_id": "user-1", "email": "user-1@example.com", "role": "trader"}
+
+
+def make_gateway(upstream: Upstream, executor: BatchExecutor):
+    proxy = ReverseProxy(upstreams={})
+    proxy.add_upstream("trading_service", "http://trading", transport=httpx.MockTransport(upstream))
+    gateway = FastAPI()
+
+    @gateway.get("/api/v1/status")
+    async def api_status(current_user: dict = Depends(get_current_user)):
+        return {"user_id": current_user["user_id"]}
+
+    @gateway.get("/api/v1/broken")
+    async def broken():
+        raise RuntimeError("boom")
+
+    @gateway.get("/api/v1/garbled")
+    async def garbled():
+        return Response(content=b'{"truncated": ', media_type="application/json")
+
+    @gateway.post(BATCH_PATH)
+    async def batch(batch_request: BatchRequest, request: Request, current_user: dict = Depends(get_current_user)):
+        results = await executor.execute(request.app, request.scope, current_user, batch_request.requests)
+        return {"responses": results}
+
+    @gateway.api_route("/api/v1/trading/{path:path}", methods=["GET", "POST"])
+    async def forward(path: str, request: Request):
+        return await proxy.forward(request, "trading_service", f"/api/v1/{path}")
+
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=gateway), base_url="http://gateway",
+        headers={"Authorization": "Bearer good-token"}
+    )
+    return client, proxy
+
+
+class TestBatchEndpoint:
+    """Test suite for the gateway /api/v1/batch endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_sub_requests_run_concurrently_with_item_status(self, monkeypatch):
+        """Sub-requests overlap, keep their order and ids, and report their own status"""
+        monkeypatch.setattr(dependencies, "edge_auth", CountingAuth())
+        upstream = Upstream(delay=0.1)
+        client, proxy = make_gateway(upstream, BatchExecutor(concurrency=10))
+
+        requests = [
+            {"id": "accounts", "path": "/api/v1/trading/accounts"},
+            {"id": "quotes", "path": "/api/v1/trading/market-data?symbols=AAPL,MSFT"},
+            {"id": "gone", "path": "/api/v1/trading/missing"},
+            {"id": "order", "method": "POST", "path": "/api/v1/trading/orders", "body": {"symbol": "AAPL"}},
+        ]
+        async with client:
+            response = await client.post(BATCH_PATH, json={"requests": requests})
+        await proxy.close()
+
+        assert response.status_code == 200
+        items = response.json()["responses"]
+        assert [item["id"] for item in items] == ["accounts", "quotes", "gone", "order"]
+        assert [item["status"] for item in items] == [200, 200, 404, 200]
+        assert items[1]["body"] == {"path": "/api/v1/market-data", "query": "symbols=AAPL,MSFT"}
+        assert items[3]["body"]["received"] == '{"symbol": "AAPL"}'
+        assert items[0]["headers"]["content-type"] == "application/json"
+        assert upstream.peak_in_flight == len(requests)
+
+    @pytest.mark.asyncio
+    async def test_authenticates_once_and_dedupes_reads(self, monkeypatch):
+        """The batch is verified once; identical GETs share a call, POSTs never do"""
+        auth = CountingAuth()
+        monkeypatch.setattr(dependencies, "edge_auth", auth)
+        upstream = Upstream(delay=0.01)
+        client, proxy = make_gateway(upstream, BatchExecutor())
+
+        requests = [
+            {"id": "a", "path": "/api/v1/trading/accounts"},
+            {"id": "b", "path": "/api/v1/trading/accounts"},
+            {"id": "me", "path": "/api/v1/status"},
+            {"id": "p1", "method": "POST", "path": "/api/v1/trading/orders", "body": {}},
+            {"id": "p2", "method": "POST", "path": "/api/v1/trading/orders", "body": {}},
+        ]
+        async with client:
+            response = await client.post(BATCH_PATH, json={"requests": requests})
+        await proxy.close()
+
+        items = response.json()["responses"]
+        assert [item["id"] for item in items] == ["a", "b", "me", "p1", "p2"]
+        assert items[0]["body"] == items[1]["body"]
+        assert items[2]["body"] == {"user_id": "user-1"}
+        assert auth.calls == 1
+        assert [call[:2] for call in upstream.calls].count(("GET", "/api/v1/accounts")) == 1
+        assert [call[:2] for call in upstream.calls].count(("POST", "/api/v1/orders")) == 2
+        # Upstreams still receive the caller's credentials
+        assert all(call[2] == "Bearer good-token" for call in upstream.calls)
+
+    @pytest.mark.asyncio
+    async def test_rejects_foreign_and_nested_paths(self, monkeypatch):
+        """Only /api/v1 paths may be batched and batches cannot contain batches"""
+        monkeypatch.setattr(dependencies, "edge_auth", CountingAuth())
+        upstream = Upstream(delay=0)
+        client, proxy = make_gateway(upstream, BatchExecutor())
+
+        requests = [
+            {"id": "metrics", "path": "/metrics"},
+            {"id": "external", "path": "http://evil.example/api/v1/trading/accounts"},
+            {"id": "nested", "method": "POST", "path": BATCH_PATH, "body": {"requests": []}},
+        ]
+        async with client:
+            response = await client.post(BATCH_PATH, json={"requests": requests})
+            anonymous = await client.post(
+                BATCH_PATH, json={"requests": requests}, headers={"Authorization": "Bearer bad"}
+            )
+        await proxy.close()
+
+        assert [item["status"] for item in response.json()["responses"]] == [400, 400, 400]
+        assert anonymous.status_code == 401
+        assert upstream.calls == []
+
+    @pytest.mark.asyncio
+    async def test_failing_sub_request_does_not_fail_the_batch(self, monkeypatch):
+        """A route that raises yields a 500 item; invalid JSON comes back as text"""
+        monkeypatch.setattr(dependencies, "edge_auth", CountingAuth())
+        upstream = Upstream(delay=0)
+        client, proxy = make_gateway(upstream, BatchExecutor())
+
+        requests = [
+            {"id": "ok", "path": "/api/v1/trading/accounts"},
+            {"id": "broken", "path": "/api/v1/broken"},
+            {"id": "garbled", "path": "/api/v1/garbled"},
+        ]
+        async with client:
+            response = await client.post(BATCH_PATH, json={"requests": requests})
+        await proxy.close()
+
+        assert response.status_code == 200
+        items = response.json()["responses"]
+        assert [item["status"] for item in items] == [200, 500, 200]
+        assert items[0]["body"] == {"path": "/api/v1/accounts", "query": ""}
+        assert items[2]["body"] == '{"truncated": '
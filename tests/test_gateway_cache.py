@@ -0,0 +1,165 @@
+import pytest
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Import the gateway cache and proxy
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from cache import ResponseCache, CachePolicy, etag_matches
+from proxy import ReverseProxy
+
+
+def make_backend(delay: float = 0.0):
+    backend = FastAPI()
+    backend.state.calls = 0
+
+    @backend.get("/market-data/{symbol}")
+    async def market_data(symbol: str):
+        backend.state.calls += 1
+        await asyncio.sleep(delay)
+        return {"symbol": symbol, "last": "1.2345", "version": backend.state.calls}
+
+    @backend.get("/accounts")
+    async def accounts(request: Request):
+        backend.state.calls += 1
+        return {"owner": request.headers.get("authorization")}
+
+    @backend.get("/orders")
+    async def orders():
+        backend.state.calls += 1
+        response = JSONResponse({"orders": []})
+        response.set_cookie("session", "s")
+        return response
+
+    @backend.get("/market-data")
+    async def missing():
+        backend.state.calls += 1
+        return JSONResponse({"detail": "unavailable"}, status_code=503)
+
+    return backend
+
+
+def make_gateway(backend: FastAPI, policies, ttl_cache: ResponseCache = None):
+    proxy = ReverseProxy(upstreams={})
+    proxy.add_upstream("trading", "http://trading", transport=httpx.ASGITransport(app=backend))
+    cache = ttl_cache or ResponseCache(policies=policies)
+    gateway = FastAPI()
+
+    @gateway.get("/api/v1/trading/{path:path}")
+    async def forward(path: str, request: Request):
+        cached = cache.policy_for(request)
+        if cached is None:
+            return await proxy.forward(request, "trading", path)
+        route, policy = cached
+        return await cache.serve(request, route, policy, lambda: proxy.fetch(request, "trading", path))
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=gateway), base_url="http://gateway")
+    return client, proxy, cache
+
+
+POLICIES = {
+    "/api/v1/trading/market-data": CachePolicy(ttl=60, vary_by_user=False),
+    "/api/v1/trading/accounts": CachePolicy(ttl=60, vary_by_user=True),
+    "/api/v1/trading/orders": CachePolicy(ttl=60, vary_by_user=True),
+}
+
+
+class TestResponseCache:
+    """Test suite for the gateway response cache"""
+
+    @pytest.mark.asyncio
+    async def test_hits_and_conditional_requests(self):
+        """Repeat reads are served from cache and a matching If-None-Match gets 304"""
+        backend = make_backend()
+        client, proxy, _ = make_gateway(backend, POLICIES)
+
+        async with client:
+            first = await client.get("/api/v1/trading/market-data/EURUSD")
+            second = await client.get("/api/v1/trading/market-data/EURUSD")
+            revalidated = await client.get(
+                "/api/v1/trading/market-data/EURUSD", headers={"If-None-Match": f'W/"x", {first.headers["etag"]}'}
+            )
+            stale_tag = await client.get("/api/v1/trading/market-data/EURUSD", headers={"If-None-Match": '"other"'})
+        await proxy.close()
+
+        assert backend.state.calls == 1
+        assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+        assert second.json() == first.json()
+        assert second.headers["etag"] == first.headers["etag"]
+        assert second.headers["content-type"] == "application/json"
+        assert revalidated.status_code == 304 and revalidated.content == b""
+        assert revalidated.headers["etag"] == first.headers["etag"]
+        assert stale_tag.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_are_coalesced(self):
+        """A burst of identical misses makes one upstream call"""
+        backend = make_backend(delay=0.05)
+        client, proxy, _ = make_gateway(backend, POLICIES)
+
+        async with client:
+            responses = await asyncio.gather(
+                *(client.get("/api/v1/trading/market-data/BTCUSD") for _ in range(20))
+            )
+        await proxy.close()
+
+        assert backend.state.calls == 1
+        assert all(r.status_code == 200 and r.json()["version"] == 1 for r in responses)
+        assert sorted(r.headers["x-cache"] for r in responses) == ["COALESCED"] * 19 + ["MISS"]
+
+    @pytest.mark.asyncio
+    async def test_vary_by_user_and_uncacheable_responses(self):
+        """Per-user routes never leak across callers; errors and cookies are not stored"""
+        backend = make_backend()
+        client, proxy, _ = make_gateway(backend, POLICIES)
+
+        async with client:
+            alice = await client.get("/api/v1/trading/accounts", headers={"Authorization": "Bearer alice"})
+            bob = await client.get("/api/v1/trading/accounts", headers={"Authorization": "Bearer bob"})
+            alice_again = await client.get("/api/v1/trading/accounts", headers={"Authorization": "Bearer alice"})
+            calls_after_accounts = backend.state.calls
+
+            for _ in range(2):
+                await client.get("/api/v1/trading/orders", headers={"Authorization": "Bearer alice"})
+                failed = await client.get("/api/v1/trading/market-data")
+        await proxy.close()
+
+        assert alice.json()["owner"] == "Bearer alice" and bob.json()["owner"] == "Bearer bob"
+        assert alice_again.headers["x-cache"] == "HIT" and alice_again.json()["owner"] == "Bearer alice"
+        assert calls_after_accounts == 2
+        assert backend.state.calls == 6
+        assert failed.status_code == 503 and "etag" not in failed.headers
+
+    @pytest.mark.asyncio
+    async def test_expiry_and_eviction(self):
+        """Entries expire after their TTL and the least recently used is evicted"""
+        backend = make_backend()
+        cache = ResponseCache(
+            policies={"/api/v1/trading/market-data": CachePolicy(ttl=0.05, vary_by_user=False)}, max_entries=2
+        )
+        client, proxy, _ = make_gateway(backend, None, ttl_cache=cache)
+
+        async with client:
+            await client.get("/api/v1/trading/market-data/A")
+            await asyncio.sleep(0.06)
+            expired = await client.get("/api/v1/trading/market-data/A")
+            await client.get("/api/v1/trading/market-data/B")
+            await client.get("/api/v1/trading/market-data/C")
+        await proxy.close()
+
+        assert expired.headers["x-cache"] == "MISS" and expired.json()["version"] == 2
+        assert len(cache._entries) == 2 and all("/A" not in key for key in cache._entries)
+
+    def test_etag_matching(self):
+        """If-None-Match uses weak comparison and accepts lists and *"""
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc"', '"abc"')
+        assert etag_matches('*', '"abc"')
+        assert not etag_matches('"abcd"', '"abc"')
+        assert not etag_matches(None, '"abc"')
@@ -0,0 +1,146 @@
+import pytest
+import gzip
+import json
+import zlib
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+# Import the gateway middleware
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from middleware import CompressionMiddleware, negotiate_encoding
+
+DOCUMENT = {"id": "doc-1", "extracted_text": "Quarterly revenue grew in every region. " * 500}
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/documents/large")
+    async def large():
+        return DOCUMENT
+
+    @app.get("/documents/small")
+    async def small():
+        return {"id": "doc-1"}
+
+    @app.get("/documents/cached")
+    async def cached():
+        return Response(json.dumps(DOCUMENT), media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/documents/private")
+    async def private(request: Request):
+        # Same ETag for every caller, as a careless upstream might send
+        body = dict(DOCUMENT, owner=request.headers.get("authorization"))
+        return Response(json.dumps(body), media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/documents/file")
+    async def file():
+        return Response(os.urandom(4096), media_type="application/pdf")
+
+    @app.get("/ai/stream")
+    async def stream():
+        async def chunks():
+            for i in range(5):
+                yield json.dumps({"token": i, "text": "lorem ipsum " * 50}).encode() + b"\n"
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway")
+
+
+class TestCompressionMiddleware:
+    """Test suite for gateway response compression"""
+
+    def test_negotiation(self):
+        """Highest quality wins, ties go to the server's preference, q=0 excludes"""
+        encodings = ("zstd", "br", "gzip")
+        assert negotiate_encoding("gzip, deflate, br", encodings) == "br"
+        assert negotiate_encoding("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+        assert negotiate_encoding("br;q=0, *", encodings) == "zstd"
+        assert negotiate_encoding("gzip;q=0", ("gzip",)) is None
+        assert negotiate_encoding("identity", encodings) is None
+        assert negotiate_encoding(None, encodings) is None
+
+    @pytest.mark.asyncio
+    async def test_large_json_is_gzipped_and_small_is_not(self):
+        """Bodies over the threshold are compressed; small and binary bodies pass through"""
+        async with client_for(make_app()) as client:
+            large = await client.get("/documents/large", headers={"Accept-Encoding": "gzip"})
+            small = await client.get("/documents/small", headers={"Accept-Encoding": "gzip"})
+            binary = await client.get("/documents/file", headers={"Accept-Encoding": "gzip"})
+            identity = await client.get("/documents/large", headers={"Accept-Encoding": "identity"})
+
+        assert large.headers["content-encoding"] == "gzip"
+        assert large.headers["vary"] == "Accept-Encoding"
+        assert int(large.headers["content-length"]) < len(json.dumps(DOCUMENT)) / 10
+        assert large.json() == DOCUMENT  # httpx decodes gzip
+        assert "content-encoding" not in small.headers
+        assert "content-encoding" not in binary.headers
+        assert "content-encoding" not in identity.headers
+
+    @pytest.mark.asyncio
+    async def test_streaming_responses_are_compressed_incrementally(self):
+        """Each streamed chunk is flushed so it decompresses before the stream ends"""
+        async with client_for(make_app()) as client:
+            async with client.stream("GET", "/ai/stream", headers={"Accept-Encoding": "gzip"}) as response:
+                assert response.headers["content-encoding"] == "gzip"
+                assert "content-length" not in response.headers
+                raw_chunks = [chunk async for chunk in response.aiter_raw()]
+
+        decompressor = zlib.decompressobj(31)
+        first = decompressor.decompress(raw_chunks[0])
+        assert json.loads(first.splitlines()[0])["token"] == 0
+        rest = b"".join(decompressor.decompress(chunk) for chunk in raw_chunks[1:])
+        assert len((first + rest).splitlines()) == 5
+
+    @pytest.mark.asyncio
+    async def test_compressed_forms_of_cacheable_responses_are_cached(self):
+        """Responses with an ETag are compressed once per encoding and get a weak ETag"""
+        app = make_app()
+        async with client_for(app) as client:
+            first = await client.get("/documents/cached", headers={"Accept-Encoding": "gzip"})
+            second = await client.get("/documents/cached", headers={"Accept-Encoding": "gzip"})
+
+        middleware = app.middleware_stack
+        while not isinstance(middleware, CompressionMiddleware):
+            middleware = middleware.app
+
+        assert first.headers["etag"] == 'W/"v1"'
+        assert [key[-2:] for key in middleware._cache] == [('"v1"', "gzip")]
+        assert gzip.decompress(next(iter(middleware._cache.values()))) == json.dumps(DOCUMENT).encode()
+        assert second.json() == DOCUMENT
+
+    @pytest.mark.asyncio
+    async def test_cached_bodies_are_not_shared_across_resources_or_callers(self):
+        """A shared ETag never serves one resource's or caller's body for another"""
+        async with client_for(make_app()) as client:
+            cached = await client.get("/documents/cached", headers={"Accept-Encoding": "gzip"})
+            alice = await client.get(
+                "/documents/private", headers={"Accept-Encoding": "gzip", "Authorization": "Bearer alice"}
+            )
+            bob = await client.get(
+                "/documents/private", headers={"Accept-Encoding": "gzip", "Authorization": "Bearer bob"}
+            )
+
+        assert "owner" not in cached.json()
+        assert alice.json()["owner"] == "Bearer alice"
+        assert bob.json()["owner"] == "Bearer bob"
+
+    @pytest.mark.asyncio
+    async def test_optional_codecs(self):
+        """Brotli and zstd are offered only when their packages are installed"""
+        pytest.importorskip("brotli")
+        async with client_for(make_app()) as client:
+            response = await client.get("/documents/large", headers={"Accept-Encoding": "br"})
+        assert response.headers["content-encoding"] == "br"
+        assert response.json() == DOCUMENT  # httpx decodes br when brotli is installed
@@ -0,0 +1,102 @@
+import pytest
+import asyncio
+import json
+import time
+
+# Import the gateway health monitor
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from health import HealthMonitor
+
+
+class Dependency:
+    """Health check stand-in with adjustable latency and failure"""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+
+
+class TestHealthMonitor:
+    """Test suite for the gateway health subsystem"""
+
+    @pytest.mark.asyncio
+    async def test_checks_run_concurrently_with_timeouts(self):
+        """Total refresh time is the slowest check, capped by its own timeout"""
+        monitor = HealthMonitor(interval=60, stale_after=60)
+        monitor.register("database", Dependency(delay=0.1))
+        monitor.register("cache", Dependency(delay=0.1))
+        monitor.register("messaging", Dependency(delay=5), timeout=0.15)
+
+        start_time = time.perf_counter()
+        status_code, body = await monitor.refresh()
+        elapsed = time.perf_counter() - start_time
+
+        health = json.loads(body)
+        assert elapsed < 0.3
+        assert status_code == 503 and health["status"] == "unhealthy"
+        assert health["services"] == {"database": "healthy", "cache": "healthy", "messaging": "unhealthy"}
+        assert "timed out" in health["errors"]["messaging"]
+
+    @pytest.mark.asyncio
+    async def test_probes_are_served_from_cache(self):
+        """Repeated and concurrent probes share one round of checks until the result is stale"""
+        database = Dependency(delay=0.05)
+        monitor = HealthMonitor(interval=60, stale_after=0.2)
+        monitor.register("database", database)
+
+        results = await asyncio.gather(*(monitor.current() for _ in range(50)))
+        for _ in range(100):
+            await monitor.current()
+        calls_while_fresh = database.calls
+
+        await asyncio.sleep(0.25)
+        await monitor.current()
+
+        assert calls_while_fresh == 1
+        assert database.calls == 2
+        assert all(result == results[0] for result in results)
+
+    @pytest.mark.asyncio
+    async def test_failing_backend_only_degrades(self):
+        """Non-critical downstream checks report degraded with a 200"""
+        monitor = HealthMonitor(interval=60, stale_after=60)
+        monitor.register("database", Dependency())
+        monitor.register("trading_service", Dependency(error=RuntimeError("trading_service returned 502")),
+                         critical=False)
+
+        status_code, body = await monitor.current()
+
+        assert status_code == 200
+        assert json.loads(body)["status"] == "degraded"
+        assert json.loads(body)["errors"] == {"trading_service": "trading_service returned 502"}
+
+    @pytest.mark.asyncio
+    async def test_background_refresh(self):
+        """The background task keeps the snapshot current without probes waiting on checks"""
+        cache = Dependency()
+        monitor = HealthMonitor(interval=0.05, stale_after=60)
+        monitor.register("cache", cache)
+
+        await monitor.start()
+        await asyncio.sleep(0.01)
+        assert json.loads((await monitor.current())[1])["status"] == "healthy"
+
+        cache.error = ConnectionError("redis down")
+        await asyncio.sleep(0.1)
+        status_code, body = await monitor.current()
+        await monitor.stop()
+
+        assert status_code == 503 and json.loads(body)["errors"]["cache"] == "redis down"
+        assert cache.calls >= 2
@@ -0,0 +1,148 @@
+import pytest
+import time
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from prometheus_client import REGISTRY
+
+# Import the gateway middleware
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from middleware import LoggingMiddleware, MetricsMiddleware, UNMATCHED_ROUTE
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def make_app():
+    app = FastAPI()
+    in_flight = []
+
+    @app.get("/api/v1/metrics-test/orders/{order_id}")
+    async def get_order(order_id: str):
+        in_flight.append(sample("api_requests_in_flight", method="GET"))
+        return {"id": order_id}
+
+    @app.post("/api/v1/metrics-test/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.get("/api/v1/{service}/{path:path}")
+    async def proxy(service: str, path: str):
+        if service != "metrics-upstream":
+            raise HTTPException(status_code=404, detail="Not found")
+        return {}
+
+    app.add_middleware(MetricsMiddleware)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway")
+    return client, in_flight
+
+
+class TestMetricsMiddleware:
+    """Test suite for the gateway per-route metrics middleware"""
+
+    @pytest.mark.asyncio
+    async def test_requests_are_labelled_by_route_template(self):
+        """Raw paths collapse to their template; only known services are expanded"""
+        order_route = "/api/v1/metrics-test/orders/{order_id}"
+        before = sample("api_requests_total", method="GET", endpoint=order_route, status="200")
+        unmatched = sample("api_requests_total", method="GET", endpoint=UNMATCHED_ROUTE, status="404")
+        client, in_flight = make_app()
+
+        async with client:
+            for order_id in ("1", "2", "3"):
+                await client.get(f"/api/v1/metrics-test/orders/{order_id}")
+            await client.get("/api/v1/metrics-upstream/accounts/42")
+            await client.get("/api/v1/random-scan-123/anything")
+            await client.get("/wp-login.php")
+
+        assert sample("api_requests_total", method="GET", endpoint=order_route, status="200") == before + 3
+        assert sample("api_request_duration_seconds_count", method="GET", endpoint=order_route) >= 3
+        assert sample(
+            "api_requests_total", method="GET", endpoint="/api/v1/metrics-upstream/{path:path}", status="200"
+        ) >= 1
+        assert sample(
+            "api_requests_total", method="GET", endpoint="/api/v1/{service}/{path:path}", status="404"
+        ) >= 1
+        assert sample("api_requests_total", method="GET", endpoint=UNMATCHED_ROUTE, status="404") == unmatched + 1
+        assert in_flight == [1.0, 1.0, 1.0]
+        assert sample("api_requests_in_flight", method="GET") == 0
+
+    @pytest.mark.asyncio
+    async def test_request_and_response_sizes(self):
+        """Body sizes are recorded with and without a Content-Length header"""
+        route = "/api/v1/metrics-test/echo"
+        request_before = sample("api_request_size_bytes_sum", method="POST", endpoint=route)
+        response_before = sample("api_response_size_bytes_sum", method="POST", endpoint=route)
+        client, _ = make_app()
+
+        async def chunks():
+            yield b"a" * 300
+            yield b"b" * 200
+
+        async with client:
+            sized = await client.post(route, content=b"x" * 1000)
+            streamed = await client.post(route, content=chunks())
+
+        assert sized.json() == {"size": 1000} and streamed.json() == {"size": 500}
+        assert sample("api_request_size_bytes_sum", method="POST", endpoint=route) == request_before + 1500
+        assert sample("api_response_size_bytes_sum", method="POST", endpoint=route) == (
+            response_before + len(sized.content) + len(streamed.content)
+        )
+
+    @pytest.mark.asyncio
+    async def test_recording_overhead_is_small(self):
+        """Recording adds only microseconds to a request"""
+        async def endpoint(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        route = "/api/v1/metrics-test/overhead"
+        endpoint_app = SimpleNamespace(routes=[SimpleNamespace(endpoint=endpoint, path=route)])
+        middleware = MetricsMiddleware(endpoint)
+        scope = {"type": "http", "method": "GET", "headers": [], "app": endpoint_app, "endpoint": endpoint}
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        async def timed(app, n=2000):
+            start = time.perf_counter()
+            for _ in range(n):
+                await app(scope, receive, send)
+            return (time.perf_counter() - start) / n
+
+        bare = await timed(endpoint)
+        measured = await timed(middleware)
+
+        assert sample("api_requests_total", method="GET", endpoint=route, status="200") == 2000
+        assert measured - bare < 50e-6
+
+
+class TestLoggingMiddleware:
+    """Test suite for gateway request IDs and access logging"""
+
+    @pytest.mark.asyncio
+    async def test_request_id_is_kept_or_generated(self):
+        """Handlers and responses see the caller's request ID, or a generated one"""
+        app = FastAPI()
+
+        @app.get("/api/v1/logging-test")
+        async def echo(request: Request):
+            return {"request_id": request.headers.get("x-request-id")}
+
+        app.add_middleware(LoggingMiddleware)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            given = await client.get("/api/v1/logging-test", headers={"X-Request-ID": "req-1"})
+            generated = await client.get("/api/v1/logging-test")
+
+        assert given.headers["x-request-id"] == given.json()["request_id"] == "req-1"
+        assert generated.headers["x-request-id"] == generated.json()["request_id"]
+        assert len(generated.headers["x-request-id"]) == 32
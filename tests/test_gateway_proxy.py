@@ -0,0 +1,127 @@
+import pytest
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from prometheus_client import REGISTRY
+
+# Import the gateway proxy
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from proxy import ReverseProxy
+
+backend = FastAPI()
+
+
+@backend.api_route("/echo/{item}", methods=["GET", "POST"])
+async def echo(item: str, request: Request):
+    body = await request.body()
+    response = Response(content=body, media_type="application/octet-stream")
+    response.headers["x-item"] = item
+    response.headers["x-query"] = request.url.query
+    response.headers["x-saw-connection-token"] = str("x-secret" in request.headers)
+    response.headers["x-forwarded-for"] = request.headers.get("x-forwarded-for", "")
+    response.headers["x-chunked"] = str("transfer-encoding" in request.headers)
+    response.set_cookie("a", "1")
+    response.set_cookie("b", "2")
+    return response
+
+
+def make_gateway(proxy: ReverseProxy) -> FastAPI:
+    gateway = FastAPI()
+
+    @gateway.api_route("/api/v1/{service}/{path:path}", methods=["GET", "POST"])
+    async def forward(service: str, path: str, request: Request):
+        return await proxy.forward(request, service, path)
+
+    return gateway
+
+
+def gateway_client(proxy: ReverseProxy) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=make_gateway(proxy)), base_url="http://gateway")
+
+
+class TestReverseProxy:
+    """Test suite for the gateway reverse proxy"""
+
+    @pytest.mark.asyncio
+    async def test_forwards_path_query_and_body(self):
+        """Method, path, query and body reach the upstream; the response streams back"""
+        proxy = ReverseProxy(upstreams={})
+        proxy.add_upstream("backend", "http://backend", transport=httpx.ASGITransport(app=backend))
+
+        async with gateway_client(proxy) as client:
+            payload = os.urandom(256 * 1024)
+            response = await client.post("/api/v1/backend/echo/orders?limit=5&cursor=a%2Bb", content=payload)
+            empty = await client.get("/api/v1/backend/echo/orders")
+        await proxy.close()
+
+        assert response.status_code == 200
+        assert response.content == payload
+        assert response.headers["x-item"] == "orders"
+        assert response.headers["x-query"] == "limit=5&cursor=a%2Bb"
+        assert empty.headers["x-chunked"] == "False"
+
+    @pytest.mark.asyncio
+    async def test_strips_hop_by_hop_headers(self):
+        """Connection-scoped headers are dropped and repeated response headers kept"""
+        proxy = ReverseProxy(upstreams={})
+        proxy.add_upstream("backend", "http://backend", transport=httpx.ASGITransport(app=backend))
+
+        async with gateway_client(proxy) as client:
+            response = await client.get(
+                "/api/v1/backend/echo/x",
+                headers={"Connection": "keep-alive, X-Secret", "X-Secret": "1", "X-Forwarded-For": "10.0.0.1"}
+            )
+        await proxy.close()
+
+        assert response.headers["x-saw-connection-token"] == "False"
+        assert response.headers["x-forwarded-for"].startswith("10.0.0.1, ")
+        assert len(response.headers.get_list("set-cookie")) == 2
+
+    @pytest.mark.asyncio
+    async def test_upstream_failures_map_to_gateway_errors(self):
+        """Timeouts become 504 and connection failures 502"""
+        def timeout_handler(request):
+            raise httpx.ReadTimeout("slow upstream", request=request)
+
+        def refused_handler(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        proxy = ReverseProxy(upstreams={})
+        proxy.add_upstream("slow", "http://slow", transport=httpx.MockTransport(timeout_handler))
+        proxy.add_upstream("down", "http://down", transport=httpx.MockTransport(refused_handler))
+
+        async with gateway_client(proxy) as client:
+            slow = await client.get("/api/v1/slow/anything")
+            down = await client.get("/api/v1/down/anything")
+            unknown = await client.get("/api/v1/missing/anything")
+        await proxy.close()
+
+        assert slow.status_code == 504
+        assert down.status_code == 502
+        assert unknown.status_code == 502
+        assert REGISTRY.get_sample_value(
+            "gateway_upstream_requests_total", {"upstream": "slow", "status": "timeout"}
+        ) >= 1
+        assert REGISTRY.get_sample_value("gateway_upstream_latency_seconds_count", {"upstream": "down"}) >= 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_client(self):
+        """Many concurrent requests are served through one pooled client per upstream"""
+        proxy = ReverseProxy(upstreams={})
+        proxy.add_upstream("backend", "http://backend", transport=httpx.ASGITransport(app=backend))
+        client_before = proxy.clients["backend"]
+
+        async with gateway_client(proxy) as client:
+            responses = await asyncio.gather(
+                *(client.get(f"/api/v1/backend/echo/{i}") for i in range(50))
+            )
+        await proxy.close()
+
+        assert [r.headers["x-item"] for r in responses] == [str(i) for i in range(50)]
+        assert proxy.clients == {} and client_before.is_closed
@@ -0,0 +1,166 @@
+import pytest
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Request
+from prometheus_client import REGISTRY
+
+# Import the gateway proxy and resilience layer
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from proxy import ReverseProxy
+from resilience import BreakerState, CircuitBreaker, UpstreamGuard
+
+
+class SlowBody(httpx.AsyncByteStream):
+    """Response body streamed in chunks with a pause before each"""
+
+    def __init__(self, chunks, pause):
+        self.chunks = chunks
+        self.pause = pause
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.pause)
+            yield chunk
+
+
+class Upstream:
+    """Mock upstream whose status and latency can change between calls"""
+
+    def __init__(self, status=200, delays=()):
+        self.status = status
+        self.delays = list(delays)
+        self.calls = 0
+        self.timeouts = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.timeouts.append(request.extensions["timeout"]["read"])
+        delay = self.delays.pop(0) if self.delays else 0
+        if delay:
+            await asyncio.sleep(delay)
+        if request.url.path.endswith("/stream"):
+            return httpx.Response(self.status, stream=SlowBody([b"a", b"b", b"c"], pause=0.1))
+        return httpx.Response(self.status, stream=httpx.ByteStream(f"call {self.calls}".encode()))
+
+
+def make_gateway(upstream: Upstream, guard: UpstreamGuard):
+    proxy = ReverseProxy(upstreams={})
+    proxy.add_upstream(guard.name, "http://backend", transport=httpx.MockTransport(upstream))
+    proxy.guards[guard.name] = guard
+    gateway = FastAPI()
+
+    @gateway.api_route("/api/v1/{service}/{path:path}", methods=["GET", "POST"])
+    async def forward(service: str, path: str, request: Request):
+        return await proxy.forward(request, service, path)
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=gateway), base_url="http://gateway")
+    return client, proxy
+
+
+class TestUpstreamResilience:
+    """Test suite for gateway circuit breakers, timeouts, hedging and bulkheads"""
+
+    @pytest.mark.asyncio
+    async def test_breaker_opens_and_recovers(self):
+        """Failures open the breaker, open breakers fail fast, a good probe closes it"""
+        upstream = Upstream(status=503)
+        breaker = CircuitBreaker("flaky", failure_ratio=0.5, min_calls=4, window=4, open_seconds=0.1)
+        client, proxy = make_gateway(upstream, UpstreamGuard("flaky", 5.0, breaker=breaker))
+
+        async with client:
+            failures = [await client.post("/api/v1/flaky/orders") for _ in range(4)]
+            rejected = await client.post("/api/v1/flaky/orders")
+            calls_while_open = upstream.calls
+
+            await asyncio.sleep(0.12)
+            upstream.status = 200
+            probe = await client.post("/api/v1/flaky/orders")
+        await proxy.close()
+
+        assert [r.status_code for r in failures] == [503] * 4
+        assert rejected.status_code == 503 and "retry-after" in rejected.headers
+        assert calls_while_open == 4
+        assert probe.status_code == 200 and breaker.state == BreakerState.CLOSED
+        assert REGISTRY.get_sample_value(
+            "gateway_circuit_breaker_transitions_total", {"upstream": "flaky", "state": "open"}
+        ) >= 1
+        assert REGISTRY.get_sample_value("gateway_circuit_breaker_state", {"upstream": "flaky"}) == 0
+
+    def test_half_open_allows_one_probe(self):
+        """Only one request probes a half-open breaker; a failed probe reopens it"""
+        breaker = CircuitBreaker("probe", failure_ratio=0.5, min_calls=2, window=2, open_seconds=0.0)
+        breaker.record(False)
+        breaker.record(False)
+        assert breaker.state == BreakerState.OPEN
+
+        assert breaker.allow() and breaker.state == BreakerState.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record(False)
+        assert breaker.state == BreakerState.OPEN
+
+        # A probe that ends without an outcome frees the slot for the next one
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    @pytest.mark.asyncio
+    async def test_adaptive_timeout_follows_latency(self, monkeypatch):
+        """The timeout tracks observed p99 for headers; bodies keep the static read timeout"""
+        monkeypatch.setattr("shared.config.settings.gateway_adaptive_timeout_min", 0.05)
+        monkeypatch.setattr("shared.config.settings.gateway_hedge_enabled", False)
+        upstream = Upstream()
+        guard = UpstreamGuard("adaptive", 30.0)
+        client, proxy = make_gateway(upstream, guard)
+
+        async with client:
+            for _ in range(30):
+                await client.get("/api/v1/adaptive/quotes")
+            adaptive = guard.timeout()
+            # Streams for longer than the adaptive timeout once headers are in
+            streamed = await client.get("/api/v1/adaptive/stream")
+            upstream.delays = [adaptive + 0.2]
+            slow_headers = await client.get("/api/v1/adaptive/quotes")
+        await proxy.close()
+
+        assert 0.05 <= adaptive < 0.3
+        assert streamed.status_code == 200 and streamed.content == b"abc"
+        assert slow_headers.status_code == 504
+        assert set(upstream.timeouts) == {30.0}
+        assert REGISTRY.get_sample_value("gateway_upstream_timeout_seconds", {"upstream": "adaptive"}) < 1.0
+
+    @pytest.mark.asyncio
+    async def test_slow_get_is_hedged(self):
+        """A GET stuck past the hedge percentile is answered by a second attempt"""
+        upstream = Upstream(delays=[0.5])
+        guard = UpstreamGuard("hedged", 5.0)
+        for _ in range(20):
+            guard.latency.observe(0.01)
+        client, proxy = make_gateway(upstream, guard)
+
+        async with client:
+            response = await client.get("/api/v1/hedged/quotes")
+            post = await client.post("/api/v1/hedged/orders")
+        await proxy.close()
+
+        assert response.status_code == 200 and response.content == b"call 2"
+        assert guard.hedges == 1 and post.content == b"call 3"
+        assert REGISTRY.get_sample_value("gateway_hedged_requests_total", {"upstream": "hedged", "winner": "hedge"}) >= 1
+
+    @pytest.mark.asyncio
+    async def test_bulkhead_sheds_excess_concurrency(self):
+        """Calls beyond the bulkhead wait briefly, then get 503 without reaching the upstream"""
+        upstream = Upstream(delays=[0.2] * 10)
+        guard = UpstreamGuard("bulkhead", 5.0, max_concurrent=2, queue_timeout=0.05)
+        client, proxy = make_gateway(upstream, guard)
+
+        async with client:
+            responses = await asyncio.gather(*(client.post("/api/v1/bulkhead/orders") for _ in range(5)))
+        await proxy.close()
+
+        assert sorted(r.status_code for r in responses) == [200, 200, 503, 503, 503]
+        assert upstream.calls == 2
@@ -0,0 +1,372 @@
+import pytest
+import asyncio
+import time
+
+# Import the shared messaging layer
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.config import settings
+from shared.messaging import (
+    InMemoryBroker, HybridMessagingManager, BatchingPublisher, ATTEMPTS_HEADER, BATCH_HEADER, EVENT_REGISTRY, Priority,
+    compile_event_registry, get_event_route, topic_matches
+)
+from shared.serialization import JSON_CONTENT_TYPE
+
+
+class TestTopicRouting:
+    """Test suite for AMQP topic pattern matching"""
+
+    def test_topic_wildcards(self):
+        """'*' matches one word and '#' matches zero or more"""
+        assert topic_matches("order.*", "order.created")
+        assert not topic_matches("order.*", "order.created.eu")
+        assert topic_matches("trading.#", "trading")
+        assert topic_matches("trading.#", "trading.order.filled")
+        assert topic_matches("#.filled", "order.filled")
+        assert topic_matches("a.#.b", "a.b")
+        assert topic_matches("a.#.b", "a.x.y.b")
+        assert not topic_matches("order.created", "order.cancelled")
+
+
+class TestInMemoryBroker:
+    """Test suite for the in-process broker"""
+
+    @pytest.mark.asyncio
+    async def test_routes_like_declared_topology(self):
+        """Topic and fanout exchanges route to their bound queues"""
+        broker = InMemoryBroker()
+        await broker.connect()
+
+        assert await broker.publish("trading.events", "order.created", {"order_id": "o-1"})
+        assert await broker.publish("notifications", "anything", {"user_id": "u-1"})
+        assert await broker.publish("trading.events", "market.data", {"symbol": "AAPL"})
+
+        assert broker.get_messages("trading.orders") == [{"order_id": "o-1"}]
+        assert broker.get_messages("notifications.email") == [{"user_id": "u-1"}]
+        assert broker.get_queue_depth("notifications.push") == 1
+        assert broker.get_queue_depth("trading.positions") == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_exchange_fails_publish(self):
+        """Publishing to an undeclared exchange reports failure"""
+        broker = InMemoryBroker()
+        await broker.connect()
+
+        assert not await broker.publish("missing.exchange", "order.created", {})
+
+    @pytest.mark.asyncio
+    async def test_failed_messages_are_retried_then_dead_lettered(self, monkeypatch):
+        """Subscriber failures go through the retry tiers before the dead letter queue"""
+        monkeypatch.setattr(settings, "retry_delays_ms", [10, 20])
+        monkeypatch.setattr(settings, "max_delivery_attempts", 3)
+        broker = InMemoryBroker()
+        await broker.connect()
+        handled = []
+
+        async def handler(message):
+            handled.append(message["order_id"])
+            if message["order_id"] == "bad":
+                raise ValueError("cannot process")
+
+        await broker.subscribe("trading.orders", handler)
+        for order_id in ("o-1", "bad", "o-2"):
+            await broker.publish("trading.events", "order.created", {"order_id": order_id})
+
+        await asyncio.sleep(0.15)
+        dead_letter = await broker.get_message("trading.orders.dead")
+        await broker.close()
+
+        assert handled.count("bad") == 3
+        assert [order_id for order_id in handled if order_id != "bad"] == ["o-1", "o-2"]
+        assert dead_letter.headers[ATTEMPTS_HEADER] == 2
+
+    @pytest.mark.asyncio
+    async def test_message_ttl_uses_one_timer_per_queue(self):
+        """Unconsumed messages expire to the dead letter queue without a timer each"""
+        broker = InMemoryBroker()
+        await broker.connect()
+        loop = asyncio.get_running_loop()
+        timers = len(loop._scheduled)
+
+        for order_id in range(1000):
+            await broker.publish("trading.events", "order.created", {"order_id": order_id})
+        assert len(loop._scheduled) - timers <= 1
+
+        queue = broker.declare_queue("ttl.test", {
+            "x-dead-letter-exchange": "", "x-dead-letter-routing-key": "ttl.test.expired", "x-message-ttl": 30
+        })
+        broker.declare_queue("ttl.test.expired")
+        for seq in range(3):
+            queue.put(str(seq).encode(), {}, {})
+            await asyncio.sleep(0.01)
+
+        await asyncio.sleep(0.05)
+        assert broker.get_queue_depth("ttl.test") == 0
+        assert broker.get_queue_depth("ttl.test.expired") == 3
+        assert queue._expiry_timer is None
+
+    @pytest.mark.asyncio
+    async def test_hybrid_manager_consumes_in_memory(self):
+        """The concurrent consumer runtime works unchanged over the in-memory broker"""
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        received = []
+
+        async def handler(message):
+            received.append(message["data"]["order_id"])
+
+        await manager.consume_messages("trading.orders", handler, concurrency=4)
+        for i in range(100):
+            await manager.publish_event("order_created", {"order_id": i}, use_aws=True)
+
+        for _ in range(100):
+            if len(received) == 100:
+                break
+            await asyncio.sleep(0.01)
+        stats = manager.get_consumer_stats()
+        await manager.close()
+
+        assert sorted(received) == list(range(100))
+        assert stats["trading.orders"]["processed"] == 100
+        assert manager.rabbitmq.get_queue_depth("trading.orders") == 0
+
+    @pytest.mark.asyncio
+    async def test_pipeline_throughput(self):
+        """Benchmark order -> fill -> notification over the in-memory broker"""
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        num_orders = 5000
+        done = asyncio.Event()
+        notified = 0
+
+        async def on_order(message):
+            await manager.publish_message(
+                "trading.events", "position.filled", {"order_id": message["order_id"]}
+            )
+
+        async def on_fill(message):
+            await manager.publish_message(
+                "notifications", "", {"order_id": message["order_id"]}
+            )
+
+        async def on_notification(message):
+            nonlocal notified
+            notified += 1
+            if notified == num_orders:
+                done.set()
+
+        await manager.consume_messages("trading.orders", on_order, concurrency=10)
+        await manager.consume_messages("trading.positions", on_fill, concurrency=10)
+        await manager.consume_messages("notifications.email", on_notification, concurrency=10)
+
+        start_time = time.perf_counter()
+        await manager.publish_messages(
+            "trading.events",
+            [("order.created", {"order_id": i}) for i in range(num_orders)]
+        )
+        await asyncio.wait_for(done.wait(), timeout=30)
+        elapsed = time.perf_counter() - start_time
+        await manager.close()
+
+        throughput = num_orders / elapsed
+        print(f"Pipeline throughput: {throughput:.2f} orders/second")
+
+        assert notified == num_orders
+
+
+class TestBatchingPublisher:
+    """Test suite for micro-batched publishing"""
+
+    @pytest.mark.asyncio
+    async def test_publishes_coalesce_into_envelopes(self):
+        """Concurrent publishes to one routing key share an envelope"""
+        broker = InMemoryBroker()
+        await broker.connect()
+        publisher = BatchingPublisher(broker, max_batch_size=10, max_delay=0.01)
+
+        results = await asyncio.gather(
+            *(publisher.publish("trading.events", "order.executed", {"n": i}) for i in range(25))
+        )
+
+        assert all(results)
+        assert broker.get_queue_depth("trading.orders") == 3
+        assert broker.get_messages("trading.orders") == [{"n": i} for i in range(25)]
+        assert publisher.get_stats()["trading.events/order.executed"]["batches"] == 3
+
+    @pytest.mark.asyncio
+    async def test_consumer_unbatches_envelopes(self):
+        """Consumers receive the individual messages of an envelope in order"""
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        received = []
+
+        async def handler(message):
+            received.append(message["n"])
+
+        await manager.consume_messages("trading.orders", handler, concurrency=1)
+        await asyncio.gather(
+            *(manager.publish_batched("trading.events", "order.executed", {"n": i}) for i in range(50))
+        )
+
+        for _ in range(100):
+            if len(received) == 50:
+                break
+            await asyncio.sleep(0.01)
+        await manager.close()
+
+        assert received == list(range(50))
+
+    @pytest.mark.asyncio
+    async def test_unenveloped_mode_publishes_individually(self):
+        """Without envelopes each message is its own broker message"""
+        broker = InMemoryBroker()
+        await broker.connect()
+        publisher = BatchingPublisher(broker, max_batch_size=10, max_delay=0.01, envelope=False)
+
+        await asyncio.gather(*(publisher.publish("trading.events", "order.executed", {"n": i}) for i in range(5)))
+
+        assert broker.get_queue_depth("trading.orders") == 5
+        queued = broker.get_queue("trading.orders").get_nowait()
+        assert BATCH_HEADER not in queued[1]
+
+    @pytest.mark.asyncio
+    async def test_batched_publish_throughput(self):
+        """Benchmark batched against per-message publishing"""
+        num_messages = 5000
+        results = {}
+
+        for mode in ("single", "batched"):
+            manager = HybridMessagingManager(broker="memory")
+            await manager.initialize()
+            publish = manager.publish_message if mode == "single" else manager.publish_batched
+
+            start_time = time.perf_counter()
+            await asyncio.gather(
+                *(publish("trading.events", "order.executed", {"order_id": i}) for i in range(num_messages))
+            )
+            elapsed = time.perf_counter() - start_time
+            results[mode] = manager.rabbitmq.get_queue_depth("trading.orders")
+            await manager.close()
+
+            print(f"{mode}: {num_messages / elapsed:.0f} messages/second, {results[mode]} broker messages")
+
+        assert results["batched"] < results["single"]
+
+
+class TestPriorityLanes:
+    """Test suite for priority queues"""
+
+    @pytest.mark.asyncio
+    async def test_priority_queue_orders_by_priority(self):
+        """Higher priorities are delivered first, FIFO within a priority"""
+        broker = InMemoryBroker()
+        await broker.connect()
+
+        await broker.publish("notifications", "", {"n": 1}, priority=Priority.LOW)
+        await broker.publish("notifications", "", {"n": 2})
+        await broker.publish("notifications", "", {"n": 3}, priority=Priority.URGENT)
+        await broker.publish("notifications", "", {"n": 4}, priority=Priority.LOW)
+        await broker.publish("notifications", "", {"n": 5}, priority=Priority.URGENT)
+
+        messages = broker.get_messages("notifications.email")
+        assert [m["n"] for m in messages] == [3, 5, 2, 1, 4]
+
+    @pytest.mark.asyncio
+    async def test_urgent_message_overtakes_bulk_backlog(self):
+        """An urgent notification is handled ahead of a queued campaign"""
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        handled = []
+
+        for i in range(200):
+            await manager.publish_message("notifications", "", {"kind": "campaign", "n": i}, priority=Priority.LOW)
+        await manager.publish_message("notifications", "", {"kind": "margin_call"}, priority=Priority.URGENT)
+
+        async def handler(message):
+            handled.append(message["kind"])
+            await asyncio.sleep(0)
+
+        await manager.consume_messages("notifications.email", handler, concurrency=2)
+        for _ in range(200):
+            if len(handled) == 201:
+                break
+            await asyncio.sleep(0.01)
+        stats = manager.get_consumer_stats()["notifications.email"]
+        await manager.close()
+
+        assert handled.index("margin_call") == 0
+        latency = stats["delivery_latency_ms"]
+        assert latency["urgent"]["count"] == 1
+        assert latency["low"]["count"] == 200
+        print(f"Delivery latency: urgent {latency['urgent']['avg']:.2f}ms, low {latency['low']['avg']:.2f}ms")
+        assert latency["urgent"]["avg"] < latency["low"]["avg"]
+
+    @pytest.mark.asyncio
+    async def test_batches_are_split_by_priority(self):
+        """Urgent messages never share an envelope with normal traffic"""
+        broker = InMemoryBroker()
+        await broker.connect()
+        publisher = BatchingPublisher(broker, max_batch_size=10, max_delay=0.01)
+
+        await asyncio.gather(
+            publisher.publish("trading.events", "order.created", {"n": 1}),
+            publisher.publish("trading.events", "order.created", {"n": 2}, Priority.URGENT),
+            publisher.publish("trading.events", "order.created", {"n": 3})
+        )
+
+        assert broker.get_queue_depth("trading.orders") == 2
+        assert broker.get_messages("trading.orders") == [{"n": 2}, {"n": 1}, {"n": 3}]
+        assert set(publisher.get_stats()) == {"trading.events/order.created", "trading.events/order.created@urgent"}
+
+
+class TestEventRegistry:
+    """Test suite for the precompiled event routing table"""
+
+    def test_registered_events_reach_queues(self):
+        """Every registered event is routed to at least one declared queue"""
+        assert get_event_route("order_executed").queues == ("trading.orders",)
+        assert get_event_route("document_uploaded").queues == ("document.processing",)
+        assert get_event_route("margin_call").priority == Priority.URGENT
+        assert all(route.queues for route in EVENT_REGISTRY.values())
+
+        with pytest.raises(KeyError):
+            get_event_route("order_teleported")
+
+    def test_invalid_routes_fail_compilation(self):
+        """Undeclared exchanges and unbound routing keys are rejected"""
+        with pytest.raises(ValueError, match="exchange 'documents' is not declared"):
+            compile_event_registry({"document_uploaded": ("documents", "process.document", None, None)})
+
+        with pytest.raises(ValueError, match="no queue bound"):
+            compile_event_registry({"payment_made": ("payment.events", "payment.made", None, None)})
+
+    @pytest.mark.asyncio
+    async def test_dispatch_applies_registered_codec_and_priority(self, monkeypatch):
+        """Dispatch publishes with the route's serializer and default priority"""
+        definitions = {"margin_call": ("notifications", "margin.call", "json", Priority.URGENT)}
+        monkeypatch.setitem(EVENT_REGISTRY, "margin_call", compile_event_registry(definitions)["margin_call"])
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+
+        await manager.dispatch("margin_call", {"account_id": "a-1"})
+        await manager.dispatch("user_notification", {"n": 1})
+
+        first = manager.rabbitmq.get_queue("notifications.push").get_nowait()
+        assert first[2]["content_type"] == JSON_CONTENT_TYPE
+        assert first[2]["priority"] == Priority.URGENT
+        assert manager.rabbitmq.get_messages("notifications.push") == [{"n": 1}]
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_route_cache_invalidated_by_new_bindings(self):
+        """Cached topic matches pick up bindings declared later"""
+        broker = InMemoryBroker()
+        await broker.connect()
+
+        assert broker.route("trading.events", "order.created", b"{}", {}, {}) == 1
+        broker.declare_queue("audit")
+        broker.bind("audit", "trading.events", "#")
+
+        assert broker.route("trading.events", "order.created", b"{}", {}, {}) == 2
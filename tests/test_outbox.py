@@ -0,0 +1,212 @@
+import pytest
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+# Import the shared outbox
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.outbox import OutboxRelay, enqueue_outbox
+from shared.messaging import HybridMessagingManager, Priority, get_event_route
+
+
+class FakeOutboxConnection:
+    """asyncpg-style connection backed by an in-memory outbox table"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        if "INSERT INTO message_outbox" in query:
+            self.db.next_id += 1
+            aggregate_type, aggregate_id, exchange, routing_key, event_type, payload = args
+            self.db.rows.append({
+                "id": self.db.next_id, "aggregate_type": aggregate_type, "aggregate_id": aggregate_id,
+                "exchange": exchange, "routing_key": routing_key, "event_type": event_type, "payload": payload
+            })
+        elif "DELETE FROM message_outbox" in query:
+            ids = set(args[0])
+            self.db.rows = [row for row in self.db.rows if row["id"] not in ids]
+        elif "SET claimed_until = NULL" in query:
+            for row in self.db.rows:
+                if row["id"] in args[0]:
+                    row["claimed"] = False
+
+    async def fetchval(self, query, *args):
+        return self.db.lock_available
+
+    async def fetch(self, query, limit, claim_timeout):
+        # Claim leases never expire here
+        held = {(row["aggregate_type"], row["aggregate_id"]) for row in self.db.rows if row.get("claimed")}
+        rows = [
+            row for row in sorted(self.db.rows, key=lambda row: row["id"])
+            if (row["aggregate_type"], row["aggregate_id"]) not in held
+        ][:limit]
+        for row in rows:
+            row["claimed"] = True
+        return rows
+
+
+class FakeOutboxDB:
+    def __init__(self):
+        self.rows = []
+        self.next_id = 0
+        self.lock_available = True
+        self.open_connections = 0
+
+    @asynccontextmanager
+    async def get_connection(self):
+        self.open_connections += 1
+        try:
+            yield FakeOutboxConnection(self)
+        finally:
+            self.open_connections -= 1
+
+
+class RecordingMessaging:
+    """Messaging stand-in that records publishes and can fail selected messages"""
+
+    def __init__(self, fail_sequences=(), db=None):
+        self.published = []
+        self.fail_sequences = set(fail_sequences)
+        self.db = db
+        self.connections_during_publish = []
+
+    async def dispatch_batched(self, event_type, message):
+        route = get_event_route(event_type)
+        return await self.publish_batched(route.exchange, route.routing_key, message)
+
+    async def publish_batched(self, exchange, routing_key, message):
+        if self.db is not None:
+            self.connections_during_publish.append(self.db.open_connections)
+        await asyncio.sleep(0)
+        if message["seq"] in self.fail_sequences:
+            return False
+        self.published.append((exchange, routing_key, message))
+        return True
+
+
+async def fill_outbox(db, events):
+    async with db.get_connection() as conn:
+        for aggregate_id, seq in events:
+            await enqueue_outbox(conn, "order", aggregate_id, "order_created", {"seq": seq})
+
+
+class TestOutboxRelay:
+    """Test suite for the transactional outbox relay"""
+
+    @pytest.mark.asyncio
+    async def test_drain_publishes_and_deletes(self):
+        """Published rows are removed from the outbox"""
+        db = FakeOutboxDB()
+        messaging = RecordingMessaging()
+        await fill_outbox(db, [("a", 1), ("b", 2), ("a", 3)])
+
+        relay = OutboxRelay(db.get_connection, messaging, batch_size=10)
+        assert await relay.drain_once() == 3
+        assert db.rows == []
+        sequences = [message["seq"] for _, _, message in messaging.published]
+        assert sorted(sequences) == [1, 2, 3]
+        assert sequences.index(1) < sequences.index(3)
+
+    @pytest.mark.asyncio
+    async def test_publishes_without_holding_a_connection(self):
+        """Claims commit before publishing; concurrent relays skip claimed aggregates"""
+        db = FakeOutboxDB()
+        first_messaging = RecordingMessaging(db=db)
+        await fill_outbox(db, [("a", 1), ("a", 2), ("b", 3)])
+
+        first = OutboxRelay(db.get_connection, first_messaging, batch_size=2)
+        second_messaging = RecordingMessaging()
+        second = OutboxRelay(db.get_connection, second_messaging, batch_size=10)
+        assert await asyncio.gather(first.drain_once(), second.drain_once()) == [2, 1]
+
+        assert first_messaging.connections_during_publish == [0, 0]
+        assert [message["seq"] for _, _, message in first_messaging.published] == [1, 2]
+        assert [message["seq"] for _, _, message in second_messaging.published] == [3]
+        assert db.rows == []
+
+    @pytest.mark.asyncio
+    async def test_failure_defers_rest_of_aggregate(self):
+        """A failed event holds back later events of the same aggregate only"""
+        db = FakeOutboxDB()
+        messaging = RecordingMessaging(fail_sequences={2})
+        await fill_outbox(db, [("a", 1), ("a", 2), ("a", 3), ("b", 4)])
+
+        relay = OutboxRelay(db.get_connection, messaging, batch_size=10)
+        assert await relay.drain_once() == 2
+
+        assert sorted(message["seq"] for _, _, message in messaging.published) == [1, 4]
+        assert [json.loads(row["payload"])["seq"] for row in db.rows] == [2, 3]
+
+        messaging.fail_sequences.clear()
+        await relay.drain_once()
+        assert [message["seq"] for _, _, message in messaging.published][-2:] == [2, 3]
+
+    @pytest.mark.asyncio
+    async def test_skips_when_another_relay_holds_lock(self):
+        """Only the relay holding the advisory lock drains"""
+        db = FakeOutboxDB()
+        db.lock_available = False
+        messaging = RecordingMessaging()
+        await fill_outbox(db, [("a", 1)])
+
+        relay = OutboxRelay(db.get_connection, messaging)
+        assert await relay.drain_once() == 0
+        assert len(db.rows) == 1
+
+    @pytest.mark.asyncio
+    async def test_relay_loop_delivers_to_broker(self):
+        """The background relay delivers committed events to consumers"""
+        db = FakeOutboxDB()
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        relay = OutboxRelay(db.get_connection, manager, poll_interval=1)
+        await relay.start()
+
+        async with db.get_connection() as conn:
+            await enqueue_outbox(
+                conn, "trading_account", "acct-1", "order_executed",
+                {"order_id": "o-1", "commission": Decimal("0.10")}
+            )
+        relay.wake()
+
+        for _ in range(100):
+            if manager.rabbitmq.get_queue_depth("trading.orders"):
+                break
+            await asyncio.sleep(0.01)
+
+        await relay.stop()
+        await manager.close()
+
+        assert manager.rabbitmq.get_messages("trading.orders") == [{"order_id": "o-1", "commission": "0.10"}]
+
+    @pytest.mark.asyncio
+    async def test_events_keep_their_registered_priority(self):
+        """Relayed events publish on their registry route; legacy rows keep their stored route"""
+        db = FakeOutboxDB()
+        manager = HybridMessagingManager(broker="memory")
+        await manager.initialize()
+        relay = OutboxRelay(db.get_connection, manager)
+
+        async with db.get_connection() as conn:
+            await enqueue_outbox(conn, "user", "u-1", "margin_call", {"user_id": "u-1"})
+        db.rows.append({
+            "id": 99, "aggregate_type": "order", "aggregate_id": "o-1", "exchange": "trading.events",
+            "routing_key": "order.created", "event_type": None, "payload": json.dumps({"order_id": "o-1"})
+        })
+
+        assert db.rows[0]["exchange"] == "notifications" and db.rows[0]["event_type"] == "margin_call"
+        assert await relay.drain_once() == 2
+        await manager.close()
+
+        urgent = await manager.rabbitmq.get_message("notifications.email")
+        assert urgent.priority == Priority.URGENT
+        assert manager.rabbitmq.get_messages("trading.orders") == [{"order_id": "o-1"}]
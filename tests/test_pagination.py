@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime
+
+# Import the shared pagination helpers
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.pagination import (
+    KeysetPaginator, InvalidCursorError, encode_cursor, decode_cursor,
+    clamp_page_size, MAX_PAGE_SIZE
+)
+
+
+class TestCursorEncoding:
+    """Test suite for opaque cursor encoding"""
+
+    def test_cursor_round_trip(self):
+        """Cursor decodes back to the original position"""
+        created_at = datetime(2024, 1, 15, 12, 30, 45, 123456)
+        cursor = encode_cursor(created_at, "3f2b8c1e-0000-4000-8000-000000000001")
+
+        assert decode_cursor(cursor) == (created_at, "3f2b8c1e-0000-4000-8000-000000000001")
+        assert "=" not in cursor
+
+    def test_invalid_cursor_rejected(self):
+        """Garbage cursors raise InvalidCursorError"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+
+    def test_page_size_clamped(self):
+        """Page size is clamped to the supported range"""
+        assert clamp_page_size(10) == 10
+        assert clamp_page_size(10_000) == MAX_PAGE_SIZE
+        assert clamp_page_size(0) > 0
+
+
+class TestKeysetPaginator:
+    """Test suite for keyset query building"""
+
+    def test_first_page_query(self):
+        """First page filters and fetches one look-ahead row"""
+        paginator = KeysetPaginator("documents")
+        query, params = paginator.build_query({"user_id": "user-1"}, limit=20)
+
+        assert "user_id = $1" in query
+        assert "ORDER BY created_at DESC, id DESC" in query
+        assert "OFFSET" not in query
+        assert params == ["user-1", 21]
+
+    def test_next_page_query_uses_row_comparison(self):
+        """Subsequent pages seek past the cursor position"""
+        paginator = KeysetPaginator("documents")
+        cursor = encode_cursor(datetime(2024, 1, 1), "doc-9")
+        query, params = paginator.build_query({"user_id": "user-1"}, cursor=cursor, limit=20)
+
+        assert "(created_at, id) < ($2, $3)" in query
+        assert params == ["user-1", datetime(2024, 1, 1), "doc-9", 21]
+
+    def test_paginate_emits_cursor_only_when_more_rows(self):
+        """Next cursor is produced from the last row of a full page"""
+        paginator = KeysetPaginator("documents")
+        rows = [{"id": f"doc-{i}", "created_at": datetime(2024, 1, 10 - i)} for i in range(3)]
+
+        items, next_cursor = paginator.paginate(rows, limit=2)
+        assert len(items) == 2
+        assert decode_cursor(next_cursor) == (datetime(2024, 1, 9), "doc-1")
+
+        items, next_cursor = paginator.paginate(rows, limit=5)
+        assert len(items) == 3
+        assert next_cursor is None
@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException
+
+# Import the user service password hasher
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'user-service'))
+
+bcrypt = pytest.importorskip("bcrypt")
+
+from passwords import PasswordHasher
+
+ROUNDS = 10  # ~50ms per hash keeps the suite quick while still dominating loop time
+
+
+class TestPasswordHasher:
+    """Test suite for bcrypt hashing in the user service thread pool"""
+
+    @pytest.mark.asyncio
+    async def test_hash_and_verify(self):
+        """Hashes use the configured cost and verify like plain bcrypt"""
+        hasher = PasswordHasher(workers=2, rounds=ROUNDS)
+        hashed = await hasher.hash("correct horse")
+        hasher.close()
+
+        assert hashed.startswith(f"$2b${ROUNDS}$")
+        assert bcrypt.checkpw(b"correct horse", hashed.encode())
+        verifier = PasswordHasher(workers=2, rounds=ROUNDS)
+        assert await verifier.verify("correct horse", hashed)
+        assert not await verifier.verify("wrong horse", hashed)
+        assert not verifier.needs_rehash(hashed)
+        assert PasswordHasher(rounds=12).needs_rehash(hashed)
+        verifier.close()
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running_while_hashing(self):
+        """Other coroutines make progress while logins hash"""
+        hasher = PasswordHasher(workers=2, rounds=ROUNDS)
+        hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=ROUNDS)).decode()
+        ticks = 0
+        done = False
+
+        async def ticker():
+            nonlocal ticks
+            while not done:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(hasher.verify("secret", hashed) for _ in range(6)))
+        elapsed = time.perf_counter() - start
+        done = True
+        await ticking
+        hasher.close()
+
+        assert all(results)
+        # The loop woke up roughly every 5ms for the whole time bcrypt was running
+        assert ticks >= elapsed / 0.005 * 0.5
+
+    @pytest.mark.asyncio
+    async def test_saturation_returns_429(self):
+        """Hashes beyond the workers plus queue are refused instead of queued"""
+        hasher = PasswordHasher(workers=1, max_queue=2, rounds=ROUNDS)
+        results = await asyncio.gather(*(hasher.hash("pw") for _ in range(5)), return_exceptions=True)
+        hasher.close()
+
+        rejected = [r for r in results if isinstance(r, HTTPException)]
+        assert len(rejected) == 2
+        assert rejected[0].status_code == 429 and rejected[0].headers == {"Retry-After": "1"}
+        assert sum(isinstance(r, str) for r in results) == 3
+
+    @pytest.mark.asyncio
+    async def test_login_throughput_benchmark(self):
+        """Concurrent login throughput with one hashing thread vs one per core"""
+        cores = os.cpu_count() or 1
+        hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=ROUNDS)).decode()
+        logins = max(8, cores * 4)
+        throughput = {}
+
+        for workers in sorted({1, cores}):
+            hasher = PasswordHasher(workers=workers, max_queue=logins, rounds=ROUNDS)
+            start = time.perf_counter()
+            assert all(await asyncio.gather(*(hasher.verify("secret", hashed) for _ in range(logins))))
+            throughput[workers] = logins / (time.perf_counter() - start)
+            hasher.close()
+            print(f"{workers} worker(s): {throughput[workers]:.1f} logins/s")
+
+        if cores >= 2:
+            assert throughput[cores] > throughput[1] * 1.5
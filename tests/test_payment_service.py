@@ -0,0 +1,73 @@
+import pytest
+import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
+
+# Import the payment service module
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+pytest.importorskip("stripe")
+pytest.importorskip("motor")
+
+from shared import database
+from shared.database import PostgreSQLPoolManager
+
+
+def load_payment_service():
+    spec = importlib.util.spec_from_file_location(
+        "payment_service_main", os.path.join(ROOT, "services", "payment-service", "main.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakePool:
+    def __init__(self):
+        self.acquired = 0
+        self.closed = False
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.acquired += 1
+        yield "connection"
+
+    async def close(self):
+        self.closed = True
+
+
+class TestPaymentService:
+    """Test suite for payment service wiring"""
+
+    def test_service_module_imports(self):
+        """The service imports and relays its outbox over the shared asyncpg pool"""
+        service = load_payment_service()
+
+        assert service.outbox_relay.connection_factory == database.postgresql_manager.get_connection
+        assert any(route.path == "/health" for route in service.app.routes)
+
+    @pytest.mark.asyncio
+    async def test_pool_manager_creates_one_pool(self, monkeypatch):
+        """Concurrent first uses share one pool; close releases it"""
+        pools = []
+
+        async def create_pool(dsn, **options):
+            await asyncio.sleep(0)
+            pools.append(FakePool())
+            return pools[-1]
+
+        monkeypatch.setattr(database.asyncpg, "create_pool", create_pool)
+        manager = PostgreSQLPoolManager()
+
+        async def borrow():
+            async with manager.get_connection() as conn:
+                return conn
+
+        assert await asyncio.gather(borrow(), borrow()) == ["connection", "connection"]
+        assert len(pools) == 1 and pools[0].acquired == 2
+
+        await manager.close()
+        assert pools[0].closed and manager.pool is None
@@ -0,0 +1,217 @@
+import pytest
+import asyncio
+import math
+import time
+
+import httpx
+import jwt
+from fastapi import FastAPI
+from redis.exceptions import ConnectionError as RedisConnectionError, NoScriptError
+
+# Import the rate limiter and gateway middleware
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'api-gateway'))
+
+from shared.config import settings
+from shared.rate_limit import RateLimiter, RateLimitPolicy, TOKEN_BUCKET_SHA
+from middleware import RateLimitMiddleware
+
+
+class LocalRedis:
+    """In-process Redis stand-in that runs the token bucket script's logic"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.buckets = {}
+        self.scripts = set()
+        self.calls = 0
+        self.available = True
+
+    async def script_load(self, script):
+        self.scripts.add(TOKEN_BUCKET_SHA)
+        return TOKEN_BUCKET_SHA
+
+    async def evalsha(self, sha, numkeys, key, capacity, rate, lease):
+        self.calls += 1
+        if not self.available:
+            raise RedisConnectionError("connection refused")
+        if sha not in self.scripts:
+            raise NoScriptError("NOSCRIPT")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        now = time.time()
+        tokens, ts = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate)
+
+        granted = 0
+        if tokens >= 1:
+            granted = 1
+            spare = math.floor(tokens - 1 - capacity / 2)
+            if spare > 0 and lease > 1:
+                granted += min(lease - 1, spare)
+            tokens -= granted
+
+        self.buckets[key] = (tokens, now)
+        retry_after = 0 if granted else math.ceil((1 - tokens) / rate * 1000)
+        return [granted, math.floor(tokens), retry_after]
+
+
+class TestRateLimiter:
+    """Test suite for the Redis token bucket limiter"""
+
+    @pytest.mark.asyncio
+    async def test_replicas_share_one_bucket(self):
+        """Two gateway replicas together never admit more than the bucket holds"""
+        redis = LocalRedis()
+        replicas = [RateLimiter(redis, lease_size=10), RateLimiter(redis, lease_size=10)]
+        policy = RateLimitPolicy("test", capacity=100, refill_rate=0.001)
+
+        results = [await replicas[i % 2].check("user:1", policy) for i in range(150)]
+
+        admitted = sum(result.allowed for result in results)
+        assert admitted <= 100
+        assert admitted >= 100 - 2 * 9  # at most one unused lease stranded per replica
+        assert not results[-1].allowed and results[-1].retry_after > 0
+
+    @pytest.mark.asyncio
+    async def test_leases_skip_redis_when_under_limit(self):
+        """Clients far from their limit are mostly admitted locally"""
+        redis = LocalRedis()
+        limiter = RateLimiter(redis, lease_size=10)
+        policy = RateLimitPolicy("test", capacity=1000, refill_rate=100)
+
+        for _ in range(100):
+            assert (await limiter.check("user:1", policy)).allowed
+
+        assert redis.calls <= 11  # one NOSCRIPT retry, then one call per lease
+        assert limiter.stats["local"] >= 90
+
+    @pytest.mark.asyncio
+    async def test_denials_are_cached_locally(self):
+        """A throttled client does not cost a Redis round trip per request"""
+        redis = LocalRedis()
+        limiter = RateLimiter(redis, lease_size=1)
+        policy = RateLimitPolicy("test", capacity=2, refill_rate=0.1)
+
+        results = [await limiter.check("ip:1", policy) for _ in range(10)]
+        calls_after = redis.calls
+
+        assert [result.allowed for result in results] == [True, True] + [False] * 8
+        assert calls_after == 4  # NOSCRIPT retry, two grants, one denial
+        assert results[-1].remaining == 0
+
+    @pytest.mark.asyncio
+    async def test_fails_open_when_redis_unavailable(self):
+        """Redis errors allow the request instead of failing the API"""
+        redis = LocalRedis()
+        redis.available = False
+        limiter = RateLimiter(redis)
+
+        result = await limiter.check("user:1", RateLimitPolicy("test", 5, 1))
+
+        assert result.allowed
+        assert limiter.stats["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_overhead_benchmark(self):
+        """Per-request limiter overhead with and without leases, with a simulated 200us Redis round trip"""
+        num_checks = 2000
+        policy = RateLimitPolicy("bench", capacity=10_000_000, refill_rate=1_000_000)
+
+        leased = RateLimiter(LocalRedis(latency=0.0002), lease_size=50)
+        start_time = time.perf_counter()
+        for _ in range(num_checks):
+            await leased.check("user:1", policy)
+        leased_us = (time.perf_counter() - start_time) / num_checks * 1e6
+
+        unleased = RateLimiter(LocalRedis(latency=0.0002), lease_size=1)
+        start_time = time.perf_counter()
+        for _ in range(num_checks):
+            await unleased.check("user:1", policy)
+        unleased_us = (time.perf_counter() - start_time) / num_checks * 1e6
+
+        print(f"Rate limit overhead: {leased_us:.1f}us/request with leases, "
+              f"{unleased_us:.1f}us/request with a script call each time")
+        assert leased.stats["redis"] <= num_checks / 40
+
+
+def make_token(sub, secret=None):
+    payload = {"sub": sub, "exp": int(time.time()) + 300}
+    return jwt.encode(payload, secret or settings.secret_key, algorithm="HS256")
+
+
+def make_app(limiter: RateLimiter, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/trading/orders")
+    async def orders():
+        return {"orders": []}
+
+    @app.post("/api/v1/auth/login")
+    async def login():
+        return {"token": "t"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    app.add_middleware(RateLimitMiddleware, limiter=limiter, **options)
+    return app
+
+
+class TestRateLimitMiddleware:
+    """Test suite for the gateway rate limit middleware"""
+
+    @pytest.mark.asyncio
+    async def test_headers_and_429(self, monkeypatch):
+        """Responses carry the remaining budget; exhausted clients get 429 with Retry-After"""
+        monkeypatch.setattr("shared.config.settings.rate_limit_auth_per_minute", 3)
+        app = make_app(RateLimiter(LocalRedis(), lease_size=1))
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            logins = [await client.post("/api/v1/auth/login") for _ in range(4)]
+            orders = await client.get("/api/v1/trading/orders")
+            health = await client.get("/health")
+
+        assert [r.status_code for r in logins] == [200, 200, 200, 429]
+        assert [r.headers["x-rate-limit-remaining"] for r in logins] == ["2", "1", "0", "0"]
+        assert int(logins[-1].headers["retry-after"]) >= 1
+        assert logins[-1].json()["error"]["code"] == 429
+
+        # Other routes use the caller's own bucket; probes are exempt
+        assert orders.status_code == 200
+        assert "x-rate-limit-remaining" not in health.headers
+
+    @pytest.mark.asyncio
+    async def test_verified_callers_get_separate_buckets(self, monkeypatch):
+        """Valid tokens and accepted API keys are limited independently of the caller's address"""
+        monkeypatch.setattr("shared.config.settings.rate_limit_auth_per_minute", 1)
+        app = make_app(RateLimiter(LocalRedis(), lease_size=1), api_key_verifier=lambda key: key in ("k1", "k2"))
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            first = await client.post("/api/v1/auth/login", headers={"X-API-Key": "k1"})
+            second = await client.post("/api/v1/auth/login", headers={"X-API-Key": "k2"})
+            third = await client.post("/api/v1/auth/login", headers={"Authorization": f"Bearer {make_token('u1')}"})
+            anonymous = await client.post("/api/v1/auth/login")
+            repeat = await client.post("/api/v1/auth/login", headers={"X-API-Key": "k1"})
+
+        assert [r.status_code for r in (first, second, third, anonymous, repeat)] == [200, 200, 200, 200, 429]
+
+    @pytest.mark.asyncio
+    async def test_rotating_credentials_does_not_reset_the_limit(self, monkeypatch):
+        """Made-up tokens and unknown API keys share the client address's bucket"""
+        monkeypatch.setattr("shared.config.settings.rate_limit_auth_per_minute", 3)
+        app = make_app(RateLimiter(LocalRedis(), lease_size=1))
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway") as client:
+            attempts = []
+            for i in range(3):
+                attempts.append(await client.post("/api/v1/auth/login", headers={"Authorization": f"Bearer fake-{i}"}))
+                attempts.append(await client.post("/api/v1/auth/login", headers={"X-API-Key": f"guess-{i}"}))
+            forged = make_token("u1", secret="not-the-gateway-secret")
+            attempts.append(await client.post("/api/v1/auth/login", headers={"Authorization": f"Bearer {forged}"}))
+
+        assert [r.status_code for r in attempts] == [200, 200, 200, 429, 429, 429, 429]
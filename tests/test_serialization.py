@@ -0,0 +1,116 @@
+import pytest
+import time
+from datetime import datetime, timezone, date
+from decimal import Decimal
+from uuid import uuid4
+
+# Import the shared serialization layer
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.serialization import (
+    MessageSerializer, SerializationError, get_codec,
+    JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE, DEFLATE_ENCODING
+)
+from shared.messaging import AWSMessagingManager
+
+
+def make_fill_event(i: int) -> dict:
+    return {
+        "event_type": "order_filled",
+        "data": {
+            "order_id": str(uuid4()),
+            "account_id": "acct-0001",
+            "symbol": "AAPL",
+            "side": "buy",
+            "quantity": Decimal("125.00000000"),
+            "price": Decimal("189.42000000"),
+            "commission": Decimal("0.12500000"),
+            "filled_at": datetime(2024, 1, 15, 14, 30, i % 60, 123456, tzinfo=timezone.utc),
+            "status": "filled"
+        }
+    }
+
+
+class TestMessageSerializer:
+    """Test suite for message codecs and compression"""
+
+    def test_msgpack_round_trips_decimal_and_datetime(self):
+        """Decimals and datetimes survive msgpack exactly"""
+        serializer = MessageSerializer(get_codec("msgpack"))
+        event = make_fill_event(1)
+        event["data"]["trade_date"] = date(2024, 1, 15)
+
+        body, content_type, content_encoding = serializer.serialize(event)
+
+        assert content_type == MSGPACK_CONTENT_TYPE
+        assert content_encoding is None
+        assert serializer.deserialize(body, content_type, content_encoding) == event
+
+    def test_json_codec_stringifies_decimals(self):
+        """JSON codec accepts Decimals and datetimes"""
+        serializer = MessageSerializer(get_codec("json"))
+        body, content_type, _ = serializer.serialize(make_fill_event(1))
+
+        decoded = serializer.deserialize(body, content_type)
+        assert decoded["data"]["price"] == "189.42000000"
+        assert decoded["data"]["filled_at"].startswith("2024-01-15T14:30:01")
+
+    def test_compression_above_threshold(self):
+        """Large bodies are deflated and decoded transparently"""
+        serializer = MessageSerializer(get_codec("msgpack"), compression_threshold=256)
+        events = [make_fill_event(i) for i in range(50)]
+
+        body, content_type, content_encoding = serializer.serialize(events)
+        assert content_encoding == DEFLATE_ENCODING
+        assert serializer.deserialize(body, content_type, content_encoding) == events
+
+        _, _, content_encoding = serializer.serialize({"small": True})
+        assert content_encoding is None
+
+    def test_consumer_decodes_any_codec(self):
+        """Messages without a content type fall back to JSON; unknown types fail"""
+        serializer = MessageSerializer(get_codec("msgpack"))
+
+        assert serializer.deserialize(b'{"legacy": 1}') == {"legacy": 1}
+        assert serializer.deserialize(b'{"legacy": 1}', JSON_CONTENT_TYPE) == {"legacy": 1}
+        with pytest.raises(SerializationError):
+            serializer.deserialize(b"...", "application/xml")
+
+    def test_sqs_body_round_trip(self):
+        """SQS bodies carry binary payloads as base64 with content attributes"""
+        aws = AWSMessagingManager()
+        event = make_fill_event(2)
+
+        body, attributes = aws._encode_sqs_body(event)
+        decoded = aws.decode_sqs_message({"Body": body, "MessageAttributes": attributes})
+
+        assert isinstance(body, str)
+        assert decoded["data"]["price"] == Decimal("189.42000000")
+
+    def test_codec_benchmark(self):
+        """Benchmark encode/decode throughput and size against JSON"""
+        events = [make_fill_event(i) for i in range(10000)]
+        results = {}
+
+        for name in ("json", "msgpack"):
+            serializer = MessageSerializer(get_codec(name))
+
+            start_time = time.perf_counter()
+            encoded = [serializer.serialize(event) for event in events]
+            encode_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            for body, content_type, content_encoding in encoded:
+                serializer.deserialize(body, content_type, content_encoding)
+            decode_time = time.perf_counter() - start_time
+
+            size = sum(len(body) for body, _, _ in encoded) / len(encoded)
+            results[name] = size
+            print(
+                f"{name}: encode {len(events) / encode_time:.0f} msg/s, "
+                f"decode {len(events) / decode_time:.0f} msg/s, {size:.0f} bytes/msg"
+            )
+
+        assert results["msgpack"] < results["json"]
@@ -0,0 +1,262 @@
+import pytest
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import asyncpg
+from fastapi import HTTPException
+
+# Import the user service session store
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'services', 'user-service'))
+
+from sessions import BloomFilter, SessionStore, REVOKED_PREFIX, hash_token
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield {"type": "message", "data": await self.queue.get()}
+
+    async def aclose(self):
+        if self.queue in self.redis.subscribers:
+            self.redis.subscribers.remove(self.queue)
+
+
+class FakeRedis:
+    """Shared Redis standing in for the real one; TTLs are recorded, not enforced"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.subscribers = []
+        self.exists_calls = 0
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    async def getdel(self, key):
+        return self.data.pop(key, None)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def exists(self, key):
+        self.exists_calls += 1
+        return int(key in self.data)
+
+    async def scan_iter(self, match=None, count=None):
+        prefix = match.rstrip("*")
+        for key in list(self.data):
+            if key.startswith(prefix):
+                yield key
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakeSessionTable:
+    """Records the write-behind statements run against user_sessions"""
+
+    def __init__(self):
+        self.rows = {}
+        self.statements = 0
+        self.deleted_users = set()
+        self.reachable = True
+
+    @asynccontextmanager
+    async def connection(self):
+        if not self.reachable:
+            raise ConnectionRefusedError("Connection refused")
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        # Roll back whatever the block wrote if it fails
+        saved = dict(self.rows)
+        try:
+            yield
+        except Exception:
+            self.rows = saved
+            raise
+
+    def _upsert(self, session_id, user_id, token_hash, expires_at):
+        if user_id in self.deleted_users:
+            raise asyncpg.ForeignKeyViolationError("user_sessions_user_id_fkey")
+        self.rows[session_id] = token_hash
+
+    async def executemany(self, query, rows):
+        self.statements += 1
+        for row in rows:
+            self._upsert(*row)
+
+    async def execute(self, query, *args):
+        self.statements += 1
+        if query.lstrip().startswith("INSERT"):
+            self._upsert(*args)
+        else:
+            for session_id in args[0]:
+                self.rows.pop(session_id, None)
+
+
+class TestSessionStore:
+    """Test suite for Redis-backed sessions, revocation and write-behind"""
+
+    @pytest.mark.asyncio
+    async def test_refresh_rotation_and_write_behind(self):
+        """Refresh tokens rotate once; session rows reach Postgres only on flush"""
+        redis, table = FakeRedis(), FakeSessionTable()
+        store = SessionStore(redis, table.connection)
+
+        session_id, refresh_token = await store.create("user-1")
+        user_id, same_session, rotated = await store.rotate(refresh_token)
+
+        assert (user_id, same_session) == ("user-1", session_id)
+        assert rotated != refresh_token
+        assert redis.ttls[f"session:{hash_token(rotated)}"] == 7 * 24 * 3600
+        with pytest.raises(HTTPException) as excinfo:
+            await store.rotate(refresh_token)
+        assert excinfo.value.status_code == 401
+
+        assert table.statements == 0
+        assert await store.flush() == 2
+        assert table.rows == {session_id: hash_token(rotated)}
+        assert table.statements == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_rows_are_dropped_and_outages_retried(self):
+        """A row Postgres rejects does not block the rest; an outage keeps the batch queued"""
+        redis, table = FakeRedis(), FakeSessionTable()
+        store = SessionStore(redis, table.connection)
+        kept, _ = await store.create("user-1")
+        orphan, _ = await store.create("user-2")
+        table.deleted_users.add("user-2")
+
+        assert await store.flush() == 2
+        assert table.rows.keys() == {kept}
+        assert store._pending == []
+
+        revoked, _ = await store.create("user-1")
+        await store.revoke(kept)
+        table.reachable = False
+        assert await store.flush() == 0
+        assert len(store._pending) == 2
+
+        table.reachable = True
+        assert await store.flush() == 2
+        assert table.rows.keys() == {revoked}
+
+    @pytest.mark.asyncio
+    async def test_revoke_during_rotation_wins(self):
+        """A session revoked while its refresh token rotates stays revoked"""
+        redis, table = FakeRedis(), FakeSessionTable()
+        store = SessionStore(redis, table.connection)
+        session_id, refresh_token = await store.create("user-1")
+        await store.flush()
+
+        set_token = redis.set
+
+        async def revoke_during_set(key, value, ex=None):
+            await set_token(key, value, ex=ex)
+            if key.startswith("session:"):
+                await store.revoke(session_id)
+        redis.set = revoke_during_set
+
+        with pytest.raises(HTTPException):
+            await store.rotate(refresh_token)
+        redis.set = set_token
+
+        assert not any(key.startswith("session:") for key in redis.data)
+        # The delete is queued after the rotation's upsert, even across batches
+        store.batch_size = 1
+        while await store.flush():
+            pass
+        assert table.rows == {}
+
+    @pytest.mark.asyncio
+    async def test_revocation_reaches_every_replica(self):
+        """A logout on one replica rejects the session's tokens on all of them"""
+        redis, table = FakeRedis(), FakeSessionTable()
+        replica_a = SessionStore(redis, table.connection)
+        replica_b = SessionStore(redis, table.connection)
+        await replica_b.start(redis, table.connection)
+        await asyncio.sleep(0)
+
+        session_id, refresh_token = await replica_a.create("user-1")
+        assert not await replica_b.is_revoked(session_id)
+
+        await replica_a.revoke(session_id)
+        await asyncio.sleep(0)
+
+        assert await replica_a.is_revoked(session_id)
+        assert await replica_b.is_revoked(session_id)
+        assert redis.ttls[REVOKED_PREFIX + session_id] == 7 * 24 * 3600
+        # The refresh token was not presented at logout but is dead too
+        with pytest.raises(HTTPException):
+            await replica_b.rotate(refresh_token)
+
+        await replica_a.stop()
+        await replica_b.stop()
+        assert table.rows == {}
+
+        # A replica starting later loads existing revocations from Redis
+        late = SessionStore(redis, table.connection)
+        await late.start(redis, table.connection)
+        await asyncio.sleep(0)
+        assert await late.is_revoked(session_id)
+        await late.stop()
+
+    @pytest.mark.asyncio
+    async def test_live_sessions_skip_redis(self):
+        """The Bloom filter answers for live sessions without a Redis call"""
+        redis = FakeRedis()
+        store = SessionStore(redis, FakeSessionTable().connection, bloom_capacity=1000, bloom_error_rate=0.01)
+        for _ in range(500):
+            await store.revoke(str(uuid.uuid4()))
+
+        live = [str(uuid.uuid4()) for _ in range(10000)]
+        assert not any([await store.is_revoked(session_id) for session_id in live])
+        assert redis.exists_calls < 10000 * 0.01
+
+    @pytest.mark.asyncio
+    async def test_filter_reloads_past_capacity(self):
+        """Once full, the filter is rebuilt from the revocations Redis still holds"""
+        redis = FakeRedis()
+        store = SessionStore(redis, FakeSessionTable().connection, bloom_capacity=50)
+        expired = [str(uuid.uuid4()) for _ in range(49)]
+        for session_id in expired:
+            await store.revoke(session_id)
+        for session_id in expired:
+            del redis.data[REVOKED_PREFIX + session_id]  # TTL ran out
+
+        kept = str(uuid.uuid4())
+        await store.revoke(kept)
+        await store._reload_task
+
+        assert store.revoked.count == 1
+        assert await store.is_revoked(kept)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Every added id is found; unknown ids rarely are"""
+        bloom = BloomFilter(capacity=1000, error_rate=0.001)
+        items = [str(uuid.uuid4()) for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        assert all(item in bloom for item in items)
+        false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10000))
+        assert false_positives < 50
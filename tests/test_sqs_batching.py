@@ -0,0 +1,158 @@
+import pytest
+import asyncio
+from collections import Counter, deque
+
+# Import the shared messaging layer
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from shared.messaging import AWSMessagingManager, SQSConsumer, _chunk_sqs_entries
+
+QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/000000000000/trading-events"
+
+
+class LocalSQS:
+    """Minimal in-process SQS emulator implementing the calls the manager uses"""
+
+    def __init__(self, fail_bodies=()):
+        self.calls = Counter()
+        self.visible = deque()
+        self.in_flight = {}
+        self.deleted = []
+        self.visibility_changes = []
+        self.fail_bodies = set(fail_bodies)
+        self._receipts = 0
+
+    async def send_message_batch(self, QueueUrl, Entries):
+        self.calls["SendMessageBatch"] += 1
+        assert len(Entries) <= 10
+        failed = []
+        for entry in Entries:
+            if entry["MessageBody"] in self.fail_bodies:
+                failed.append({"Id": entry["Id"], "Code": "InternalError", "Message": "boom"})
+            else:
+                self.visible.append(entry)
+        return {"Successful": [], "Failed": failed}
+
+    async def receive_message(self, QueueUrl, MaxNumberOfMessages, WaitTimeSeconds, MessageAttributeNames,
+                              VisibilityTimeout=None):
+        self.calls["ReceiveMessage"] += 1
+        messages = []
+        while self.visible and len(messages) < MaxNumberOfMessages:
+            entry = self.visible.popleft()
+            self._receipts += 1
+            receipt = f"receipt-{self._receipts}"
+            self.in_flight[receipt] = entry
+            messages.append({
+                "MessageId": entry["Id"],
+                "ReceiptHandle": receipt,
+                "Body": entry["MessageBody"],
+                "MessageAttributes": entry["MessageAttributes"]
+            })
+        if not messages:
+            await asyncio.sleep(0.01)
+        return {"Messages": messages}
+
+    async def delete_message_batch(self, QueueUrl, Entries):
+        self.calls["DeleteMessageBatch"] += 1
+        assert len(Entries) <= 10
+        for entry in Entries:
+            self.in_flight.pop(entry["ReceiptHandle"])
+            self.deleted.append(entry["ReceiptHandle"])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    async def change_message_visibility_batch(self, QueueUrl, Entries):
+        self.calls["ChangeMessageVisibilityBatch"] += 1
+        self.visibility_changes.extend(entry["ReceiptHandle"] for entry in Entries)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+
+def make_manager(sqs: LocalSQS) -> AWSMessagingManager:
+    aws = AWSMessagingManager()
+    aws.sqs_client = sqs
+    return aws
+
+
+class TestSQSBatching:
+    """Test suite for batched SQS operations"""
+
+    def test_entries_chunked_by_count_and_size(self):
+        """Batches respect the 10 entry and 256 KiB limits"""
+        small = [{"MessageBody": "x"} for _ in range(25)]
+        assert [len(chunk) for chunk in _chunk_sqs_entries(small)] == [10, 10, 5]
+
+        large = [{"MessageBody": "x" * 100_000} for _ in range(5)]
+        assert [len(chunk) for chunk in _chunk_sqs_entries(large)] == [2, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_send_batch_reports_partial_failures(self):
+        """Per-message results reflect failed batch entries"""
+        sqs = LocalSQS()
+        aws = make_manager(sqs)
+        bad_body, _ = aws._encode_sqs_body({"n": 3})
+        sqs.fail_bodies.add(bad_body)
+
+        results = await aws.send_sqs_messages(QUEUE_URL, [{"n": i} for i in range(25)])
+
+        assert results == [i != 3 for i in range(25)]
+        assert sqs.calls["SendMessageBatch"] == 3
+
+    @pytest.mark.asyncio
+    async def test_micro_batching_sender(self):
+        """Concurrent single sends are coalesced into batch calls"""
+        sqs = LocalSQS()
+        aws = make_manager(sqs)
+
+        results = await asyncio.gather(*(aws.queue_sqs_message(QUEUE_URL, {"n": i}) for i in range(25)))
+
+        assert all(results)
+        assert len(sqs.visible) == 25
+        assert sqs.calls["SendMessageBatch"] == 3
+
+    @pytest.mark.asyncio
+    async def test_consumer_batches_deletes(self):
+        """Successful messages are deleted in batches, failures are left for redelivery"""
+        sqs = LocalSQS()
+        aws = make_manager(sqs)
+        num_messages = 200
+        await aws.send_sqs_messages(QUEUE_URL, [{"n": i} for i in range(num_messages)])
+        handled = []
+
+        async def handler(message):
+            if message["n"] == 7:
+                raise ValueError("cannot process")
+            handled.append(message["n"])
+
+        consumer = SQSConsumer(aws, QUEUE_URL, handler, concurrency=20, visibility_timeout=30, wait_time=0)
+        await consumer.start()
+        while len(handled) < num_messages - 1:
+            await asyncio.sleep(0.01)
+        await consumer.stop(timeout=5)
+
+        api_calls = sum(sqs.calls.values())
+        print(f"SQS API calls for {num_messages} messages: {api_calls} (unbatched: {num_messages * 3})")
+
+        assert len(sqs.deleted) == num_messages - 1
+        assert len(sqs.in_flight) == 1
+        assert sqs.calls["DeleteMessageBatch"] <= num_messages // 5
+
+    @pytest.mark.asyncio
+    async def test_visibility_extended_for_slow_handlers(self):
+        """Long-running handlers keep their messages invisible"""
+        sqs = LocalSQS()
+        aws = make_manager(sqs)
+        await aws.send_sqs_messages(QUEUE_URL, [{"n": 1}])
+        done = asyncio.Event()
+
+        async def handler(message):
+            await asyncio.sleep(0.8)
+            done.set()
+
+        consumer = SQSConsumer(aws, QUEUE_URL, handler, concurrency=1, visibility_timeout=1, wait_time=0)
+        await consumer.start()
+        await asyncio.wait_for(done.wait(), timeout=5)
+        await consumer.stop(timeout=5)
+
+        assert sqs.visibility_changes == ["receipt-1"]
+        assert sqs.deleted == ["receipt-1"]